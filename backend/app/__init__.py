@@ -1,7 +1,6 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
-from sqlalchemy import inspect, text
 import os
 
 db = SQLAlchemy()
@@ -18,10 +17,6 @@ def create_app(config_name='default'):
     db.init_app(app)
     CORS(app, resources={r"/api/*": {"origins": "*"}})
     
-    # 确保数据库结构所需列存在
-    with app.app_context():
-        ensure_user_permissions_column()
-    
     # 创建上传目录
     upload_folder = app.config['UPLOAD_FOLDER']
     if not os.path.exists(upload_folder):
@@ -46,22 +41,40 @@ def create_app(config_name='default'):
     app.register_blueprint(users_bp, url_prefix='/api/users')
     app.register_blueprint(forum_bp, url_prefix='/api/forum')
     
+    # 后台任务队列
+    from app.utils.jobs import job_queue
+    job_queue.init_app(app)
+    
+    # 微信接口客户端
+    from app.utils.wechat import wechat_client
+    wechat_client.init_app(app)
+    
+    # 认证缓存
+    from app.utils.jwt import init_auth_cache
+    init_auth_cache(app)
+    
+    # 签到资格缓存
+    from app.utils.checkin_rules import init_checkin_cache
+    init_checkin_cache(app)
+    
+    # 签到写缓冲
+    from app.utils.checkin_ingest import checkin_buffer
+    checkin_buffer.init_app(app)
+    
+    # 附近岗位网格索引
+    from app.utils.spatial_index import position_index
+    position_index.init_app(app)
+    
+    # 缺勤补记定时器（配置 CHECKIN_ABSENCE_SCHEDULE 时启动）
+    from app.utils.absence import absence_scheduler
+    absence_scheduler.init_app(app)
+    
+    # 统计结果缓存
+    from app.utils.stats import init_statistics_cache
+    init_statistics_cache(app)
+    
     # 注册错误处理
     from app.utils.errors import register_error_handlers
     register_error_handlers(app)
     
     return app
-
-def ensure_user_permissions_column():
-    """确保 users 表包含 permissions 字段"""
-    inspector = inspect(db.engine)
-    columns = [col['name'] for col in inspector.get_columns('users')]
-    if 'permissions' not in columns:
-        db.session.execute(text(
-            "ALTER TABLE users ADD COLUMN permissions TEXT COMMENT '权限配置(JSON)'"
-        ))
-        db.session.execute(text(
-            "UPDATE users SET permissions='[]' WHERE permissions IS NULL"
-        ))
-        db.session.commit()
-
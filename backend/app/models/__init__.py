@@ -2,8 +2,12 @@ from app.models.user import User
 from app.models.position import Position
 from app.models.application import Application
 from app.models.checkin import CheckIn
+from app.models.checkin_daily_stat import CheckInDailyStat
 from app.models.weekly_report import WeeklyReport
 from app.models.message import Message
+from app.models.student_credit_stat import StudentCreditStat
+from app.models.background_job import BackgroundJob
+from app.models.schema_migration import SchemaMigration
 
-__all__ = ['User', 'Position', 'Application', 'CheckIn', 'WeeklyReport', 'Message']
+__all__ = ['User', 'Position', 'Application', 'CheckIn', 'CheckInDailyStat', 'WeeklyReport', 'Message', 'StudentCreditStat', 'BackgroundJob', 'SchemaMigration']
 
@@ -4,6 +4,11 @@ from datetime import datetime
 class Application(db.Model):
     """实习申请模型"""
     __tablename__ = 'applications'
+    __table_args__ = (
+        db.Index('ix_applications_student_status', 'student_id', 'status'),
+        # 列表按 (created_at, id) 倒序分页
+        db.Index('ix_applications_created_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, comment='学生ID')
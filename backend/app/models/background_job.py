@@ -0,0 +1,43 @@
+from app import db
+from datetime import datetime
+import json
+
+class BackgroundJob(db.Model):
+    """后台任务模型（记录任务状态与进度，供多进程部署下查询）"""
+    __tablename__ = 'background_jobs'
+    
+    id = db.Column(db.String(32), primary_key=True, comment='任务ID')
+    type = db.Column(db.String(50), nullable=False, comment='任务类型')
+    status = db.Column(db.String(20), nullable=False, default='pending', comment='状态: pending/running/succeeded/failed')
+    processed = db.Column(db.Integer, nullable=False, default=0, comment='已处理数')
+    total = db.Column(db.Integer, nullable=False, default=0, comment='总数')
+    result = db.Column(db.Text, nullable=True, comment='执行结果(JSON)')
+    error = db.Column(db.Text, nullable=True, comment='错误信息')
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True, comment='提交人ID')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='创建时间')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment='更新时间')
+    
+    def get_result(self):
+        try:
+            return json.loads(self.result) if self.result else None
+        except json.JSONDecodeError:
+            return None
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'id': self.id,
+            'type': self.type,
+            'status': self.status,
+            'processed': self.processed,
+            'total': self.total,
+            'progress': round(self.processed / self.total * 100, 2) if self.total else 0,
+            'result': self.get_result(),
+            'error': self.error,
+            'created_by': self.created_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
+    
+    def __repr__(self):
+        return f'<BackgroundJob {self.id}>'
@@ -4,6 +4,11 @@ from datetime import datetime, date
 class CheckIn(db.Model):
     """签到记录模型"""
     __tablename__ = 'checkins'
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'position_id', 'checkin_date', name='uq_checkin_student_position_date'),
+        # 列表按 (checkin_time, id) 倒序分页
+        db.Index('ix_checkins_time_id', 'checkin_time', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, comment='学生ID')
@@ -0,0 +1,23 @@
+from app import db
+from datetime import datetime
+
+class CheckInDailyStat(db.Model):
+    """每日签到汇总模型（按日期/岗位/状态计数，由签到写入增量维护）"""
+    __tablename__ = 'checkin_daily_stats'
+    
+    stat_date = db.Column(db.Date, primary_key=True, comment='签到日期')
+    position_id = db.Column(db.Integer, primary_key=True, comment='岗位ID')
+    status = db.Column(db.String(20), primary_key=True, comment='签到状态')
+    count = db.Column(db.Integer, nullable=False, default=0, comment='签到次数')
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'stat_date': self.stat_date.isoformat() if self.stat_date else None,
+            'position_id': self.position_id,
+            'status': self.status,
+            'count': self.count,
+        }
+    
+    def __repr__(self):
+        return f'<CheckInDailyStat {self.stat_date} {self.position_id} {self.status}>'
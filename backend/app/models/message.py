@@ -4,6 +4,12 @@ from datetime import datetime
 class Message(db.Model):
     """消息模型"""
     __tablename__ = 'messages'
+    __table_args__ = (
+        db.Index('ix_messages_user_read_created', 'user_id', 'is_read', 'created_at'),
+        db.Index('ix_messages_type_related', 'type', 'related_id'),
+        # 消息列表总是按用户过滤，再按 (created_at, id) 倒序分页
+        db.Index('ix_messages_user_created_id', 'user_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, comment='接收用户ID')
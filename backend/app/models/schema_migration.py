@@ -0,0 +1,13 @@
+from app import db
+from datetime import datetime
+
+class SchemaMigration(db.Model):
+    """已执行的数据库迁移版本（由 flask migrate-db 维护）"""
+    __tablename__ = 'schema_migrations'
+    
+    version = db.Column(db.Integer, primary_key=True, comment='迁移版本号')
+    description = db.Column(db.String(200), nullable=False, comment='迁移说明')
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow, comment='执行时间')
+    
+    def __repr__(self):
+        return f'<SchemaMigration {self.version}>'
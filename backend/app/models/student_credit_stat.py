@@ -0,0 +1,37 @@
+from app import db
+from datetime import datetime
+
+class StudentCreditStat(db.Model):
+    """学生信用分聚合指标模型（按学生/岗位增量维护）"""
+    __tablename__ = 'student_credit_stats'
+    
+    student_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True, comment='学生ID')
+    position_id = db.Column(db.Integer, db.ForeignKey('positions.id'), primary_key=True, comment='岗位ID')
+    normal_checkins = db.Column(db.Integer, nullable=False, default=0, comment='正常签到次数')
+    abnormal_checkins = db.Column(db.Integer, nullable=False, default=0, comment='异常签到次数')
+    report_count = db.Column(db.Integer, nullable=False, default=0, comment='周报提交数')
+    scored_report_count = db.Column(db.Integer, nullable=False, default=0, comment='已评分周报数')
+    score_sum = db.Column(db.Float, nullable=False, default=0.0, comment='周报评分总和')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment='更新时间')
+    
+    def average_score(self):
+        """周报平均分（无评分时为0）"""
+        if not self.scored_report_count:
+            return 0
+        return self.score_sum / self.scored_report_count
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'student_id': self.student_id,
+            'position_id': self.position_id,
+            'normal_checkins': self.normal_checkins,
+            'abnormal_checkins': self.abnormal_checkins,
+            'report_count': self.report_count,
+            'scored_report_count': self.scored_report_count,
+            'average_score': round(self.average_score(), 2),
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
+    
+    def __repr__(self):
+        return f'<StudentCreditStat {self.student_id} {self.position_id}>'
@@ -1,8 +1,24 @@
 from app import db
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
+from app.utils.passwords import hash_password
+from functools import lru_cache
 import json
 
+
+@lru_cache(maxsize=256)
+def _parse_permissions(raw):
+    """解析权限JSON（按原始字符串缓存，不同取值通常只有少数几种）"""
+    try:
+        permissions = json.loads(raw or '[]')
+    except (json.JSONDecodeError, TypeError):
+        return ()
+    if not isinstance(permissions, list):
+        return ()
+    # 只保留字符串项，脏数据中的列表/对象等不可哈希值直接忽略
+    return tuple(item for item in permissions if isinstance(item, str))
+
+
 class User(db.Model):
     """用户模型"""
     __tablename__ = 'users'
@@ -41,8 +57,8 @@ class User(db.Model):
     messages = db.relationship('Message', backref='user', lazy='dynamic', cascade='all, delete-orphan')
     
     def set_password(self, password):
-        """设置密码"""
-        self.password_hash = generate_password_hash(password)
+        """设置密码（哈希算法按角色配置）"""
+        self.password_hash = hash_password(password, self.role)
     
     def check_password(self, password):
         """验证密码"""
@@ -72,12 +88,30 @@ class User(db.Model):
     def __repr__(self):
         return f'<User {self.username}>'
 
+    def _permission_entry(self):
+        """实例上缓存的 (原始JSON, 权限元组, 权限集合)，permissions 字段变化后自动重新解析"""
+        raw = self.permissions
+        entry = self.__dict__.get('_permissions_cache')
+        if entry is None or entry[0] != raw:
+            permissions = _parse_permissions(raw)
+            entry = (raw, permissions, frozenset(permissions))
+            self.__dict__['_permissions_cache'] = entry
+        return entry
+
     def get_permissions(self):
-        try:
-            return json.loads(self.permissions or '[]')
-        except json.JSONDecodeError:
-            return []
+        return list(self._permission_entry()[1])
 
-    def set_permissions(self, permissions_list):
-        self.permissions = json.dumps(permissions_list or [])
+    def get_permission_set(self):
+        """权限集合（frozenset），用于成员判断"""
+        return self._permission_entry()[2]
+
+    def has_permissions(self, *permissions):
+        """是否具备全部指定的模块权限（管理员拥有全部权限）"""
+        if self.role == 'admin':
+            return True
+        return self.get_permission_set().issuperset(permissions)
 
+    def set_permissions(self, permissions_list):
+        permissions = tuple(item for item in permissions_list or [] if isinstance(item, str))
+        self.permissions = json.dumps(list(permissions))
+        self.__dict__['_permissions_cache'] = (self.permissions, permissions, frozenset(permissions))
@@ -4,6 +4,11 @@ from datetime import datetime
 class WeeklyReport(db.Model):
     """周报模型"""
     __tablename__ = 'weekly_reports'
+    __table_args__ = (
+        db.Index('ix_weekly_reports_student_position_week', 'student_id', 'position_id', 'week_number'),
+        # 列表按 (week_number, id) 倒序分页
+        db.Index('ix_weekly_reports_week_id', 'week_number', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, comment='学生ID')
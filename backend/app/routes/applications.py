@@ -2,11 +2,14 @@ from flask import Blueprint, request, jsonify
 from app import db
 from app.models.application import Application
 from app.models.position import Position
-from app.models.message import Message
 from datetime import datetime
 from app.utils.decorators import token_required, role_required
 from app.utils.errors import APIError
+from app.utils.stats import invalidate_statistics
+from app.utils.messages import send_messages
 from app.utils.validators import validate_required
+from app.utils.pagination import keyset_requested, keyset_paginate
+from app.utils.bulk_delete import parse_delete_ids, delete_applications
 from sqlalchemy import or_
 import logging
 
@@ -16,6 +19,7 @@ applications_bp = Blueprint('applications', __name__)
 
 
 def _audit_application(application, status, review_comment, reviewer):
+    """审核申请，返回待在提交后发送给学生的通知消息"""
     if status not in ['approved', 'rejected']:
         raise APIError('状态值不正确', 400, 'INVALID_STATUS')
     
@@ -42,15 +46,13 @@ def _audit_application(application, status, review_comment, reviewer):
     application.review_comment = review_comment
     application.reviewed_at = datetime.utcnow()
     
-    message = Message(
-        user_id=application.student_id,
-        title='申请审核结果',
-        content=f'您的实习申请已{"通过" if status == "approved" else "拒绝"}',
-        type='application',
-        related_id=application.id
-    )
-    db.session.add(message)
-    return application
+    return {
+        'user_id': application.student_id,
+        'title': '申请审核结果',
+        'content': f'您的实习申请已{"通过" if status == "approved" else "拒绝"}',
+        'type': 'application',
+        'related_id': application.id
+    }
 
 @applications_bp.route('', methods=['GET'])
 @token_required
@@ -70,6 +72,18 @@ def get_applications():
         elif status:
             query = query.filter_by(status=status)
         
+        # 游标分页：after=<created_at,id>，不统计总数
+        if keyset_requested():
+            result = keyset_paginate(query, Application.created_at, Application.id)
+            return jsonify({
+                'success': True,
+                'data': {
+                    'items': [a.to_dict() for a in result.items],
+                    'per_page': result.per_page,
+                    'next_cursor': result.next_cursor
+                }
+            }), 200
+        
         pagination = query.order_by(Application.created_at.desc()).paginate(
             page=page, per_page=per_page, error_out=False
         )
@@ -85,6 +99,8 @@ def get_applications():
             }
         }), 200
         
+    except APIError as e:
+        raise e
     except Exception as e:
         logger.error(f"Get applications error: {str(e)}", exc_info=True)
         raise APIError('获取申请列表失败', 500)
@@ -159,17 +175,16 @@ def create_application():
         
         db.session.add(application)
         db.session.commit()
+        invalidate_statistics()
         
         # 发送消息给岗位发布者
-        message = Message(
-            user_id=position.publisher_id,
-            title='新的实习申请',
-            content=f'{request.current_user.real_name}申请了您发布的岗位：{position.title}',
-            type='application',
-            related_id=application.id
-        )
-        db.session.add(message)
-        db.session.commit()
+        send_messages({
+            'user_id': position.publisher_id,
+            'title': '新的实习申请',
+            'content': f'{request.current_user.real_name}申请了您发布的岗位：{position.title}',
+            'type': 'application',
+            'related_id': application.id
+        })
         
         return jsonify({
             'success': True,
@@ -197,8 +212,10 @@ def review_application(application_id):
         status = data['status']
         review_comment = data.get('review_comment')
         
-        _audit_application(application, status, review_comment, request.current_user)
+        message = _audit_application(application, status, review_comment, request.current_user)
         db.session.commit()
+        invalidate_statistics()
+        send_messages(message)
         
         return jsonify({
             'success': True,
@@ -235,10 +252,14 @@ def batch_audit_applications():
         if missing:
             raise APIError(f'部分申请不存在: {missing}', 404, 'APPLICATION_NOT_FOUND')
         
-        for application in applications:
+        messages = [
             _audit_application(application, status, review_comment, request.current_user)
+            for application in applications
+        ]
         
         db.session.commit()
+        invalidate_statistics()
+        send_messages(*messages)
         return jsonify({
             'success': True,
             'message': '批量审核成功',
@@ -257,17 +278,15 @@ def batch_audit_applications():
 def batch_delete_applications():
     """批量删除申请"""
     try:
-        data = request.get_json() or {}
-        ids = data.get('ids')
-        if not isinstance(ids, list) or not ids:
-            raise APIError('请选择需要删除的申请', 400, 'INVALID_IDS')
-        applications = Application.query.filter(Application.id.in_(ids)).all()
-        if not applications:
+        ids = parse_delete_ids(request.get_json(), '请选择需要删除的申请')
+        deleted = delete_applications(ids)
+        if not deleted:
             raise APIError('未找到对应申请', 404, 'APPLICATION_NOT_FOUND')
-        for application in applications:
-            db.session.delete(application)
-        db.session.commit()
-        return jsonify({'success': True, 'message': '批量删除成功', 'data': {'deleted': ids}}), 200
+        return jsonify({
+            'success': True,
+            'message': '批量删除成功',
+            'data': {'deleted': deleted, 'not_found': sorted(set(ids) - set(deleted))}
+        }), 200
     except APIError as e:
         raise e
     except Exception as e:
@@ -2,11 +2,11 @@ from flask import Blueprint, request, jsonify
 from app import db
 from app.models.user import User
 from app.models.message import Message
-from app.utils.jwt import generate_token
+from app.utils.jwt import generate_token, invalidate_user_cache
 from app.utils.decorators import token_required
 from app.utils.errors import APIError
 from app.utils.validators import validate_student_id, validate_required
-import requests
+from app.utils.wechat import wechat_client
 import logging
 import json
 from urllib.parse import parse_qs
@@ -65,30 +65,8 @@ def wx_login():
         code = data.get('code')
         student_id = data.get('student_id')  # 可选，用于绑定学号
         
-        # 调用微信API获取openid
-        from flask import current_app
-        appid = current_app.config.get('WX_APPID')
-        secret = current_app.config.get('WX_SECRET')
-        
-        if not appid or not secret:
-            # 开发环境，使用模拟openid
-            openid = f"mock_openid_{code}"
-        else:
-            # 生产环境，调用微信API
-            url = f"https://api.weixin.qq.com/sns/jscode2session"
-            params = {
-                'appid': appid,
-                'secret': secret,
-                'js_code': code,
-                'grant_type': 'authorization_code'
-            }
-            response = requests.get(url, params=params)
-            result = response.json()
-            
-            if 'errcode' in result:
-                raise APIError('微信登录失败', 401, 'WX_LOGIN_FAILED')
-            
-            openid = result.get('openid')
+        # 调用微信API获取openid（未配置 appid/secret 时使用模拟openid）
+        openid = wechat_client.code_to_session(code)
         
         # 查找或创建用户
         user = User.query.filter_by(wx_openid=openid).first()
@@ -127,6 +105,7 @@ def wx_login():
                     raise APIError('该学号已被绑定', 400, 'STUDENT_ID_EXISTS')
                 user.student_id = student_id
                 db.session.commit()
+                invalidate_user_cache(user.id)
         
         token = generate_token(user.id, user.role)
         
@@ -166,6 +145,7 @@ def bind_student_id():
         if not request.current_user.real_name:
             request.current_user.real_name = data.get('real_name', '')
         db.session.commit()
+        invalidate_user_cache(request.current_user.id)
         
         return jsonify({
             'success': True,
@@ -1,14 +1,24 @@
 from flask import Blueprint, request, jsonify
 from app import db
 from app.models.checkin import CheckIn
-from app.models.application import Application
-from app.models.position import Position
 from app.utils.decorators import token_required, role_required
 from app.utils.errors import APIError
+from app.utils.stats import (
+    invalidate_statistics, compute_checkin_counts, checkin_statistics_data,
+    get_student_checkin_statistics, record_student_checkin
+)
 from app.utils.validators import validate_required, validate_coordinates
 from app.utils.distance import haversine_distance
-from datetime import datetime, date, timedelta, time
-from sqlalchemy import func
+from app.utils.checkin_rollup import record_checkins
+from app.utils.credit import apply_credit_delta, checkin_credit_delta
+from app.utils.checkin_ingest import checkin_buffer, is_duplicate_checkin
+from app.utils.pagination import keyset_requested, keyset_paginate
+from app.utils.bulk_delete import parse_delete_ids, delete_checkins
+from app.utils.checkin_rules import (
+    get_checkin_position, parse_checkin_window, late_minutes_after, evaluate_checkin
+)
+from datetime import datetime, date
+from sqlalchemy.exc import IntegrityError
 import logging
 import time as time_lib
 
@@ -58,6 +68,18 @@ def get_checkins():
         if end_date:
             query = query.filter(CheckIn.checkin_date <= end_date)
         
+        # 游标分页：after=<checkin_time,id>，不统计总数
+        if keyset_requested():
+            result = keyset_paginate(query, CheckIn.checkin_time, CheckIn.id)
+            return jsonify({
+                'success': True,
+                'data': {
+                    'items': [c.to_dict() for c in result.items],
+                    'per_page': result.per_page,
+                    'next_cursor': result.next_cursor
+                }
+            }), 200
+        
         pagination = query.order_by(CheckIn.checkin_time.desc()).paginate(
             page=page, per_page=per_page, error_out=False
         )
@@ -73,6 +95,8 @@ def get_checkins():
             }
         }), 200
         
+    except APIError as e:
+        raise e
     except Exception as e:
         logger.error(f"Get checkins error: {str(e)}", exc_info=True)
         raise APIError('获取签到记录失败', 500)
@@ -86,6 +110,7 @@ def create_checkin():
         # 只有学生可以签到
         if request.current_user.role != 'student':
             raise APIError('只有学生可以签到', 403)
+        student_id = request.current_user.id
         
         data = request.get_json()
         validate_required(data, ['position_id', 'latitude', 'longitude'])
@@ -93,44 +118,20 @@ def create_checkin():
         validate_coordinates(data['latitude'], data['longitude'])
         
         position_id = data['position_id']
-        position = Position.query.get_or_404(position_id)
-        
-        # 检查是否有已批准的申请
-        application = Application.query.filter_by(
-            student_id=request.current_user.id,
-            position_id=position_id,
-            status='approved'
-        ).first()
+        # 校验已批准申请并读取岗位（进程内缓存，未命中时一次联表查询）
+        position = get_checkin_position(student_id, position_id)
         
-        if not application:
-            raise APIError('您未申请或该申请未通过', 400, 'NO_APPROVED_APPLICATION')
-        
-        # 检查今天是否已签到
-        today = date.today()
-        today_checkin = CheckIn.query.filter_by(
-            student_id=request.current_user.id,
-            position_id=position_id,
-            checkin_date=today
-        ).first()
-        
-        if today_checkin:
-            raise APIError('今日已完成签到', 400, 'ALREADY_CHECKED_IN', code='1002')
-
         # 校验签到时间窗口
         from flask import current_app
-        start_cfg = current_app.config.get('CHECKIN_WORKDAY_START', '09:00')
-        end_cfg = current_app.config.get('CHECKIN_WORKDAY_END', '18:00')
-        start_h, start_m = map(int, start_cfg.split(':'))
-        end_h, end_m = map(int, end_cfg.split(':'))
-        now_time = datetime.utcnow().time()
-        start_time = time(start_h, start_m)
-        end_time = time(end_h, end_m)
-        late_minutes = 0
-        if now_time < start_time:
+        today = date.today()
+        start_time, end_time = parse_checkin_window(
+            current_app.config.get('CHECKIN_WORKDAY_START', '09:00'),
+            current_app.config.get('CHECKIN_WORKDAY_END', '18:00')
+        )
+        now = datetime.utcnow()
+        if now.time() < start_time:
             raise APIError('当前非签到时段', 400, 'NOT_IN_CHECKIN_WINDOW', code='1003')
-        if now_time > end_time:
-            delta = datetime.combine(today, now_time) - datetime.combine(today, end_time)
-            late_minutes = max(0, int(delta.total_seconds() // 60))
+        late_minutes = late_minutes_after(now, end_time)
 
         # 计算距离
         distance = haversine_distance(
@@ -141,41 +142,93 @@ def create_checkin():
         )
 
         allowed_radius = position.checkin_radius or current_app.config.get('CHECKIN_NORMAL_DISTANCE', 200)
-        status = 'normal'
-        abnormal_reason = None
-        if distance > allowed_radius:
-            status = 'abnormal'
-            abnormal_reason = f'超出签到范围，当前距离{round(distance,2)}米，允许{allowed_radius}米内'
-        elif late_minutes > 0:
-            status = 'late'
-            abnormal_reason = f'迟到 {late_minutes} 分钟'
+        status, abnormal_reason = evaluate_checkin(distance, allowed_radius, late_minutes)
         
-        checkin = CheckIn(
-            student_id=request.current_user.id,
-            position_id=position_id,
-            checkin_date=today,
-            latitude=data['latitude'],
-            longitude=data['longitude'],
-            distance=distance,
-            status=status,
-            abnormal_reason=abnormal_reason,
-            remark=data.get('remark')
-        )
+        message_content = f'您的签到已提交，状态：{status}，距离：{round(distance,2)}米'
+        if checkin_buffer.enabled:
+            # 写缓冲模式：校验通过后进入进程内缓冲（及 spool 文件），由后台线程批量提交；
+            # 返回 202 前先按唯一键查库，已落库的重复签到同步拒绝，而不是在批量提交时静默丢弃
+            if checkin_buffer.is_accepted((student_id, position_id, today)) or db.session.query(CheckIn.id).filter_by(
+                student_id=student_id, position_id=position_id, checkin_date=today
+            ).first():
+                raise APIError('今日已完成签到', 400, 'ALREADY_CHECKED_IN', code='1002')
+            accepted = checkin_buffer.submit({
+                'student_id': student_id,
+                'position_id': position_id,
+                'checkin_date': today,
+                'checkin_time': now,
+                'latitude': data['latitude'],
+                'longitude': data['longitude'],
+                'distance': distance,
+                'status': status,
+                'abnormal_reason': abnormal_reason,
+                'remark': data.get('remark'),
+                'message': message_content
+            })
+            if not accepted:
+                raise APIError('今日已完成签到', 400, 'ALREADY_CHECKED_IN', code='1002')
+            checkin_data = {
+                'id': None,
+                'student_id': student_id,
+                'student_name': request.current_user.real_name,
+                'student_id_number': request.current_user.student_id,
+                'position_id': position_id,
+                'position_title': position.title,
+                'position_company': position.company_name,
+                'checkin_date': today.isoformat(),
+                'checkin_time': now.isoformat(),
+                'latitude': data['latitude'],
+                'longitude': data['longitude'],
+                'distance': round(distance, 2),
+                'status': status,
+                'abnormal_reason': abnormal_reason,
+                'remark': data.get('remark'),
+                'queued': True
+            }
+            status_code = 202
+        else:
+            checkin = CheckIn(
+                student_id=student_id,
+                position_id=position_id,
+                checkin_date=today,
+                latitude=data['latitude'],
+                longitude=data['longitude'],
+                distance=distance,
+                status=status,
+                abnormal_reason=abnormal_reason,
+                remark=data.get('remark')
+            )
 
-        from app.models.message import Message
-        db.session.add(checkin)
-        message = Message(
-            user_id=request.current_user.id,
-            title='签到通知',
-            content=f'您的签到已提交，状态：{status}，距离：{round(distance,2)}米',
-            type='checkin',
-            related_id=checkin.id
-        )
-        db.session.add(message)
-        db.session.commit()
+            from app.models.message import Message
+            db.session.add(checkin)
+            credit_delta = checkin_credit_delta(status)
+            if credit_delta:
+                apply_credit_delta(student_id, position_id, **credit_delta)
+            # 每日唯一由 (student_id, position_id, checkin_date) 唯一约束保证，重复签到在插入时失败
+            try:
+                db.session.flush()
+            except IntegrityError as e:
+                db.session.rollback()
+                if not is_duplicate_checkin(e):
+                    raise
+                raise APIError('今日已完成签到', 400, 'ALREADY_CHECKED_IN', code='1002')
+            message = Message(
+                user_id=student_id,
+                title='签到通知',
+                content=message_content,
+                type='checkin',
+                related_id=checkin.id
+            )
+            db.session.add(message)
+            record_checkins([checkin])
+            checkin_data = checkin.to_dict()
+            db.session.commit()
+            invalidate_statistics()
+            status_code = 201
+        record_student_checkin(student_id, position_id, status, today)
 
         duration_ms = int((time_lib.time() - start_ts) * 1000)
-        logger.info(f"checkin_log|user={request.current_user.id}|position={position_id}|status={status}|distance={round(distance,2)}|allowed={allowed_radius}|late_minutes={late_minutes}|duration_ms={duration_ms}")
+        logger.info(f"checkin_log|user={student_id}|position={position_id}|status={status}|distance={round(distance,2)}|allowed={allowed_radius}|late_minutes={late_minutes}|duration_ms={duration_ms}")
 
         if status == 'abnormal':
             raise APIError(
@@ -189,8 +242,8 @@ def create_checkin():
         return jsonify({
             'success': True,
             'message': '签到成功' if status == 'normal' else '签到已记录',
-            'data': {**checkin.to_dict(), 'late_minutes': late_minutes}
-        }), 201
+            'data': {**checkin_data, 'late_minutes': late_minutes}
+        }), status_code
         
     except APIError as e:
         raise e
@@ -205,17 +258,15 @@ def create_checkin():
 def batch_delete_checkins():
     """批量删除签到记录"""
     try:
-        data = request.get_json() or {}
-        ids = data.get('ids')
-        if not isinstance(ids, list) or not ids:
-            raise APIError('请选择需要删除的记录', 400, 'INVALID_IDS')
-        records = CheckIn.query.filter(CheckIn.id.in_(ids)).all()
-        if not records:
+        ids = parse_delete_ids(request.get_json(), '请选择需要删除的记录')
+        deleted = delete_checkins(ids)
+        if not deleted:
             raise APIError('未找到对应记录', 404, 'CHECKIN_NOT_FOUND')
-        for rec in records:
-            db.session.delete(rec)
-        db.session.commit()
-        return jsonify({'success': True, 'message': '批量删除成功', 'data': {'deleted': ids}}), 200
+        return jsonify({
+            'success': True,
+            'message': '批量删除成功',
+            'data': {'deleted': deleted, 'not_found': sorted(set(ids) - set(deleted))}
+        }), 200
     except APIError as e:
         raise e
     except Exception as e:
@@ -226,39 +277,30 @@ def batch_delete_checkins():
 @checkins_bp.route('/statistics', methods=['GET'])
 @token_required
 def get_checkin_statistics():
-    """获取签到统计"""
+    """获取签到统计（各状态计数及近1/7/30天分段）"""
     try:
         student_id = request.args.get('student_id', type=int)
         position_id = request.args.get('position_id', type=int)
+        start_date = _parse_query_date(request.args.get('start_date'), 'start_date')
+        end_date = _parse_query_date(request.args.get('end_date'), 'end_date')
         
-        # 学生只能看自己的统计
+        # 学生只能看自己的统计；小程序首页每次加载都会请求，无日期过滤时读取快照
         if request.current_user.role == 'student':
             student_id = request.current_user.id
+            if not start_date and not end_date:
+                return jsonify({
+                    'success': True,
+                    'data': get_student_checkin_statistics(student_id, position_id)
+                }), 200
         
-        query = CheckIn.query
-        if student_id:
-            query = query.filter_by(student_id=student_id)
-        if position_id:
-            query = query.filter_by(position_id=position_id)
-        
-        total = query.count()
-        normal_count = query.filter_by(status='normal').count()
-        abnormal_count = query.filter_by(status='abnormal').count()
-        
-        # 计算出勤率（假设实习期为60个工作日）
-        total_work_days = 60
-        attendance_rate = (normal_count / total_work_days * 100) if total_work_days > 0 else 0
-        
+        counts = compute_checkin_counts(student_id, position_id, start_date, end_date)
         return jsonify({
             'success': True,
-            'data': {
-                'total': total,
-                'normal_count': normal_count,
-                'abnormal_count': abnormal_count,
-                'attendance_rate': round(attendance_rate, 2)
-            }
+            'data': checkin_statistics_data(counts)
         }), 200
         
+    except APIError as e:
+        raise e
     except Exception as e:
         logger.error(f"Get checkin statistics error: {str(e)}", exc_info=True)
         raise APIError('获取签到统计失败', 500)
@@ -1,9 +1,14 @@
 from flask import Blueprint, request, jsonify
 from app import db
 from app.models.position import Position
-from app.models.application import Application
 from app.utils.decorators import token_required, role_required
 from app.utils.errors import APIError
+from app.utils.stats import invalidate_statistics
+from app.utils.checkin_rules import invalidate_checkin_eligibility
+from app.utils.checkin_reevaluation import reevaluate_position_checkins
+from app.utils.jobs import job_queue
+from app.utils.spatial_index import position_index
+from app.utils.bulk_delete import parse_delete_ids, find_blocked_positions, delete_positions
 from app.utils.validators import validate_required, validate_coordinates
 from sqlalchemy import or_
 import logging
@@ -117,6 +122,63 @@ def get_positions():
         logger.error(f"Get positions error: {str(e)}", exc_info=True)
         raise APIError('获取岗位列表失败', 500)
 
+@positions_bp.route('/nearby', methods=['GET'])
+@token_required
+def get_nearby_positions():
+    """获取附近的在招岗位（按距离由近到远）"""
+    try:
+        from flask import current_app
+        latitude = request.args.get('lat', type=float)
+        longitude = request.args.get('lng', type=float)
+        if latitude is None or longitude is None:
+            raise APIError('缺少必填参数: lat, lng', 400, 'MISSING_FIELDS')
+        validate_coordinates(latitude, longitude)
+        
+        radius = request.args.get('radius', current_app.config.get('NEARBY_DEFAULT_RADIUS', 5000), type=float)
+        max_radius = current_app.config.get('NEARBY_MAX_RADIUS', 50000)
+        if radius is None or radius <= 0 or radius > max_radius:
+            raise APIError(f'radius 必须在 0-{max_radius} 米之间', 400, 'INVALID_RADIUS')
+        limit = min(max(request.args.get('limit', 20, type=int) or 20, 1), 100)
+        
+        # 索引可能滞后于其他进程的写入，以数据库状态为准：先按距离分批过滤掉已删除/
+        # 非在招的岗位，凑满 limit 条为止，避免过滤后返回条数不足
+        nearest = position_index.query(latitude, longitude, radius)
+        items = []
+        stale = []
+        for start in range(0, len(nearest), limit):
+            batch = nearest[start:start + limit]
+            positions = {
+                position.id: position
+                for position in Position.query.filter(
+                    Position.id.in_([pid for pid, _ in batch]),
+                    Position.status == 1
+                ).all()
+            }
+            for position_id, distance in batch:
+                position = positions.get(position_id)
+                if position is None:
+                    stale.append(position_id)
+                    continue
+                items.append({**position.to_dict(), 'distance': round(distance, 2)})
+            if len(items) >= limit:
+                break
+        if stale:
+            position_index.remove(*stale)
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'items': items[:limit],
+                'radius': radius
+            }
+        }), 200
+        
+    except APIError as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Get nearby positions error: {str(e)}", exc_info=True)
+        raise APIError('获取附近岗位失败', 500)
+
 @positions_bp.route('/<int:position_id>', methods=['GET'])
 @token_required
 def get_position(position_id):
@@ -174,6 +236,8 @@ def create_position():
         
         db.session.add(position)
         db.session.commit()
+        invalidate_statistics()
+        position_index.update(position)
         
         return jsonify({
             'success': True,
@@ -200,6 +264,7 @@ def update_position(position_id):
             raise APIError('无权修改此岗位', 403)
         
         data = request.get_json()
+        previous_location = (position.latitude, position.longitude, position.checkin_radius)
         
         if 'title' in data:
             position.title = data['title']
@@ -215,6 +280,11 @@ def update_position(position_id):
             validate_coordinates(data['latitude'], data['longitude'])
             position.latitude = data['latitude']
             position.longitude = data['longitude']
+        if 'checkin_radius' in data:
+            checkin_radius = parse_optional_int(data.get('checkin_radius'), 'checkin_radius')
+            if not checkin_radius or checkin_radius <= 0:
+                raise APIError('checkin_radius 必须为正整数', 400, 'INVALID_CHECKIN_RADIUS')
+            position.checkin_radius = checkin_radius
         if 'min_salary' in data or 'max_salary' in data:
             min_salary = normalize_non_negative_int(
                 data.get('min_salary', position.min_salary),
@@ -239,12 +309,26 @@ def update_position(position_id):
             validate_position_status(status_value)
             position.status = status_value
         
+        location_changed = (position.latitude, position.longitude, position.checkin_radius) != previous_location
         db.session.commit()
+        invalidate_statistics()
+        invalidate_checkin_eligibility()
+        position_index.update(position)
+        
+        result = position.to_dict()
+        if location_changed:
+            # 坐标或签到半径变化后，后台按新位置重算该岗位已有签到的距离与状态
+            result['reevaluation_job_id'] = job_queue.submit_tracked(
+                'reevaluate_checkins',
+                reevaluate_position_checkins,
+                position_id,
+                created_by=request.current_user.id
+            )
         
         return jsonify({
             'success': True,
             'message': '更新成功',
-            'data': position.to_dict()
+            'data': result
         }), 200
         
     except APIError as e:
@@ -265,17 +349,14 @@ def delete_position(position_id):
         if position.publisher_id != request.current_user.id and request.current_user.role != 'admin':
             raise APIError('无权删除此岗位', 403)
         
-        # 检查是否有已批准的申请
-        approved_count = Application.query.filter_by(
-            position_id=position_id,
-            status='approved'
-        ).count()
-        
-        if approved_count > 0:
-            raise APIError('该岗位已有学生申请，无法删除', 400)
+        # 与批量删除共用校验与删除路径：同步删除未批准申请、聚合行与通知
+        _, has_approved, has_records = find_blocked_positions([position_id])
+        if has_approved:
+            raise APIError('该岗位已有学生申请，无法删除', 400, 'POSITION_HAS_APPROVED')
+        if has_records:
+            raise APIError('该岗位已有签到或周报记录，无法删除', 400, 'POSITION_HAS_RECORDS')
         
-        db.session.delete(position)
-        db.session.commit()
+        delete_positions([position_id])
         
         return jsonify({
             'success': True,
@@ -295,37 +376,21 @@ def delete_position(position_id):
 def batch_delete_positions():
     """批量删除岗位"""
     try:
-        data = request.get_json() or {}
-        ids = data.get('ids')
-        if not isinstance(ids, list) or not ids:
-            raise APIError('请选择要删除的岗位', 400, 'INVALID_IDS')
+        ids = parse_delete_ids(request.get_json(), '请选择要删除的岗位')
         
-        positions = Position.query.filter(Position.id.in_(ids)).all()
-        if not positions:
+        existing, has_approved, has_records = find_blocked_positions(ids)
+        if not existing:
             raise APIError('未找到对应岗位', 404, 'POSITION_NOT_FOUND')
+        if has_approved:
+            raise APIError(f"以下岗位已有已批准申请，无法删除: {', '.join(has_approved)}", 400, 'POSITION_HAS_APPROVED')
+        if has_records:
+            raise APIError(f"以下岗位已有签到或周报记录，无法删除: {', '.join(has_records)}", 400, 'POSITION_HAS_RECORDS')
         
-        blocked = []
-        for position in positions:
-            approved_count = Application.query.filter_by(
-                position_id=position.id,
-                status='approved'
-            ).count()
-            if approved_count > 0:
-                blocked.append(position.title)
-        
-        if blocked:
-            raise APIError(f"以下岗位已有已批准申请，无法删除: {', '.join(blocked)}", 400, 'POSITION_HAS_APPROVED')
-        
-        deleted_ids = []
-        for position in positions:
-            deleted_ids.append(position.id)
-            db.session.delete(position)
-        
-        db.session.commit()
+        deleted_ids = delete_positions([position_id for position_id in ids if position_id in existing])
         return jsonify({
             'success': True,
             'message': '批量删除成功',
-            'data': {'deleted': deleted_ids}
+            'data': {'deleted': deleted_ids, 'not_found': sorted(set(ids) - set(deleted_ids))}
         }), 200
     except APIError as e:
         raise e
@@ -352,3 +417,13 @@ def get_position_locations():
         logger.error(f"Get position locations error: {str(e)}", exc_info=True)
         raise APIError('获取岗位地点失败', 500)
 
+
+@positions_bp.route('/jobs/<job_id>', methods=['GET'])
+@role_required('admin', 'teacher')
+def get_reevaluation_job(job_id):
+    """查询岗位签到重算任务进度（教师只能查询自己提交的任务）"""
+    from app.models.background_job import BackgroundJob
+    job = BackgroundJob.query.filter_by(id=job_id, type='reevaluate_checkins').first()
+    if not job or (request.current_user.role != 'admin' and job.created_by != request.current_user.id):
+        raise APIError('任务不存在', 404, 'JOB_NOT_FOUND')
+    return jsonify({'success': True, 'data': job.to_dict()}), 200
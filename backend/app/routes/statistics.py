@@ -1,13 +1,26 @@
 from flask import Blueprint, request, jsonify
 from app import db
-from app.models.user import User
 from app.models.position import Position
 from app.models.application import Application
-from app.models.checkin import CheckIn
+from app.models.checkin_daily_stat import CheckInDailyStat
 from app.models.weekly_report import WeeklyReport
 from app.utils.decorators import role_required
 from app.utils.errors import APIError
-from sqlalchemy import func, extract
+from app.utils.stats import (
+    statistics_cache,
+    cached_statistics,
+    compute_overview,
+    attendance_query,
+    attendance_rows,
+    report_submission_query,
+    report_submission_rows,
+    position_distribution_query,
+    position_distribution_rows,
+    EXPORT_BATCH_SIZE,
+    ABSENT_STATUS
+)
+from app.utils.export import export_response
+from sqlalchemy import func
 from datetime import datetime, timedelta
 import logging
 
@@ -17,57 +30,13 @@ statistics_bp = Blueprint('statistics', __name__)
 
 @statistics_bp.route('/overview', methods=['GET'])
 @role_required('admin', 'teacher')
+@cached_statistics('STATISTICS_OVERVIEW_SNAPSHOT_SECONDS')
 def get_overview():
     """获取概览统计"""
     try:
-        # 学生总数
-        total_students = User.query.filter_by(role='student').count()
-        
-        # 岗位总数
-        total_positions = Position.query.count()
-        active_positions = Position.query.filter_by(status=1).count()
-        
-        # 申请总数
-        total_applications = Application.query.count()
-        pending_applications = Application.query.filter_by(status='pending').count()
-        approved_applications = Application.query.filter_by(status='approved').count()
-        
-        # 签到统计
-        total_checkins = CheckIn.query.count()
-        normal_checkins = CheckIn.query.filter_by(status='normal').count()
-        abnormal_checkins = CheckIn.query.filter_by(status='abnormal').count()
-        
-        # 周报统计
-        total_reports = WeeklyReport.query.count()
-        submitted_reports = WeeklyReport.query.filter_by(status='submitted').count()
-        reviewed_reports = WeeklyReport.query.filter_by(status='reviewed').count()
-        
         return jsonify({
             'success': True,
-            'data': {
-                'students': {
-                    'total': total_students
-                },
-                'positions': {
-                    'total': total_positions,
-                    'active': active_positions
-                },
-                'applications': {
-                    'total': total_applications,
-                    'pending': pending_applications,
-                    'approved': approved_applications
-                },
-                'checkins': {
-                    'total': total_checkins,
-                    'normal': normal_checkins,
-                    'abnormal': abnormal_checkins
-                },
-                'reports': {
-                    'total': total_reports,
-                    'submitted': submitted_reports,
-                    'reviewed': reviewed_reports
-                }
-            }
+            'data': compute_overview()
         }), 200
         
     except Exception as e:
@@ -76,40 +45,15 @@ def get_overview():
 
 @statistics_bp.route('/attendance-rate', methods=['GET'])
 @role_required('admin', 'teacher')
+@cached_statistics()
 def get_attendance_rate():
     """获取出勤率统计"""
     try:
-        # 按学生统计出勤率
-        students = User.query.filter_by(role='student').all()
-        attendance_data = []
+        position_id = request.args.get('position_id', type=int)
+        publisher_id = request.args.get('publisher_id', type=int)
         
-        for student in students:
-            # 获取已批准的申请
-            application = Application.query.filter_by(
-                student_id=student.id,
-                status='approved'
-            ).first()
-            
-            if not application:
-                continue
-            
-            # 计算出勤率
-            total_work_days = 60
-            checkin_count = CheckIn.query.filter_by(
-                student_id=student.id,
-                position_id=application.position_id,
-                status='normal'
-            ).count()
-            
-            attendance_rate = (checkin_count / total_work_days * 100) if total_work_days > 0 else 0
-            
-            attendance_data.append({
-                'student_id': student.id,
-                'student_name': student.real_name,
-                'student_id_number': student.student_id,
-                'attendance_rate': round(attendance_rate, 2),
-                'checkin_count': checkin_count
-            })
+        query = attendance_query(position_id=position_id, publisher_id=publisher_id)
+        attendance_data = list(attendance_rows(query.all()))
         
         return jsonify({
             'success': True,
@@ -122,36 +66,15 @@ def get_attendance_rate():
 
 @statistics_bp.route('/report-submission-rate', methods=['GET'])
 @role_required('admin', 'teacher')
+@cached_statistics()
 def get_report_submission_rate():
     """获取周报提交率统计"""
     try:
-        students = User.query.filter_by(role='student').all()
-        submission_data = []
+        position_id = request.args.get('position_id', type=int)
+        publisher_id = request.args.get('publisher_id', type=int)
         
-        for student in students:
-            application = Application.query.filter_by(
-                student_id=student.id,
-                status='approved'
-            ).first()
-            
-            if not application:
-                continue
-            
-            total_weeks = 12
-            report_count = WeeklyReport.query.filter_by(
-                student_id=student.id,
-                position_id=application.position_id
-            ).count()
-            
-            submission_rate = (report_count / total_weeks * 100) if total_weeks > 0 else 0
-            
-            submission_data.append({
-                'student_id': student.id,
-                'student_name': student.real_name,
-                'student_id_number': student.student_id,
-                'submission_rate': round(submission_rate, 2),
-                'report_count': report_count
-            })
+        query = report_submission_query(position_id=position_id, publisher_id=publisher_id)
+        submission_data = list(report_submission_rows(query.all()))
         
         return jsonify({
             'success': True,
@@ -162,39 +85,66 @@ def get_report_submission_rate():
         logger.error(f"Get report submission rate error: {str(e)}", exc_info=True)
         raise APIError('获取周报提交率统计失败', 500)
 
+@statistics_bp.route('/attendance-rate/export', methods=['GET'])
+@role_required('admin', 'teacher')
+def export_attendance_rate():
+    """流式导出出勤率统计（format=csv|ndjson）"""
+    position_id = request.args.get('position_id', type=int)
+    publisher_id = request.args.get('publisher_id', type=int)
+    fmt = request.args.get('format', 'csv')
+    
+    query = attendance_query(position_id=position_id, publisher_id=publisher_id)
+    return export_response(
+        attendance_rows(query.yield_per(EXPORT_BATCH_SIZE)),
+        ['student_id', 'student_name', 'student_id_number', 'attendance_rate', 'checkin_count'],
+        fmt,
+        'attendance_rate'
+    )
+
+@statistics_bp.route('/report-submission-rate/export', methods=['GET'])
+@role_required('admin', 'teacher')
+def export_report_submission_rate():
+    """流式导出周报提交率统计（format=csv|ndjson）"""
+    position_id = request.args.get('position_id', type=int)
+    publisher_id = request.args.get('publisher_id', type=int)
+    fmt = request.args.get('format', 'csv')
+    
+    query = report_submission_query(position_id=position_id, publisher_id=publisher_id)
+    return export_response(
+        report_submission_rows(query.yield_per(EXPORT_BATCH_SIZE)),
+        ['student_id', 'student_name', 'student_id_number', 'submission_rate', 'report_count'],
+        fmt,
+        'report_submission_rate'
+    )
+
 @statistics_bp.route('/position-distribution', methods=['GET'])
 @role_required('admin', 'teacher')
+@cached_statistics()
 def get_position_distribution():
     """获取岗位分布统计"""
     try:
-        positions = Position.query.all()
-        distribution_data = []
+        status = request.args.get('status', type=int)
+        publisher_id = request.args.get('publisher_id', type=int)
+        if status is not None and status not in Position.STATUS_LABELS:
+            raise APIError('岗位状态无效', 400, 'INVALID_POSITION_STATUS')
         
-        for position in positions:
-            application_count = Application.query.filter_by(
-                position_id=position.id,
-                status='approved'
-            ).count()
-            
-            distribution_data.append({
-                'position_id': position.id,
-                'position_title': position.title,
-                'company_name': position.company_name,
-                'student_count': application_count,
-                'max_students': position.max_students
-            })
+        query = position_distribution_query(status=status, publisher_id=publisher_id)
+        distribution_data = list(position_distribution_rows(query.all()))
         
         return jsonify({
             'success': True,
             'data': distribution_data
         }), 200
         
+    except APIError as e:
+        raise e
     except Exception as e:
         logger.error(f"Get position distribution error: {str(e)}", exc_info=True)
         raise APIError('获取岗位分布统计失败', 500)
 
 @statistics_bp.route('/checkin-trend', methods=['GET'])
 @role_required('admin', 'teacher')
+@cached_statistics()
 def get_checkin_trend():
     """获取签到趋势（按日期/周）"""
     try:
@@ -206,22 +156,25 @@ def get_checkin_trend():
         end_date = datetime.now().date()
         start_date = end_date - timedelta(days=days)
         
+        # 仅读取每日汇总表，不扫描签到明细
         if group_by == 'week':
-            label_expr = func.date_format(CheckIn.checkin_date, '%x-第%v周')
+            label_expr = func.date_format(CheckInDailyStat.stat_date, '%x-第%v周')
         else:
-            label_expr = CheckIn.checkin_date
+            label_expr = CheckInDailyStat.stat_date
         
         checkins = db.session.query(
             label_expr.label('label'),
-            func.count(CheckIn.id).label('count')
+            func.sum(CheckInDailyStat.count).label('count')
         ).filter(
-            CheckIn.checkin_date >= start_date,
-            CheckIn.checkin_date <= end_date
+            CheckInDailyStat.stat_date >= start_date,
+            CheckInDailyStat.stat_date <= end_date,
+            # 缺勤补记不算签到
+            CheckInDailyStat.status != ABSENT_STATUS
         ).group_by('label').order_by('label').all()
         
         trend_data = [{
             'label': str(label),
-            'count': count
+            'count': int(count or 0)
         } for label, count in checkins]
         
         return jsonify({
@@ -238,14 +191,18 @@ def get_checkin_trend():
 
 @statistics_bp.route('/weekly-report-rate', methods=['GET'])
 @role_required('admin')
+@cached_statistics()
 def get_weekly_report_rate():
     """获取周报提交率（按岗位/学生）"""
     try:
         group_by = request.args.get('group_by', 'position')
         total_weeks = request.args.get('total_weeks', 12, type=int)
+        sort = request.args.get('sort')
         
         if group_by not in ['position', 'student']:
             raise APIError('group_by参数无效', 400, 'INVALID_GROUP_BY')
+        if sort not in [None, 'rate_asc', 'rate_desc']:
+            raise APIError('sort参数无效', 400, 'INVALID_SORT')
         
         if group_by == 'position':
             positions = {
@@ -284,26 +241,31 @@ def get_weekly_report_rate():
                     'rate': round(rate, 2)
                 })
         else:
-            students = User.query.filter_by(role='student').all()
-            result = []
-            for student in students:
-                application = Application.query.filter_by(
-                    student_id=student.id,
-                    status='approved'
-                ).first()
-                if not application:
-                    continue
-                report_count = WeeklyReport.query.filter_by(
-                    student_id=student.id,
-                    position_id=application.position_id
-                ).count()
-                rate = (report_count / total_weeks * 100) if total_weeks > 0 else 0
-                result.append({
-                    'label': student.real_name or student.username,
-                    'student_id': student.id,
-                    'report_count': report_count,
+            query = report_submission_query(sort=sort)
+            
+            def to_item(row):
+                rate = (row.report_count / total_weeks * 100) if total_weeks > 0 else 0
+                return {
+                    'label': row.student_name or row.username,
+                    'student_id': row.student_id,
+                    'report_count': row.report_count,
                     'rate': round(rate, 2)
-                })
+                }
+            
+            # 传入 page/per_page 时分页返回，否则返回全部学生
+            if 'page' in request.args or 'per_page' in request.args:
+                page = request.args.get('page', 1, type=int)
+                per_page = request.args.get('per_page', 20, type=int)
+                pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+                result = {
+                    'items': [to_item(row) for row in pagination.items],
+                    'total': pagination.total,
+                    'page': page,
+                    'per_page': per_page,
+                    'pages': pagination.pages
+                }
+            else:
+                result = [to_item(row) for row in query.all()]
         
         return jsonify({
             'success': True,
@@ -316,3 +278,12 @@ def get_weekly_report_rate():
         logger.error(f"Get weekly report rate error: {str(e)}", exc_info=True)
         raise APIError('获取周报提交率失败', 500)
 
+
+@statistics_bp.route('/cache-stats', methods=['GET'])
+@role_required('admin')
+def get_cache_stats():
+    """获取统计缓存命中情况（当前进程）"""
+    return jsonify({
+        'success': True,
+        'data': statistics_cache.stats()
+    }), 200
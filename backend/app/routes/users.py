@@ -1,12 +1,23 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from app import db
 from app.models.user import User
 from app.models.message import Message
-from app.utils.decorators import token_required, role_required
+from app.models.background_job import BackgroundJob
+from app.utils.decorators import token_required, role_required, permission_required
 from app.utils.errors import APIError
+from app.utils.jwt import invalidate_user_cache
+from app.utils.jobs import job_queue
+from app.utils.passwords import hash_passwords, password_hash_pool
+from app.utils.pagination import keyset_requested, keyset_paginate
 from app.utils.validators import validate_required, validate_email, validate_phone, validate_student_id
+from sqlalchemy import insert
+import csv
 import logging
 import json
+import os
+import re
+import shutil
+import tempfile
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +37,18 @@ def get_messages():
         if is_read is not None:
             query = query.filter_by(is_read=is_read == 'true')
         
+        # 游标分页：after=<created_at,id>，不统计总数
+        if keyset_requested():
+            result = keyset_paginate(query, Message.created_at, Message.id)
+            return jsonify({
+                'success': True,
+                'data': {
+                    'items': [m.to_dict() for m in result.items],
+                    'per_page': result.per_page,
+                    'next_cursor': result.next_cursor
+                }
+            }), 200
+        
         pagination = query.order_by(Message.created_at.desc()).paginate(
             page=page, per_page=per_page, error_out=False
         )
@@ -41,6 +64,8 @@ def get_messages():
             }
         }), 200
         
+    except APIError as e:
+        raise e
     except Exception as e:
         logger.error(f"Get messages error: {str(e)}", exc_info=True)
         raise APIError('获取消息列表失败', 500)
@@ -71,16 +96,16 @@ def mark_message_read(message_id):
         raise APIError('标记失败', 500)
 
 MODULE_PERMISSIONS = ['positions', 'applications', 'checkins', 'reports', 'statistics', 'users']
+# 批量导入每批处理的用户数
+IMPORT_CHUNK_SIZE = 500
 # CSV 模板，包含表头与示例行（注意使用真实换行符）
 TEMPLATE_CSV = "username,real_name,role,student_id,password,phone,email,status\nstudent001,张三,student,20230001,123456,13800000000,student001@qq.com,1(1启用 0禁用)"
 
 @users_bp.route('', methods=['GET'])
-@role_required('admin', 'teacher')
+@permission_required('users')
 def get_users():
     """获取用户列表（管理员/教师）"""
     try:
-        if request.current_user.role == 'teacher' and 'users' not in request.current_user.get_permissions():
-            raise APIError('权限不足', 403, 'INSUFFICIENT_PERMISSIONS')
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
         role = request.args.get('role', 'student')
@@ -124,12 +149,10 @@ def get_users():
         raise APIError('获取用户列表失败', 500)
 
 @users_bp.route('/<int:user_id>', methods=['GET'])
-@role_required('admin', 'teacher')
+@permission_required('users')
 def get_user(user_id):
     """获取用户详情"""
     try:
-        if request.current_user.role == 'teacher' and 'users' not in request.current_user.get_permissions():
-            raise APIError('权限不足', 403, 'INSUFFICIENT_PERMISSIONS')
         user = User.query.get_or_404(user_id)
         return jsonify({
             'success': True,
@@ -235,6 +258,7 @@ def update_user(user_id):
             user.set_permissions(_normalize_permissions(data.get('permissions')))
 
         db.session.commit()
+        invalidate_user_cache(user.id)
 
         return jsonify({'success': True, 'message': '更新成功', 'data': user.to_dict()}), 200
     except APIError as e:
@@ -262,6 +286,8 @@ def batch_update_user_status():
         for user in users:
             user.status = status
         db.session.commit()
+        for user in users:
+            invalidate_user_cache(user.id)
         return jsonify({
             'success': True,
             'message': '批量更新状态成功',
@@ -296,59 +322,256 @@ def _normalize_permissions(raw):
     return cleaned
 
 
+def _normalize_import_row(item):
+    """规范化导入行：去除空白，空字符串视为未填写"""
+    if not isinstance(item, dict):
+        raise APIError('users 数组元素必须为对象', 400, 'INVALID_USERS')
+    row = {}
+    for key, value in item.items():
+        if isinstance(value, str):
+            value = value.strip()
+            if value == '':
+                value = None
+        row[key] = value
+    return row
+
+
+def _parse_import_status(value):
+    """解析状态列，兼容模板中的 “1(1启用 0禁用)” 写法"""
+    if value is None:
+        return 1
+    if isinstance(value, int):
+        return value
+    match = re.match(r'^\s*(\d+)', str(value))
+    return int(match.group(1)) if match else 1
+
+
+def _validate_import_rows(rows):
+    """导入前校验学号格式（格式错误时整批拒绝），返回总行数"""
+    total = 0
+    for item in rows:
+        row = _normalize_import_row(item)
+        total += 1
+        role = row.get('role') or 'student'
+        if role == 'student' and row.get('username') and row.get('real_name'):
+            validate_student_id(row.get('student_id') or '')
+    return total
+
+
+def _iter_csv_rows(path):
+    """逐行读取与 TEMPLATE_CSV 表头一致的 CSV 文件"""
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        for row in csv.DictReader(f):
+            yield {key.strip(): value for key, value in row.items() if key}
+
+
+def _chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _prepare_import_chunk(chunk, seen_usernames, seen_student_ids):
+    """
+    校验一批导入行并去重（文件内重复及数据库已存在的用户名/学号）
+
+    Returns:
+        (待插入的用户字典列表, 跳过的用户名列表)
+    """
+    chunk = [_normalize_import_row(item) for item in chunk]
+    usernames = {row['username'] for row in chunk if row.get('username')}
+    student_ids = {row['student_id'] for row in chunk if row.get('student_id')}
+    existing_usernames = {
+        username for (username,) in
+        db.session.query(User.username).filter(User.username.in_(usernames))
+    } if usernames else set()
+    existing_student_ids = {
+        student_id for (student_id,) in
+        db.session.query(User.student_id).filter(User.student_id.in_(student_ids))
+    } if student_ids else set()
+    
+    pending = []
+    skipped = []
+    for row in chunk:
+        username = row.get('username')
+        real_name = row.get('real_name')
+        role = row.get('role') or 'student'
+        if not username or not real_name or role not in ['admin', 'teacher', 'student']:
+            skipped.append(username or '未知')
+            continue
+        if username in seen_usernames or username in existing_usernames:
+            skipped.append(username)
+            continue
+        student_id = row.get('student_id') if role == 'student' else None
+        if role == 'student':
+            if student_id in seen_student_ids or student_id in existing_student_ids:
+                skipped.append(username)
+                continue
+            seen_student_ids.add(student_id)
+        seen_usernames.add(username)
+        permissions = _normalize_permissions(row.get('permissions')) if role == 'teacher' else []
+        pending.append({
+            'username': username,
+            'real_name': real_name,
+            'role': role,
+            'status': _parse_import_status(row.get('status')),
+            'student_id': student_id,
+            'phone': row.get('phone'),
+            'email': row.get('email'),
+            'permissions': json.dumps(permissions),
+            'password': row.get('password') or '123456'
+        })
+    return pending, skipped
+
+
+def _import_user_rows(progress, rows, total):
+    """
+    导入用户数据：每批以两次 IN 查询检测已存在的用户名/学号，
+    在进程池（整个导入复用一个）中并行计算密码哈希后批量插入，每批单独提交
+
+    Args:
+        progress: 进度回调 progress(processed, total)，可为 None
+        rows: 用户字典的可迭代对象（列表或流式读取的 CSV 行）
+        total: 总行数
+
+    Returns:
+        {'created': 创建数, 'skipped': 跳过的用户名列表}
+
+    Raises:
+        APIError: 中途失败时 data 中给出已提交的行数（按输入顺序的前 committed_rows 行）
+    """
+    created = 0
+    processed = 0
+    skipped = []
+    seen_usernames = set()
+    seen_student_ids = set()
+    try:
+        with password_hash_pool(total) as pool:
+            for chunk in _chunked(rows, IMPORT_CHUNK_SIZE):
+                pending, chunk_skipped = _prepare_import_chunk(chunk, seen_usernames, seen_student_ids)
+                hashes = hash_passwords([(user['password'], user['role']) for user in pending], pool=pool)
+                for user, password_hash in zip(pending, hashes):
+                    del user['password']
+                    user['password_hash'] = password_hash
+                if pending:
+                    db.session.execute(insert(User), pending)
+                db.session.commit()
+                created += len(pending)
+                skipped.extend(chunk_skipped)
+                processed += len(chunk)
+                if progress:
+                    progress(processed, total)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Import users aborted after {processed} rows: {str(e)}", exc_info=True)
+        raise APIError(
+            f'导入中断：前 {processed} 行已提交（创建 {created} 个用户），其余未导入',
+            500,
+            'IMPORT_PARTIAL',
+            data={'created': created, 'skipped': skipped, 'committed_rows': processed, 'total': total}
+        )
+    return {'created': created, 'skipped': skipped}
+
+
+def _import_csv_file(progress, path, total):
+    """后台导入已暂存的 CSV 文件，完成后删除文件"""
+    try:
+        return _import_user_rows(progress, _iter_csv_rows(path), total)
+    finally:
+        os.remove(path)
+
+
+def _spool_csv_upload():
+    """将上传的 CSV（multipart 文件字段 file 或 text/csv 请求体）流式写入临时文件"""
+    upload = request.files.get('file')
+    source = upload.stream if upload else request.stream
+    fd, path = tempfile.mkstemp(prefix='users_import_', suffix='.csv')
+    with os.fdopen(fd, 'wb') as f:
+        shutil.copyfileobj(source, f)
+    return path
+
+
 @users_bp.route('/import', methods=['POST'])
 @role_required('admin')
 def import_users():
-    """批量导入用户，接受 JSON 数组 users"""
+    """
+    批量导入用户
+    接受 JSON 数组 users，或与模板表头一致的 CSV（multipart 字段 file / text/csv 请求体）；
+    数量较多或 async=1 时转为后台任务
+    """
+    path = None
     try:
+        threshold = current_app.config.get('USER_IMPORT_ASYNC_THRESHOLD', 200)
+        run_async = request.args.get('async', type=int) == 1
+        
+        if request.files.get('file') or request.mimetype == 'text/csv':
+            path = _spool_csv_upload()
+            total = _validate_import_rows(_iter_csv_rows(path))
+            if total == 0:
+                raise APIError('CSV 中没有可导入的用户', 400, 'INVALID_USERS')
+            if run_async or total > threshold:
+                job_id = job_queue.submit_tracked(
+                    'import_users',
+                    _import_csv_file,
+                    path,
+                    total,
+                    created_by=request.current_user.id
+                )
+                path = None
+                return jsonify({
+                    'success': True,
+                    'message': '导入任务已提交',
+                    'data': {'job_id': job_id, 'total': total}
+                }), 202
+            result = _import_user_rows(None, _iter_csv_rows(path), total)
+            return jsonify({'success': True, 'data': result}), 200
+        
         payload = request.get_json() or {}
         users_data = payload.get('users')
         if not isinstance(users_data, list) or len(users_data) == 0:
             raise APIError('users 必须为非空数组', 400, 'INVALID_USERS')
-        created = 0
-        skipped = []
-        for item in users_data:
-            username = (item.get('username') or '').strip()
-            real_name = (item.get('real_name') or '').strip()
-            role = (item.get('role') or 'student').strip()
-            password = item.get('password') or '123456'
-            status = item.get('status', 1)
-            if not username or not real_name or role not in ['admin', 'teacher', 'student']:
-                skipped.append(username or '未知')
-                continue
-            if User.query.filter_by(username=username).first():
-                skipped.append(username)
-                continue
-            student_id = item.get('student_id')
-            if role == 'student':
-                validate_student_id(student_id or '')
-                if User.query.filter_by(student_id=student_id).first():
-                    skipped.append(username)
-                    continue
-            user = User(
-                username=username,
-                real_name=real_name,
-                role=role,
-                status=status,
-                student_id=student_id if role == 'student' else None,
-                phone=item.get('phone'),
-                email=item.get('email')
+        total = _validate_import_rows(users_data)
+        
+        if run_async or total > threshold:
+            job_id = job_queue.submit_tracked(
+                'import_users',
+                _import_user_rows,
+                users_data,
+                total,
+                created_by=request.current_user.id
             )
-            user.set_password(password)
-            if role == 'teacher':
-                user.set_permissions(_normalize_permissions(item.get('permissions')))
-            else:
-                user.set_permissions([])
-            db.session.add(user)
-            created += 1
-        db.session.commit()
-        return jsonify({'success': True, 'data': {'created': created, 'skipped': skipped}}), 200
+            return jsonify({
+                'success': True,
+                'message': '导入任务已提交',
+                'data': {'job_id': job_id, 'total': total}
+            }), 202
+        
+        result = _import_user_rows(None, users_data, total)
+        return jsonify({'success': True, 'data': result}), 200
     except APIError as e:
         raise e
     except Exception as e:
         db.session.rollback()
         logger.error(f"Import users error: {str(e)}", exc_info=True)
         raise APIError('批量导入失败', 500)
+    finally:
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+@users_bp.route('/import/jobs/<job_id>', methods=['GET'])
+@role_required('admin')
+def get_import_job(job_id):
+    """查询批量导入任务进度"""
+    job = BackgroundJob.query.filter_by(id=job_id, type='import_users').first()
+    if not job:
+        raise APIError('导入任务不存在', 404, 'JOB_NOT_FOUND')
+    return jsonify({'success': True, 'data': job.to_dict()}), 200
 
 
 @users_bp.route('/import/template', methods=['GET'])
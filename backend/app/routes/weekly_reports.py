@@ -4,10 +4,14 @@ from app import db
 from app.models.weekly_report import WeeklyReport
 from app.models.application import Application
 from app.models.position import Position
-from app.models.message import Message
 from app.utils.decorators import token_required, role_required
 from app.utils.errors import APIError
+from app.utils.stats import invalidate_statistics
 from app.utils.validators import validate_required
+from app.utils.credit import apply_credit_delta
+from app.utils.messages import send_messages
+from app.utils.pagination import keyset_requested, keyset_paginate
+from app.utils.bulk_delete import parse_delete_ids, delete_reports
 from flask import current_app
 import os
 import logging
@@ -48,6 +52,18 @@ def get_weekly_reports():
         if status:
             query = query.filter_by(status=status)
         
+        # 游标分页：after=<week_number,id>，不统计总数
+        if keyset_requested():
+            result = keyset_paginate(query, WeeklyReport.week_number, WeeklyReport.id)
+            return jsonify({
+                'success': True,
+                'data': {
+                    'items': [r.to_dict() for r in result.items],
+                    'per_page': result.per_page,
+                    'next_cursor': result.next_cursor
+                }
+            }), 200
+        
         pagination = query.order_by(WeeklyReport.week_number.desc(), WeeklyReport.created_at.desc()).paginate(
             page=page, per_page=per_page, error_out=False
         )
@@ -63,6 +79,8 @@ def get_weekly_reports():
             }
         }), 200
         
+    except APIError as e:
+        raise e
     except Exception as e:
         logger.error(f"Get weekly reports error: {str(e)}", exc_info=True)
         raise APIError('获取周报列表失败', 500)
@@ -133,19 +151,19 @@ def create_weekly_report():
         )
         
         db.session.add(report)
+        apply_credit_delta(request.current_user.id, position_id, report_count=1)
         db.session.commit()
+        invalidate_statistics()
         
         # 发送消息给教师
         position = Position.query.get(position_id)
-        message = Message(
-            user_id=position.publisher_id,
-            title='新的周报提交',
-            content=f'{request.current_user.real_name}提交了第{data["week_number"]}周周报',
-            type='report',
-            related_id=report.id
-        )
-        db.session.add(message)
-        db.session.commit()
+        send_messages({
+            'user_id': position.publisher_id,
+            'title': '新的周报提交',
+            'content': f'{request.current_user.real_name}提交了第{data["week_number"]}周周报',
+            'type': 'report',
+            'related_id': report.id
+        })
         
         return jsonify({
             'success': True,
@@ -226,17 +244,15 @@ def upload_attachment():
 def batch_delete_reports():
     """批量删除周报"""
     try:
-        data = request.get_json() or {}
-        ids = data.get('ids')
-        if not isinstance(ids, list) or not ids:
-            raise APIError('请选择需要删除的周报', 400, 'INVALID_IDS')
-        reports = WeeklyReport.query.filter(WeeklyReport.id.in_(ids)).all()
-        if not reports:
+        ids = parse_delete_ids(request.get_json(), '请选择需要删除的周报')
+        deleted = delete_reports(ids)
+        if not deleted:
             raise APIError('未找到对应周报', 404, 'REPORT_NOT_FOUND')
-        for report in reports:
-            db.session.delete(report)
-        db.session.commit()
-        return jsonify({'success': True, 'message': '批量删除成功', 'data': {'deleted': ids}}), 200
+        return jsonify({
+            'success': True,
+            'message': '批量删除成功',
+            'data': {'deleted': deleted, 'not_found': sorted(set(ids) - set(deleted))}
+        }), 200
     except APIError as e:
         raise e
     except Exception as e:
@@ -258,6 +274,7 @@ def review_weekly_report(report_id):
         if not (0 <= score <= 100):
             raise APIError('评分必须在0-100之间', 400, 'INVALID_SCORE')
         
+        previous_score = report.score
         report.score = score
         report.comment = data['comment']
         report.reviewer_id = request.current_user.id
@@ -265,24 +282,24 @@ def review_weekly_report(report_id):
         from datetime import datetime
         report.reviewed_at = datetime.utcnow()
         
+        # 按评分增量更新学生信用分，与批改在同一事务中提交
+        apply_credit_delta(
+            report.student_id,
+            report.position_id,
+            scored_report_count=0 if previous_score is not None else 1,
+            score_sum=score - (previous_score or 0)
+        )
         db.session.commit()
-        
-        # 更新学生信用分
-        from app.utils.credit import calculate_credit_score
-        credit_score = calculate_credit_score(report.student_id)
-        report.student.credit_score = credit_score
-        db.session.commit()
+        invalidate_statistics()
         
         # 发送消息给学生
-        message = Message(
-            user_id=report.student_id,
-            title='周报批改完成',
-            content=f'您的第{report.week_number}周周报已批改，得分：{score}',
-            type='report',
-            related_id=report.id
-        )
-        db.session.add(message)
-        db.session.commit()
+        send_messages({
+            'user_id': report.student_id,
+            'title': '周报批改完成',
+            'content': f'您的第{report.week_number}周周报已批改，得分：{score}',
+            'type': 'report',
+            'related_id': report.id
+        })
         
         return jsonify({
             'success': True,
@@ -0,0 +1,236 @@
+from app import db
+from app.models.application import Application
+from app.models.checkin import CheckIn
+from app.models.position import Position
+from app.utils.checkin_ingest import is_duplicate_checkin
+from app.utils.checkin_rollup import apply_checkin_deltas
+from app.utils.checkin_rules import parse_checkin_window
+from app.utils.stats import ABSENT_STATUS, invalidate_statistics, invalidate_student_checkin_statistics
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+from flask import current_app
+from sqlalchemy import and_, exists, func, insert, select
+from sqlalchemy.exc import IntegrityError
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+ABSENCE_REASON = '未签到'
+# 与其他写入冲突时单个分块重试的次数
+_CHUNK_ATTEMPTS = 3
+
+
+def absence_weekdays():
+    """需要补记缺勤的星期（0=周一），取自 CHECKIN_ABSENCE_WEEKDAYS"""
+    return set(current_app.config.get('CHECKIN_ABSENCE_WEEKDAYS', (0, 1, 2, 3, 4)))
+
+
+def _eligible_applications(target_date, low_id, high_id):
+    """
+    分块内当天应签到却没有任何签到记录的已批准申请（反连接）
+    审核通过时间晚于当天的申请不计，回填历史日期时不会给当时尚未入岗的学生记缺勤
+    """
+    day_end = datetime.combine(target_date + timedelta(days=1), time.min)
+    return and_(
+        Application.status == 'approved',
+        Application.id > low_id,
+        Application.id <= high_id,
+        func.coalesce(Application.reviewed_at, Application.created_at) < day_end,
+        ~exists().where(
+            CheckIn.student_id == Application.student_id,
+            CheckIn.position_id == Application.position_id,
+            CheckIn.checkin_date == target_date
+        )
+    )
+
+
+def _insert_chunk(target_date, low_id, high_id, checkin_time, now):
+    """
+    查出分块内缺勤的 (学生, 岗位) 并以一条多行插入写入缺勤记录，按同一份列表同步每日汇总（不提交）
+    汇总增量直接由写入的行得出，不依赖其他事务的写入；查询之后其他进程写入了同一唯一键时
+    整块插入失败回滚，由调用方重试
+
+    Returns:
+        写入的 [(学生ID, 岗位ID), ...]
+    """
+    pairs = db.session.execute(
+        select(Application.student_id, Application.position_id).join(
+            Position, Position.id == Application.position_id
+        ).where(
+            _eligible_applications(target_date, low_id, high_id)
+        ).distinct()
+    ).all()
+    if not pairs:
+        return []
+    db.session.execute(insert(CheckIn), [
+        {
+            'student_id': student_id,
+            'position_id': position_id,
+            'checkin_date': target_date,
+            'checkin_time': checkin_time,
+            'latitude': 0.0,
+            'longitude': 0.0,
+            'distance': 0.0,
+            'status': ABSENT_STATUS,
+            'abnormal_reason': ABSENCE_REASON,
+            'created_at': now,
+            'updated_at': now
+        }
+        for student_id, position_id in pairs
+    ])
+    apply_checkin_deltas(Counter(
+        (target_date, position_id, ABSENT_STATUS) for _, position_id in pairs
+    ))
+    return pairs
+
+
+def mark_absences(target_date, chunk_size=1000, progress=None):
+    """
+    为指定日期没有签到记录的已批准学生补记 not_signed 签到
+    按申请ID分块执行，每块一个事务；已有记录（含已补记的缺勤）通过反连接跳过，
+    因此可重复执行、可用于回填历史日期
+
+    Args:
+        target_date: 日期，须早于今天（当天学生仍可签到）
+        chunk_size: 每块覆盖的申请ID数
+        progress: progress(processed, total) 进度回调，processed/total 为申请ID跨度
+
+    Returns:
+        写入的缺勤记录数
+    """
+    if target_date >= date.today():
+        raise ValueError(f'只能为今天之前的日期补记缺勤: {target_date.isoformat()}')
+
+    low, high = db.session.query(
+        func.min(Application.id), func.max(Application.id)
+    ).filter(Application.status == 'approved').one()
+    db.session.commit()
+    if low is None:
+        return 0
+
+    _, end_time = parse_checkin_window(
+        current_app.config.get('CHECKIN_WORKDAY_START', '09:00'),
+        current_app.config.get('CHECKIN_WORKDAY_END', '18:00')
+    )
+    checkin_time = datetime.combine(target_date, end_time)
+    span = high - low + 1
+    students = set()
+    written = 0
+    chunk_low = low - 1
+    while chunk_low < high:
+        chunk_high = min(chunk_low + chunk_size, high)
+        for attempt in range(_CHUNK_ATTEMPTS):
+            try:
+                inserted = _insert_chunk(target_date, chunk_low, chunk_high, checkin_time, datetime.utcnow())
+                db.session.commit()
+                break
+            except IntegrityError as e:
+                # 其他进程同时为同一学生写入了该日记录，回滚后重新执行反连接
+                db.session.rollback()
+                if not is_duplicate_checkin(e) or attempt == _CHUNK_ATTEMPTS - 1:
+                    raise
+        written += len(inserted)
+        students.update(student_id for student_id, _ in inserted)
+        chunk_low = chunk_high
+        if progress:
+            progress(chunk_high - low + 1, span)
+
+    if written:
+        invalidate_statistics()
+        invalidate_student_checkin_statistics(students)
+    logger.info(f"absence_marked|date={target_date.isoformat()}|inserted={written}")
+    return written
+
+
+def mark_absence_range(progress, start_date, end_date, chunk_size=1000):
+    """
+    按日期范围补记缺勤（后台任务函数），跳过 CHECKIN_ABSENCE_WEEKDAYS 以外的日期
+
+    Returns:
+        {'dates': {日期: 写入条数}, 'inserted': 总条数}
+    """
+    weekdays = absence_weekdays()
+    dates = [
+        start_date + timedelta(days=offset)
+        for offset in range((end_date - start_date).days + 1)
+    ]
+    dates = [day for day in dates if day.weekday() in weekdays]
+    result = {}
+    for index, day in enumerate(dates):
+        result[day.isoformat()] = mark_absences(day, chunk_size)
+        if progress:
+            progress(index + 1, len(dates))
+    return {'dates': result, 'inserted': sum(result.values())}
+
+
+class AbsenceScheduler:
+    """
+    进程内缺勤补记定时器
+    配置 CHECKIN_ABSENCE_SCHEDULE（HH:MM）后，每天该时刻以后台任务补记此前
+    CHECKIN_ABSENCE_LOOKBACK_DAYS 天的缺勤（可补上停机期间漏跑的日期）；
+    多进程部署时只应在一个进程中开启
+    """
+
+    def __init__(self, app=None):
+        self.run_at = None
+        self.lookback_days = 3
+        self.chunk_size = 1000
+        self._app = None
+        self._thread = None
+        self._stop = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        schedule = app.config.get('CHECKIN_ABSENCE_SCHEDULE')
+        self.run_at = time.fromisoformat(schedule) if schedule else None
+        self.lookback_days = app.config.get('CHECKIN_ABSENCE_LOOKBACK_DAYS', 3)
+        self.chunk_size = app.config.get('CHECKIN_ABSENCE_CHUNK_SIZE', 1000)
+        self._app = app
+        app.extensions['absence_scheduler'] = self
+        if self.run_at is not None:
+            self.start()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='absence-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _seconds_until_next_run(self):
+        now = datetime.now()
+        next_run = datetime.combine(now.date(), self.run_at)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        return (next_run - now).total_seconds()
+
+    def _run(self):
+        while not self._stop.wait(self._seconds_until_next_run()):
+            self.run_once()
+
+    def run_once(self):
+        """提交一次补记任务，返回任务ID"""
+        from app.utils.jobs import job_queue
+        today = date.today()
+        with self._app.app_context():
+            try:
+                return job_queue.submit_tracked(
+                    'mark_absences',
+                    mark_absence_range,
+                    today - timedelta(days=self.lookback_days),
+                    today - timedelta(days=1),
+                    self.chunk_size
+                )
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Schedule absence job error: {str(e)}", exc_info=True)
+            finally:
+                db.session.remove()
+
+
+absence_scheduler = AbsenceScheduler()
@@ -0,0 +1,242 @@
+from app import db
+from app.models.application import Application
+from app.models.checkin import CheckIn
+from app.models.checkin_daily_stat import CheckInDailyStat
+from app.models.message import Message
+from app.models.position import Position
+from app.models.student_credit_stat import StudentCreditStat
+from app.models.weekly_report import WeeklyReport
+from app.utils.checkin_rollup import record_checkins
+from app.utils.checkin_rules import invalidate_checkin_eligibility
+from app.utils.credit import apply_credit_delta, checkin_credit_delta
+from app.utils.errors import APIError
+from app.utils.spatial_index import position_index
+from app.utils.stats import invalidate_statistics, invalidate_student_checkin_statistics
+from collections import Counter
+from sqlalchemy import delete, exists, func, select
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 每个 DELETE ... WHERE id IN (...) 及其事务覆盖的ID数
+DELETE_CHUNK_SIZE = 500
+
+
+def parse_delete_ids(data, message):
+    """
+    解析批量删除请求中的 ids（整数列表，去重并保持顺序）
+
+    Args:
+        data: 请求JSON
+        message: ids 缺失或为空时的提示
+    """
+    ids = (data or {}).get('ids')
+    if not isinstance(ids, list) or not ids:
+        raise APIError(message, 400, 'INVALID_IDS')
+    try:
+        parsed = [int(value) for value in ids if not isinstance(value, bool)]
+    except (TypeError, ValueError):
+        parsed = None
+    if not parsed or len(parsed) != len(ids):
+        raise APIError('ids 须为整数列表', 400, 'INVALID_IDS')
+    return list(dict.fromkeys(parsed))
+
+
+def _chunks(ids, size):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def delete_related_messages(message_type, related_ids):
+    """删除关联到被删记录的站内消息（在调用方事务内执行）"""
+    if related_ids:
+        db.session.execute(delete(Message).where(
+            Message.type == message_type,
+            Message.related_id.in_(related_ids)
+        ))
+
+
+def bulk_delete(model, ids, columns=(), before_delete=None, after_commit=None, chunk_size=DELETE_CHUNK_SIZE):
+    """
+    分块批量删除：每块先锁定读取需要的字段，由 before_delete 处理聚合与依赖记录，
+    再以 DELETE ... WHERE id IN (...) 删除，每块一个事务，避免长时间持有行锁
+    不加载ORM对象，也不逐条 session.delete
+
+    Args:
+        model: 模型类
+        ids: 待删除ID列表
+        columns: before_delete/after_commit 需要的字段（id 总会读取）
+        before_delete: before_delete(rows) 在删除前于同一事务内调用，rows 为 Row 列表
+        after_commit: after_commit(rows) 在每块提交后调用，用于失效缓存；
+            后续分块失败时已提交分块的缓存也已失效
+        chunk_size: 每块ID数
+
+    Returns:
+        实际删除的ID列表（按请求顺序）
+
+    Raises:
+        APIError: 部分分块已提交后失败时，data.deleted 为已删除的ID列表
+    """
+    deleted = []
+    try:
+        for chunk in _chunks(ids, chunk_size):
+            rows = db.session.execute(
+                select(model.id, *columns).where(model.id.in_(chunk)).with_for_update()
+            ).all()
+            if not rows:
+                db.session.rollback()
+                continue
+            row_ids = [row.id for row in rows]
+            if before_delete:
+                before_delete(rows)
+            db.session.execute(
+                delete(model).where(model.id.in_(row_ids)).execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            found = set(row_ids)
+            deleted.extend(record_id for record_id in chunk if record_id in found)
+            if after_commit:
+                after_commit(rows)
+    except Exception as e:
+        db.session.rollback()
+        if not deleted:
+            raise
+        # 之前的分块已提交，把已删除的ID随错误返回，调用方据此核对
+        logger.error(f"bulk_delete_partial|table={model.__tablename__}|deleted={deleted}")
+        if isinstance(e, APIError):
+            raise APIError(e.message, e.status_code, e.error_code, data={**(e.data or {}), 'deleted': deleted}) from e
+        raise APIError('批量删除部分完成，其余记录删除失败', 500, 'PARTIAL_DELETE', data={'deleted': deleted}) from e
+    if deleted:
+        logger.info(f"bulk_delete|table={model.__tablename__}|requested={len(ids)}|deleted={len(deleted)}")
+    return deleted
+
+
+def _before_delete_checkins(rows):
+    # 信用聚合须在明细删除前调整，以免首次初始化聚合行时漏减
+    credit_deltas = {}
+    for row in rows:
+        deltas = credit_deltas.setdefault((row.student_id, row.position_id), Counter())
+        deltas.update(checkin_credit_delta(row.status, sign=-1))
+    for (student_id, position_id), deltas in credit_deltas.items():
+        if deltas:
+            apply_credit_delta(student_id, position_id, **deltas)
+    record_checkins(rows, sign=-1)
+    delete_related_messages('checkin', [row.id for row in rows])
+
+
+def _after_delete_checkins(rows):
+    invalidate_statistics()
+    invalidate_student_checkin_statistics({row.student_id for row in rows})
+
+
+def delete_checkins(ids):
+    """批量删除签到，同步信用聚合与每日汇总，并删除签到通知"""
+    return bulk_delete(
+        CheckIn, ids,
+        columns=(CheckIn.student_id, CheckIn.position_id, CheckIn.checkin_date, CheckIn.status),
+        before_delete=_before_delete_checkins,
+        after_commit=_after_delete_checkins
+    )
+
+
+def _before_delete_reports(rows):
+    credit_deltas = {}
+    for row in rows:
+        deltas = credit_deltas.setdefault((row.student_id, row.position_id), Counter())
+        deltas['report_count'] -= 1
+        if row.score is not None:
+            deltas['scored_report_count'] -= 1
+            deltas['score_sum'] -= row.score
+    for (student_id, position_id), deltas in credit_deltas.items():
+        apply_credit_delta(student_id, position_id, **deltas)
+    delete_related_messages('report', [row.id for row in rows])
+
+
+def delete_reports(ids):
+    """批量删除周报，同步信用聚合，并删除周报通知"""
+    return bulk_delete(
+        WeeklyReport, ids,
+        columns=(WeeklyReport.student_id, WeeklyReport.position_id, WeeklyReport.score),
+        before_delete=_before_delete_reports,
+        after_commit=lambda rows: invalidate_statistics()
+    )
+
+
+def _before_delete_applications(rows):
+    delete_related_messages('application', [row.id for row in rows])
+
+
+def _after_delete_applications(rows):
+    invalidate_statistics()
+    invalidate_checkin_eligibility()
+
+
+def delete_applications(ids):
+    """批量删除申请及其审核通知（学生已有的签到、周报保留）"""
+    return bulk_delete(
+        Application, ids,
+        before_delete=_before_delete_applications,
+        after_commit=_after_delete_applications
+    )
+
+
+def find_blocked_positions(ids, chunk_size=DELETE_CHUNK_SIZE):
+    """
+    以一条分组查询（每块）检查岗位能否删除
+
+    Returns:
+        (存在的岗位ID集合, 有已批准申请的岗位名称列表, 已有签到或周报的岗位名称列表)
+    """
+    approved = select(func.count(Application.id)).where(
+        Application.position_id == Position.id,
+        Application.status == 'approved'
+    ).scalar_subquery()
+    existing, has_approved, has_records = set(), [], []
+    for chunk in _chunks(ids, chunk_size):
+        rows = db.session.execute(select(
+            Position.id,
+            Position.title,
+            approved.label('approved_count'),
+            exists().where(CheckIn.position_id == Position.id).label('has_checkins'),
+            exists().where(WeeklyReport.position_id == Position.id).label('has_reports')
+        ).where(Position.id.in_(chunk))).all()
+        for row in rows:
+            existing.add(row.id)
+            if row.approved_count:
+                has_approved.append(row.title)
+            elif row.has_checkins or row.has_reports:
+                has_records.append(row.title)
+    db.session.commit()
+    return existing, has_approved, has_records
+
+
+def _before_delete_positions(rows):
+    position_ids = [row.id for row in rows]
+    # 校验之后到删除之前可能有申请被批准，岗位行已加锁，此处再确认一次
+    if db.session.execute(select(Application.id).where(
+        Application.position_id.in_(position_ids),
+        Application.status == 'approved'
+    ).limit(1)).first():
+        raise APIError('岗位已有已批准申请，无法删除', 400, 'POSITION_HAS_APPROVED')
+    application_ids = db.session.execute(
+        select(Application.id).where(Application.position_id.in_(position_ids))
+    ).scalars().all()
+    delete_related_messages('application', application_ids)
+    db.session.execute(delete(Application).where(Application.position_id.in_(position_ids)))
+    db.session.execute(delete(StudentCreditStat).where(StudentCreditStat.position_id.in_(position_ids)))
+    db.session.execute(delete(CheckInDailyStat).where(CheckInDailyStat.position_id.in_(position_ids)))
+
+
+def _after_delete_positions(rows):
+    invalidate_statistics()
+    invalidate_checkin_eligibility()
+    position_index.remove(*(row.id for row in rows))
+
+
+def delete_positions(ids):
+    """批量删除岗位及其未批准的申请（调用前须用 find_blocked_positions 校验）"""
+    return bulk_delete(
+        Position, ids,
+        before_delete=_before_delete_positions,
+        after_commit=_after_delete_positions
+    )
@@ -0,0 +1,453 @@
+from app import db
+from app.models.checkin import CheckIn
+from app.models.message import Message
+from app.utils.cache import TTLCache
+from app.utils.checkin_rollup import apply_checkin_deltas
+from app.utils.credit import apply_credit_delta, checkin_credit_delta
+from app.utils.errors import APIError
+from app.utils.stats import invalidate_statistics
+from collections import Counter, deque
+from datetime import date, datetime
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError, InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+# 签到记录中需要在写入spool时转换格式的字段
+_DATE_FIELDS = ('checkin_date',)
+_DATETIME_FIELDS = ('checkin_time',)
+# 多进程写入冲突时整批重试的次数
+_WRITE_ATTEMPTS = 3
+# 连接断开、锁等待超时等与具体记录无关的错误：整批放回缓冲稍后重试
+_TRANSIENT_ERRORS = (OperationalError, InterfaceError, PoolTimeoutError)
+# 连续提交失败时的最长重试间隔（秒）
+_MAX_RETRY_DELAY = 30
+
+
+def is_duplicate_checkin(error):
+    """IntegrityError 是否由签到唯一键 (学生, 岗位, 日期) 冲突引起（其他约束错误须照常抛出）"""
+    message = str(getattr(error, 'orig', error))
+    # MySQL 报约束名；SQLite 只报列名
+    return (
+        'uq_checkin_student_position_date' in message
+        or 'checkins.student_id, checkins.position_id, checkins.checkin_date' in message
+    )
+
+
+def checkin_record_key(record):
+    """签到记录的唯一键：(学生ID, 岗位ID, 签到日期)"""
+    return (record['student_id'], record['position_id'], record['checkin_date'])
+
+
+def _encode_record(record):
+    data = dict(record)
+    for field in _DATE_FIELDS + _DATETIME_FIELDS:
+        if data.get(field) is not None:
+            data[field] = data[field].isoformat()
+    return json.dumps(data, ensure_ascii=False)
+
+
+def _decode_record(line):
+    data = json.loads(line)
+    for field in _DATE_FIELDS:
+        if data.get(field):
+            data[field] = date.fromisoformat(data[field])
+    for field in _DATETIME_FIELDS:
+        if data.get(field):
+            data[field] = datetime.fromisoformat(data[field])
+    return data
+
+
+def _spool_owner(name):
+    """spool 文件的所属进程 (pid, token)；正在重放的文件归重放它的进程所有"""
+    if '.recovering-' in name:
+        owner = name.rsplit('.recovering-', 1)[1]
+    else:
+        owner = name[len('checkins-'):].split('.', 1)[0]
+    pid, token = owner.split('-', 1)
+    return int(pid), token
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _write_once(records):
+    unique = {}
+    for record in records:
+        unique.setdefault(checkin_record_key(record), record)
+
+    # 已落库的记录（spool 重放或其他进程已写入）直接跳过，保证重复写入幂等
+    existing = set(db.session.execute(
+        select(CheckIn.student_id, CheckIn.position_id, CheckIn.checkin_date).where(
+            CheckIn.student_id.in_({key[0] for key in unique}),
+            CheckIn.checkin_date.in_({key[2] for key in unique})
+        )
+    ).all())
+    pending = [record for key, record in unique.items() if key not in existing]
+    if not pending:
+        return 0
+
+    # 信用聚合须在明细插入前调整，以免首次初始化聚合行时重复计入
+    credit_deltas = {}
+    rollup_deltas = Counter()
+    for record in pending:
+        deltas = credit_deltas.setdefault((record['student_id'], record['position_id']), Counter())
+        deltas.update(checkin_credit_delta(record['status']))
+        rollup_deltas[(record['checkin_date'], record['position_id'], record['status'])] += 1
+    for (student_id, position_id), deltas in credit_deltas.items():
+        if deltas:
+            apply_credit_delta(student_id, position_id, **deltas)
+
+    now = datetime.utcnow()
+    db.session.execute(insert(CheckIn), [
+        {
+            'student_id': record['student_id'],
+            'position_id': record['position_id'],
+            'checkin_date': record['checkin_date'],
+            'checkin_time': record['checkin_time'],
+            'latitude': record['latitude'],
+            'longitude': record['longitude'],
+            'distance': record['distance'],
+            'status': record['status'],
+            'abnormal_reason': record.get('abnormal_reason'),
+            'remark': record.get('remark'),
+            'created_at': now,
+            'updated_at': now
+        }
+        for record in pending
+    ])
+
+    # 通知需要关联签到ID，按唯一键一次查回
+    pending_keys = {checkin_record_key(record) for record in pending}
+    ids = {
+        (student_id, position_id, checkin_date): checkin_id
+        for checkin_id, student_id, position_id, checkin_date in db.session.execute(
+            select(CheckIn.id, CheckIn.student_id, CheckIn.position_id, CheckIn.checkin_date).where(
+                CheckIn.student_id.in_({key[0] for key in pending_keys}),
+                CheckIn.checkin_date.in_({key[2] for key in pending_keys})
+            )
+        )
+    }
+    db.session.execute(insert(Message), [
+        {
+            'user_id': record['student_id'],
+            'title': '签到通知',
+            'content': record['message'],
+            'type': 'checkin',
+            'is_read': False,
+            'related_id': ids.get(checkin_record_key(record)),
+            'created_at': now
+        }
+        for record in pending
+    ])
+    apply_checkin_deltas(rollup_deltas)
+    db.session.commit()
+    return len(pending)
+
+
+def write_checkins(records):
+    """
+    将一批已校验的签到及其通知以多行插入写入数据库（单个事务）
+    已存在相同 (学生, 岗位, 日期) 的记录会被跳过，因此可安全重放
+
+    Returns:
+        实际写入的签到数
+    """
+    for attempt in range(_WRITE_ATTEMPTS):
+        try:
+            return _write_once(records)
+        except IntegrityError as e:
+            # 其他进程在查重与插入之间写入了同一唯一键，回滚后重新查重
+            db.session.rollback()
+            if not is_duplicate_checkin(e) or attempt == _WRITE_ATTEMPTS - 1:
+                raise
+
+
+class CheckinBuffer:
+    """
+    签到写入缓冲（write-behind）
+    请求线程同步校验后把签到与通知追加到进程内缓冲，后台线程每 flush_interval_ms 毫秒
+    或累计 max_rows 条时以多行插入批量提交。配置 spool_dir 时，记录在返回前先追加写入
+    本进程的 spool 文件，进程崩溃后由下一个进程重放
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.flush_interval = 0.2
+        self.max_rows = 500
+        self.spool_dir = None
+        self.spool_fsync = True
+        self.max_pending = 20000
+        self.max_retries = 10
+        self.accepted = TTLCache(maxsize=100000, ttl=86400)
+        self._app = None
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._spool = None
+        self._spool_path = None
+        self._flushing_files = []
+        self._owner_id = None
+        self._failures = 0
+        self._retry_at = 0.0
+        # 进程退出前提交缓冲中剩余的记录（只注册一次）
+        atexit.register(self.flush)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('CHECKIN_INGEST_MODE', 'direct') == 'buffered'
+        self.flush_interval = app.config.get('CHECKIN_BUFFER_FLUSH_MS', 200) / 1000
+        self.max_rows = app.config.get('CHECKIN_BUFFER_MAX_ROWS', 500)
+        self.spool_dir = app.config.get('CHECKIN_SPOOL_DIR')
+        self.spool_fsync = app.config.get('CHECKIN_SPOOL_FSYNC', True)
+        self.max_pending = app.config.get('CHECKIN_BUFFER_MAX_PENDING', 20000)
+        self.max_retries = app.config.get('CHECKIN_BUFFER_MAX_RETRIES', 10)
+        self._app = app
+        app.extensions['checkin_buffer'] = self
+
+    @property
+    def _owner(self):
+        """本进程的 spool 标识 pid-随机串；随机串避免容器内PID复用时把上一个进程的 spool 当作自己的"""
+        if self._owner_id is None or not self._owner_id.startswith(f'{os.getpid()}-'):
+            self._owner_id = f'{os.getpid()}-{uuid4().hex[:8]}'
+        return self._owner_id
+
+    def is_accepted(self, key):
+        """本进程是否已接收过该 (学生, 岗位, 日期) 的签到（用于同步拒绝重复提交）"""
+        return self.accepted.get(key) is not None
+
+    def submit(self, record):
+        """
+        接收一条已校验的签到记录（含通知内容 message），写入 spool 后进入缓冲
+        同一 (学生, 岗位, 日期) 只接收一次；数据库持续不可用导致缓冲积压超过
+        max_pending 条时拒绝接收
+
+        Returns:
+            是否接收（False 表示本进程已接收过该签到）
+        """
+        key = checkin_record_key(record)
+        with self._lock:
+            if self.accepted.get(key) is not None:
+                return False
+            if len(self._buffer) >= self.max_pending:
+                raise APIError('签到服务繁忙，请稍后重试', 503, 'CHECKIN_BUFFER_FULL')
+            if self.spool_dir:
+                self._append_spool(record)
+            self._buffer.append(record)
+            pending = len(self._buffer)
+            self.accepted.set(key, True)
+        self._ensure_flusher()
+        if pending >= self.max_rows:
+            self._wakeup.set()
+        return True
+
+    def _is_orphan(self, name):
+        try:
+            pid, token = _spool_owner(name)
+        except ValueError:
+            return False
+        if f'{pid}-{token}' == self._owner:
+            return False
+        return pid == os.getpid() or not _pid_alive(pid)
+
+    def _append_spool(self, record):
+        if self._spool is None:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            self._spool_path = os.path.join(self.spool_dir, f'checkins-{self._owner}.log')
+            self._spool = open(self._spool_path, 'a', encoding='utf-8')
+        self._spool.write(_encode_record(record) + '\n')
+        self._spool.flush()
+        if self.spool_fsync:
+            os.fsync(self._spool.fileno())
+
+    def _rotate_spool(self):
+        """切换到新的 spool 文件，已取出缓冲的记录所在文件在提交成功后删除"""
+        if self._spool is None:
+            return
+        self._spool.close()
+        self._spool = None
+        flushing = f'{self._spool_path}.{len(self._flushing_files)}.flushing'
+        os.replace(self._spool_path, flushing)
+        self._flushing_files.append(flushing)
+
+    def _ensure_flusher(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='checkin-flusher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        with self._app.app_context():
+            try:
+                self.recover()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Recover checkin spool error: {str(e)}", exc_info=True)
+            finally:
+                db.session.remove()
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            # 连续失败时按指数退避等待，避免数据库故障期间反复整批重试
+            if time.monotonic() >= self._retry_at:
+                self.flush()
+
+    def _write_isolating(self, records):
+        """
+        提交一批记录；因个别记录出错而失败时二分拆批定位，单条仍失败的记录不再重试
+        连接类错误与具体记录无关，直接抛给调用方整批重试
+
+        Returns:
+            (写入数, 无法写入的记录列表)
+        """
+        try:
+            return write_checkins(records), []
+        except _TRANSIENT_ERRORS:
+            raise
+        except Exception as e:
+            db.session.rollback()
+            if len(records) == 1:
+                records[0]['error'] = str(e)
+                return 0, records
+        middle = len(records) // 2
+        written, rejected = self._write_isolating(records[:middle])
+        more_written, more_rejected = self._write_isolating(records[middle:])
+        return written + more_written, rejected + more_rejected
+
+    def _dead_letter(self, records):
+        """
+        无法写入的记录追加到 spool 目录的 deadletter-*.log（未配置 spool 时写入错误日志），
+        供人工核对后重放；同时撤销本进程的接收标记，允许学生重新签到
+        """
+        lines = [_encode_record(record) for record in records]
+        if self.spool_dir:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            path = os.path.join(self.spool_dir, f'deadletter-{self._owner}.log')
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(''.join(line + '\n' for line in lines))
+                f.flush()
+                os.fsync(f.fileno())
+        for record, line in zip(records, lines):
+            logger.error(f"checkin_dead_letter|{line}")
+            self.accepted.pop(checkin_record_key(record))
+
+    def flush(self):
+        """
+        取出缓冲中的全部记录并提交
+        个别记录出错时拆批隔离并转入死信；连接类错误时整批放回缓冲，
+        每条记录最多重试 max_retries 次，超过后转入死信
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._buffer:
+                    return 0
+                records = list(self._buffer)
+                self._buffer.clear()
+                if self.spool_dir:
+                    self._rotate_spool()
+            try:
+                with self._app.app_context():
+                    try:
+                        written, rejected = self._write_isolating(records)
+                    finally:
+                        db.session.remove()
+            except Exception as e:
+                logger.error(f"Flush checkin buffer error: {str(e)}", exc_info=True)
+                retry, expired = [], []
+                for record in records:
+                    record['attempts'] = record.get('attempts', 0) + 1
+                    if record['attempts'] >= self.max_retries:
+                        record['error'] = str(e)
+                        expired.append(record)
+                    else:
+                        retry.append(record)
+                if expired:
+                    self._dead_letter(expired)
+                with self._lock:
+                    self._buffer.extendleft(reversed(retry))
+                self._failures += 1
+                self._retry_at = time.monotonic() + min(
+                    self.flush_interval * 2 ** self._failures, _MAX_RETRY_DELAY
+                )
+                # spool 文件在放回的记录写入前须保留
+                if not retry:
+                    self._remove_flushing_files()
+                return 0
+            self._failures = 0
+            self._retry_at = 0.0
+            if rejected:
+                self._dead_letter(rejected)
+            self._remove_flushing_files()
+            skipped = len(records) - written - len(rejected)
+            if skipped:
+                logger.info(f"checkin_flush|skipped_duplicates={skipped}")
+            if written:
+                invalidate_statistics()
+            return written
+
+    def _remove_flushing_files(self):
+        for path in self._flushing_files:
+            os.remove(path)
+        self._flushing_files = []
+
+    def recover(self):
+        """
+        重放已退出进程遗留的 spool 文件（在应用上下文中调用）
+        通过原子重命名认领文件，避免多个进程重复处理
+
+        Returns:
+            写入的签到数
+        """
+        if not self.spool_dir or not os.path.isdir(self.spool_dir):
+            return 0
+        written = 0
+        for path in sorted(glob.glob(os.path.join(self.spool_dir, 'checkins-*'))):
+            name = os.path.basename(path)
+            if not self._is_orphan(name):
+                continue
+            claimed = f"{path.split('.recovering-', 1)[0]}.recovering-{self._owner}"
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue
+            records = []
+            with open(claimed, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        records.append(_decode_record(line))
+                    except ValueError:
+                        # 进程崩溃时可能留下写了一半的最后一行
+                        logger.warning(f"Skip malformed spool line in {name}")
+            if records:
+                count, rejected = self._write_isolating(records)
+                written += count
+                if rejected:
+                    self._dead_letter(rejected)
+            os.remove(claimed)
+            logger.info(f"checkin_spool_recovered|file={name}|records={len(records)}")
+        if written:
+            invalidate_statistics()
+        return written
+
+
+checkin_buffer = CheckinBuffer()
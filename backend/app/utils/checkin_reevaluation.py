@@ -0,0 +1,132 @@
+from app import db
+from app.models.checkin import CheckIn
+from app.models.position import Position
+from app.utils.checkin_rollup import apply_checkin_deltas
+from app.utils.checkin_rules import parse_checkin_window, late_minutes_after, evaluate_checkin
+from app.utils.credit import apply_credit_delta, checkin_credit_delta
+from app.utils.distance import haversine_distance_batch
+from app.utils.stats import invalidate_statistics, invalidate_student_checkin_statistics
+from collections import Counter
+from flask import current_app
+from sqlalchemy import func, select, update
+
+# 每批重算的签到记录数
+REEVALUATE_CHUNK_SIZE = 1000
+
+
+def _reevaluate_chunk(rows, latitude, longitude, allowed_radius, end_time):
+    """
+    重算一批签到记录的距离与状态
+
+    Returns:
+        (待更新行列表, 汇总表增量, 信用聚合增量 {(学生, 岗位): {字段: 增量}}, 状态变化数)
+    """
+    distances = haversine_distance_batch(
+        [row.latitude for row in rows],
+        [row.longitude for row in rows],
+        latitude,
+        longitude
+    )
+    updates = []
+    rollup_deltas = Counter()
+    credit_deltas = {}
+    status_changed = 0
+    for row, distance in zip(rows, distances.tolist()):
+        if distance > allowed_radius:
+            status, abnormal_reason = evaluate_checkin(distance, allowed_radius)
+        elif row.status == 'abnormal':
+            # 回到范围内的异常签到，迟到分钟数由签到时间重新推算
+            late_minutes = late_minutes_after(row.checkin_time, end_time) if row.checkin_time else 0
+            status, abnormal_reason = evaluate_checkin(distance, allowed_radius, late_minutes)
+        else:
+            # 范围内的正常/迟到签到只更新距离
+            status, abnormal_reason = row.status, row.abnormal_reason
+        if status == row.status and abnormal_reason == row.abnormal_reason and \
+                round(distance, 2) == round(row.distance or 0, 2):
+            continue
+        updates.append({
+            'id': row.id,
+            'distance': distance,
+            'status': status,
+            'abnormal_reason': abnormal_reason
+        })
+        old_status = row.status or 'normal'
+        if status != old_status:
+            status_changed += 1
+            rollup_deltas[(row.checkin_date, row.position_id, old_status)] -= 1
+            rollup_deltas[(row.checkin_date, row.position_id, status)] += 1
+            deltas = credit_deltas.setdefault((row.student_id, row.position_id), Counter())
+            deltas.update(checkin_credit_delta(old_status, sign=-1))
+            deltas.update(checkin_credit_delta(status))
+    return updates, rollup_deltas, credit_deltas, status_changed
+
+
+def reevaluate_position_checkins(progress, position_id, chunk_size=REEVALUATE_CHUNK_SIZE):
+    """
+    岗位坐标或签到半径变更后，按新位置重算该岗位全部签到记录的距离与状态
+    按ID分批读取，向量化计算距离，批量更新，并同步每日汇总与信用分；每批提交一次
+
+    Args:
+        progress: 进度回调 progress(processed, total)，可为 None
+        position_id: 岗位ID
+
+    Returns:
+        {'processed': 处理数, 'updated': 更新数, 'status_changed': 状态变化数}
+    """
+    position = db.session.get(Position, position_id)
+    if position is None:
+        return {'processed': 0, 'updated': 0, 'status_changed': 0}
+    # 每批提交后对象会过期，先取出坐标与半径
+    latitude, longitude = position.latitude, position.longitude
+    allowed_radius = position.checkin_radius or current_app.config.get('CHECKIN_NORMAL_DISTANCE', 200)
+    _, end_time = parse_checkin_window(
+        current_app.config.get('CHECKIN_WORKDAY_START', '09:00'),
+        current_app.config.get('CHECKIN_WORKDAY_END', '18:00')
+    )
+
+    # 系统补录的未签到记录没有真实坐标，不参与重算
+    base = select(
+        CheckIn.id, CheckIn.student_id, CheckIn.position_id, CheckIn.checkin_date,
+        CheckIn.checkin_time, CheckIn.latitude, CheckIn.longitude, CheckIn.distance,
+        CheckIn.status, CheckIn.abnormal_reason
+    ).where(
+        CheckIn.position_id == position_id,
+        CheckIn.status != 'not_signed'
+    )
+    total = db.session.execute(
+        select(func.count()).select_from(base.subquery())
+    ).scalar()
+
+    processed = updated = status_changed = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            base.where(CheckIn.id > last_id).order_by(CheckIn.id).limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        updates, rollup_deltas, credit_deltas, changed = _reevaluate_chunk(
+            rows, latitude, longitude, allowed_radius, end_time
+        )
+        # 信用聚合须在明细更新前调整，以免首次初始化聚合行时重复计入
+        for (student_id, pos_id), deltas in credit_deltas.items():
+            deltas = {field: delta for field, delta in deltas.items() if delta}
+            if deltas:
+                apply_credit_delta(student_id, pos_id, **deltas)
+        if updates:
+            db.session.execute(update(CheckIn), updates)
+        apply_checkin_deltas(rollup_deltas)
+        db.session.commit()
+
+        processed += len(rows)
+        updated += len(updates)
+        status_changed += changed
+        if progress:
+            progress(processed, total)
+
+    if status_changed:
+        invalidate_statistics()
+        invalidate_student_checkin_statistics()
+    return {'processed': processed, 'updated': updated, 'status_changed': status_changed}
@@ -0,0 +1,114 @@
+from app import db
+from app.models.checkin import CheckIn
+from app.models.checkin_daily_stat import CheckInDailyStat
+from sqlalchemy import func, select, delete
+from collections import Counter
+
+
+def checkin_key(checkin):
+    """签到记录在汇总表中的键：(日期, 岗位ID, 状态)"""
+    return (checkin.checkin_date, checkin.position_id, checkin.status or 'normal')
+
+
+def _upsert_statement(rows):
+    """按数据库方言生成“存在则累加，不存在则插入”的语句"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(CheckInDailyStat).values(rows)
+        return stmt.on_duplicate_key_update(count=CheckInDailyStat.count + stmt.inserted['count'])
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    stmt = insert(CheckInDailyStat).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=['stat_date', 'position_id', 'status'],
+        set_={'count': CheckInDailyStat.count + stmt.excluded['count']}
+    )
+
+
+def apply_checkin_deltas(deltas):
+    """
+    将签到增量写入每日汇总表（在调用方事务内执行，不提交）
+
+    Args:
+        deltas: {(checkin_date, position_id, status): 增量} 的映射，可为 Counter
+    """
+    rows = [
+        {'stat_date': stat_date, 'position_id': position_id, 'status': status, 'count': delta}
+        for (stat_date, position_id, status), delta in deltas.items()
+        if delta
+    ]
+    if not rows:
+        return
+
+    stmt = _upsert_statement(rows)
+    if stmt is not None:
+        db.session.execute(stmt)
+    else:
+        for row in rows:
+            stat = db.session.get(
+                CheckInDailyStat,
+                (row['stat_date'], row['position_id'], row['status'])
+            )
+            if stat:
+                stat.count += row['count']
+            else:
+                db.session.add(CheckInDailyStat(**row))
+        db.session.flush()
+
+    if any(row['count'] < 0 for row in rows):
+        db.session.execute(delete(CheckInDailyStat).where(CheckInDailyStat.count <= 0))
+
+
+def record_checkins(checkins, sign=1):
+    """按签到记录列表累加（sign=1）或扣减（sign=-1）汇总计数"""
+    deltas = Counter()
+    for checkin in checkins:
+        deltas[checkin_key(checkin)] += sign
+    apply_checkin_deltas(deltas)
+
+
+def rebuild_checkin_stats(start_date=None, end_date=None, connection=None):
+    """
+    从签到明细重建每日汇总表（可限定日期范围），调用方负责提交
+
+    Args:
+        start_date: 起始日期，默认不限
+        end_date: 结束日期，默认不限
+        connection: 在指定连接上执行（供迁移使用），默认 db.session
+
+    Returns:
+        写入的汇总行数
+    """
+    clear_stmt = delete(CheckInDailyStat)
+    source = select(
+        CheckIn.checkin_date,
+        CheckIn.position_id,
+        func.coalesce(CheckIn.status, 'normal'),
+        func.count(CheckIn.id)
+    )
+    if start_date:
+        clear_stmt = clear_stmt.where(CheckInDailyStat.stat_date >= start_date)
+        source = source.where(CheckIn.checkin_date >= start_date)
+    if end_date:
+        clear_stmt = clear_stmt.where(CheckInDailyStat.stat_date <= end_date)
+        source = source.where(CheckIn.checkin_date <= end_date)
+    source = source.group_by(
+        CheckIn.checkin_date,
+        CheckIn.position_id,
+        func.coalesce(CheckIn.status, 'normal')
+    )
+
+    executor = db.session if connection is None else connection
+    executor.execute(clear_stmt)
+    result = executor.execute(
+        CheckInDailyStat.__table__.insert().from_select(
+            ['stat_date', 'position_id', 'status', 'count'],
+            source
+        )
+    )
+    return result.rowcount
@@ -0,0 +1,88 @@
+from app import db
+from app.models.application import Application
+from app.models.position import Position
+from app.utils.cache import TTLCache
+from app.utils.errors import APIError
+from datetime import datetime, time
+from functools import lru_cache
+from sqlalchemy import select, and_
+
+# (学生ID, 岗位ID) → True；只缓存有资格签到的组合，不缓存岗位字段
+eligibility_cache = TTLCache(maxsize=10000, ttl=300)
+
+
+def init_checkin_cache(app):
+    """按应用配置设置签到资格缓存容量与过期时间"""
+    eligibility_cache.maxsize = app.config.get('CHECKIN_ELIGIBILITY_CACHE_MAXSIZE', 10000)
+    eligibility_cache.ttl = app.config.get('CHECKIN_ELIGIBILITY_CACHE_SECONDS', 300)
+
+
+def invalidate_checkin_eligibility():
+    """岗位修改/删除或已批准申请被删除后清空签到资格缓存"""
+    eligibility_cache.clear()
+
+
+@lru_cache(maxsize=16)
+def parse_checkin_window(start_cfg, end_cfg):
+    """解析签到时间窗口配置（'HH:MM'），按配置值缓存"""
+    start_h, start_m = map(int, start_cfg.split(':'))
+    end_h, end_m = map(int, end_cfg.split(':'))
+    return time(start_h, start_m), time(end_h, end_m)
+
+
+def late_minutes_after(moment, end_time):
+    """签到时刻晚于窗口结束时间的分钟数（未迟到为 0）"""
+    if moment.time() <= end_time:
+        return 0
+    delta = moment - datetime.combine(moment.date(), end_time)
+    return max(0, int(delta.total_seconds() // 60))
+
+
+def evaluate_checkin(distance, allowed_radius, late_minutes=0):
+    """
+    按距离与迟到分钟数判定签到状态
+
+    Returns:
+        (status, abnormal_reason)
+    """
+    if distance > allowed_radius:
+        return 'abnormal', f'超出签到范围，当前距离{round(distance,2)}米，允许{allowed_radius}米内'
+    if late_minutes > 0:
+        return 'late', f'迟到 {late_minutes} 分钟'
+    return 'normal', None
+
+
+def get_checkin_position(student_id, position_id):
+    """
+    获取学生可签到的岗位（须有该岗位的已批准申请）
+    缓存只记录"有已批准申请"这一事实；岗位本身每次按主键读取，
+    坐标/签到半径的修改对所有进程立即生效，不会按旧位置判定签到
+
+    Raises:
+        APIError: 岗位不存在（404）或无已批准申请（NO_APPROVED_APPLICATION）
+    """
+    key = (student_id, position_id)
+    if eligibility_cache.get(key):
+        position = db.session.get(Position, position_id)
+        if position is not None:
+            return position
+        eligibility_cache.pop(key)
+        raise APIError('资源不存在', 404, 'POSITION_NOT_FOUND')
+
+    position = db.session.execute(
+        select(Position).join(
+            Application,
+            and_(
+                Application.position_id == Position.id,
+                Application.student_id == student_id,
+                Application.status == 'approved'
+            )
+        ).where(Position.id == position_id).limit(1)
+    ).scalar()
+    if position is None:
+        if db.session.get(Position, position_id) is None:
+            raise APIError('资源不存在', 404, 'POSITION_NOT_FOUND')
+        raise APIError('您未申请或该申请未通过', 400, 'NO_APPROVED_APPLICATION')
+
+    eligibility_cache.set(key, True)
+    return position
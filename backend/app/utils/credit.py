@@ -2,77 +2,378 @@ from app.models.user import User
 from app.models.checkin import CheckIn
 from app.models.weekly_report import WeeklyReport
 from app.models.application import Application
+from app.models.student_credit_stat import StudentCreditStat
+from app.utils.stats import count_if, TOTAL_WORK_DAYS, TOTAL_WEEKS
+from app.utils.jwt import invalidate_user_cache, invalidate_user_cache_on_commit
 from app import db
-from datetime import datetime, timedelta
-from sqlalchemy import func
+from datetime import datetime
+from sqlalchemy import func, select, update, delete, insert
+import numpy as np
+
+# 未参与实习（无已批准申请）的学生信用分
+DEFAULT_CREDIT_SCORE = 100.0
+
+
+def score_from_aggregates(normal_count, report_count, avg_score, abnormal_count):
+    """
+    根据聚合指标计算信用分
+
+    Args:
+        normal_count: 正常签到次数
+        report_count: 周报提交数
+        avg_score: 周报平均分（无评分时为 0 或 None）
+        abnormal_count: 异常签到次数
+
+    Returns:
+        信用分（0-100）
+    """
+    # 1. 出勤率（30%权重），实习期按 TOTAL_WORK_DAYS 个工作日计算
+    attendance_rate = min(normal_count / TOTAL_WORK_DAYS, 1.0) if TOTAL_WORK_DAYS > 0 else 0
+    attendance_score = attendance_rate * 30
+
+    # 2. 周报提交率（30%权重），实习期按 TOTAL_WEEKS 周计算
+    report_rate = min(report_count / TOTAL_WEEKS, 1.0) if TOTAL_WEEKS > 0 else 0
+    report_score = report_rate * 30
+
+    # 3. 周报平均分（30%权重）
+    avg_score = float(avg_score or 0)
+    score_rate = avg_score / 100.0 if avg_score > 0 else 0
+    score_component = score_rate * 30
+
+    # 4. 异常签到扣分（10%权重），每个异常签到扣1分，最多扣10分
+    penalty = min(abnormal_count, 10)
+    penalty_score = 10 - penalty
+
+    total_score = attendance_score + report_score + score_component + penalty_score
+
+    # 确保分数在0-100之间
+    total_score = max(0, min(100, total_score))
+
+    return round(total_score, 2)
+
+
+def score_from_aggregates_batch(normal_counts, report_counts, scored_counts, score_sums, abnormal_counts):
+    """
+    score_from_aggregates 的向量化版本，按相同的运算顺序对整列学生计算信用分
+
+    Args:
+        normal_counts: 正常签到次数序列
+        report_counts: 周报提交数序列
+        scored_counts: 已评分周报数序列
+        score_sums: 周报评分总和序列
+        abnormal_counts: 异常签到次数序列
+
+    Returns:
+        信用分列表（0-100，保留两位小数）
+    """
+    normal = np.asarray(normal_counts, dtype=np.float64)
+    reports = np.asarray(report_counts, dtype=np.float64)
+    scored = np.asarray(scored_counts, dtype=np.float64)
+    score_sums = np.asarray(score_sums, dtype=np.float64)
+    abnormal = np.asarray(abnormal_counts, dtype=np.float64)
+
+    if TOTAL_WORK_DAYS > 0:
+        attendance_score = np.minimum(normal / TOTAL_WORK_DAYS, 1.0) * 30
+    else:
+        attendance_score = np.zeros_like(normal)
+    if TOTAL_WEEKS > 0:
+        report_score = np.minimum(reports / TOTAL_WEEKS, 1.0) * 30
+    else:
+        report_score = np.zeros_like(reports)
+    avg_score = np.divide(score_sums, scored, out=np.zeros_like(score_sums), where=scored > 0)
+    score_component = np.where(avg_score > 0, avg_score / 100.0, 0.0) * 30
+    penalty_score = 10 - np.minimum(abnormal, 10)
+
+    total_score = attendance_score + report_score + score_component + penalty_score
+    total_score = np.clip(total_score, 0, 100)
+    # 保留两位小数用内置 round，与逐条增量计算的结果逐位一致
+    return [round(score, 2) for score in total_score.tolist()]
+
 
 def calculate_credit_score(student_id):
     """
     计算学生信用分
     根据出勤率、周报提交率、单位评价计算
-    
+
     Returns:
         信用分（0-100）
     """
     student = User.query.get(student_id)
     if not student or student.role != 'student':
-        return 100.0
-    
+        return DEFAULT_CREDIT_SCORE
+
     # 获取已批准的申请
     approved_app = Application.query.filter_by(
         student_id=student_id,
         status='approved'
     ).first()
-    
+
     if not approved_app:
-        return 100.0
-    
+        return DEFAULT_CREDIT_SCORE
+
     position_id = approved_app.position_id
-    
-    # 1. 计算出勤率（30%权重）
-    # 假设实习期为3个月，每周5天，共约60个工作日
-    total_work_days = 60
+
     checkin_count = CheckIn.query.filter_by(
         student_id=student_id,
         position_id=position_id,
         status='normal'
     ).count()
-    attendance_rate = min(checkin_count / total_work_days, 1.0) if total_work_days > 0 else 0
-    attendance_score = attendance_rate * 30
-    
-    # 2. 计算周报提交率（30%权重）
-    # 假设实习期为12周
-    total_weeks = 12
+
     report_count = WeeklyReport.query.filter_by(
         student_id=student_id,
         position_id=position_id
     ).count()
-    report_rate = min(report_count / total_weeks, 1.0) if total_weeks > 0 else 0
-    report_score = report_rate * 30
-    
-    # 3. 计算周报平均分（30%权重）
+
     avg_score = db.session.query(func.avg(WeeklyReport.score)).filter_by(
         student_id=student_id,
         position_id=position_id
     ).scalar() or 0
-    score_rate = avg_score / 100.0 if avg_score > 0 else 0
-    score_component = score_rate * 30
-    
-    # 4. 异常签到扣分（10%权重）
+
     abnormal_count = CheckIn.query.filter_by(
         student_id=student_id,
         position_id=position_id,
         status='abnormal'
     ).count()
-    # 每个异常签到扣1分，最多扣10分
-    penalty = min(abnormal_count, 10)
-    penalty_score = 10 - penalty
-    
-    # 计算总分
-    total_score = attendance_score + report_score + score_component + penalty_score
-    
-    # 确保分数在0-100之间
-    total_score = max(0, min(100, total_score))
-    
-    return round(total_score, 2)
 
+    return score_from_aggregates(checkin_count, report_count, avg_score, abnormal_count)
+
+
+def _approved_positions():
+    """所有学生的已批准岗位：{student_id: position_id}"""
+    rows = db.session.execute(
+        select(Application.student_id, Application.position_id).where(
+            Application.status == 'approved'
+        ).order_by(Application.id)
+    )
+    approved = {}
+    for student_id, position_id in rows:
+        approved.setdefault(student_id, position_id)
+    return approved
+
+
+def _executor(connection):
+    return db.session if connection is None else connection
+
+
+def _checkin_aggregates(connection=None):
+    """按 (学生, 岗位) 分组的正常/异常签到数"""
+    rows = _executor(connection).execute(
+        select(
+            CheckIn.student_id,
+            CheckIn.position_id,
+            count_if(CheckIn.status == 'normal'),
+            count_if(CheckIn.status == 'abnormal')
+        ).group_by(CheckIn.student_id, CheckIn.position_id)
+    )
+    return {
+        (student_id, position_id): (int(normal), int(abnormal))
+        for student_id, position_id, normal, abnormal in rows
+    }
+
+
+def _report_aggregates(connection=None):
+    """按 (学生, 岗位) 分组的周报数、已评分周报数与评分总和"""
+    rows = _executor(connection).execute(
+        select(
+            WeeklyReport.student_id,
+            WeeklyReport.position_id,
+            func.count(WeeklyReport.id),
+            func.count(WeeklyReport.score),
+            func.coalesce(func.sum(WeeklyReport.score), 0)
+        ).group_by(WeeklyReport.student_id, WeeklyReport.position_id)
+    )
+    return {
+        (student_id, position_id): (int(count), int(scored), float(score_sum))
+        for student_id, position_id, count, scored, score_sum in rows
+    }
+
+
+def _rebuild_credit_stats(checkins, reports, batch_size, connection=None):
+    """用分组聚合结果重建 student_credit_stats 表（在指定连接上执行时由调用方提交）"""
+    rows = []
+    for key in checkins.keys() | reports.keys():
+        normal_count, abnormal_count = checkins.get(key, (0, 0))
+        report_count, scored_count, score_sum = reports.get(key, (0, 0, 0.0))
+        rows.append({
+            'student_id': key[0],
+            'position_id': key[1],
+            'normal_checkins': normal_count,
+            'abnormal_checkins': abnormal_count,
+            'report_count': report_count,
+            'scored_report_count': scored_count,
+            'score_sum': score_sum,
+            'updated_at': datetime.utcnow()
+        })
+    executor = _executor(connection)
+    executor.execute(delete(StudentCreditStat))
+    for start in range(0, len(rows), batch_size):
+        executor.execute(insert(StudentCreditStat), rows[start:start + batch_size])
+    if connection is None:
+        db.session.commit()
+
+
+def rebuild_credit_stats(batch_size=1000, connection=None):
+    """
+    从签到与周报明细重建 student_credit_stats（不重算信用分）
+
+    Args:
+        batch_size: 每批插入行数
+        connection: 在指定连接上执行（供迁移使用，由调用方提交），默认 db.session 并提交
+    """
+    _rebuild_credit_stats(
+        _checkin_aggregates(connection),
+        _report_aggregates(connection),
+        batch_size,
+        connection
+    )
+
+
+def recompute_all_credit_scores(batch_size=1000, progress=None):
+    """
+    批量重算全部学生信用分
+    以少量分组查询取得所有聚合指标并重建 student_credit_stats，
+    整列向量化计算后按批次批量更新
+
+    Args:
+        batch_size: 每批更新的学生数
+        progress: 进度回调 progress(processed, total)
+
+    Returns:
+        (学生总数, 实际变更的学生数)
+    """
+    approved = _approved_positions()
+    checkins = _checkin_aggregates()
+    reports = _report_aggregates()
+    _rebuild_credit_stats(checkins, reports, batch_size)
+    students = db.session.execute(
+        select(User.id, User.credit_score).where(User.role == 'student').order_by(User.id)
+    ).all()
+
+    # 有已批准岗位的学生整列向量化计算，其余学生为默认分
+    scored_students = [
+        (student_id, approved[student_id]) for student_id, _ in students if student_id in approved
+    ]
+    checkin_columns = [checkins.get(key, (0, 0)) for key in scored_students]
+    report_columns = [reports.get(key, (0, 0, 0.0)) for key in scored_students]
+    scores = dict(zip(
+        (student_id for student_id, _ in scored_students),
+        score_from_aggregates_batch(
+            [row[0] for row in checkin_columns],
+            [row[0] for row in report_columns],
+            [row[1] for row in report_columns],
+            [row[2] for row in report_columns],
+            [row[1] for row in checkin_columns]
+        )
+    ))
+
+    changes = []
+    for student_id, current_score in students:
+        score = scores.get(student_id, DEFAULT_CREDIT_SCORE)
+        if current_score is None or round(current_score, 2) != score:
+            changes.append({'id': student_id, 'credit_score': score})
+
+    total = len(changes)
+    for start in range(0, total, batch_size):
+        batch = changes[start:start + batch_size]
+        db.session.execute(update(User), batch)
+        db.session.commit()
+        for change in batch:
+            invalidate_user_cache(change['id'])
+        if progress:
+            progress(min(start + batch_size, total), total)
+
+    return len(students), total
+
+
+def checkin_credit_delta(status, sign=1):
+    """签到状态对应的信用聚合增量（迟到等状态不计入信用分）"""
+    if status == 'normal':
+        return {'normal_checkins': sign}
+    if status == 'abnormal':
+        return {'abnormal_checkins': sign}
+    return {}
+
+
+def _seed_credit_stat(student_id, position_id):
+    """从明细数据初始化单个学生/岗位的聚合行"""
+    normal_count, abnormal_count = db.session.query(
+        count_if(CheckIn.status == 'normal'),
+        count_if(CheckIn.status == 'abnormal')
+    ).filter(
+        CheckIn.student_id == student_id,
+        CheckIn.position_id == position_id
+    ).one()
+    report_count, scored_count, score_sum = db.session.query(
+        func.count(WeeklyReport.id),
+        func.count(WeeklyReport.score),
+        func.coalesce(func.sum(WeeklyReport.score), 0)
+    ).filter(
+        WeeklyReport.student_id == student_id,
+        WeeklyReport.position_id == position_id
+    ).one()
+    stat = StudentCreditStat(
+        student_id=student_id,
+        position_id=position_id,
+        normal_checkins=int(normal_count),
+        abnormal_checkins=int(abnormal_count),
+        report_count=int(report_count),
+        scored_report_count=int(scored_count),
+        score_sum=float(score_sum)
+    )
+    db.session.add(stat)
+    return stat
+
+
+def _locked_credit_stat(student_id, position_id):
+    """加锁读取学生/岗位的聚合行，不存在时从明细初始化"""
+    stat = StudentCreditStat.query.filter_by(
+        student_id=student_id,
+        position_id=position_id
+    ).with_for_update().first()
+    if stat is None:
+        stat = _seed_credit_stat(student_id, position_id)
+    return stat
+
+
+def apply_credit_delta(student_id, position_id, normal_checkins=0, abnormal_checkins=0,
+                       report_count=0, scored_report_count=0, score_sum=0):
+    """
+    按增量更新学生信用聚合指标，并以 O(1) 运算重算信用分
+    在调用方事务内执行，不提交；须在本次新增/修改的明细记录刷新到数据库之前调用，
+    以免首次初始化聚合行时重复计入
+    信用分与 calculate_credit_score / recompute_all_credit_scores 一致，取最早的已批准申请
+    对应岗位的聚合行计算；变更的岗位不是该岗位时信用分不受影响
+
+    Returns:
+        更新后的信用分
+    """
+    with db.session.no_autoflush:
+        stat = _locked_credit_stat(student_id, position_id)
+        stat.normal_checkins += normal_checkins
+        stat.abnormal_checkins += abnormal_checkins
+        stat.report_count += report_count
+        stat.scored_report_count += scored_report_count
+        stat.score_sum += score_sum
+
+        scored_position_id = db.session.execute(
+            select(Application.position_id).where(
+                Application.student_id == student_id,
+                Application.status == 'approved'
+            ).order_by(Application.id).limit(1)
+        ).scalar()
+        if scored_position_id is None:
+            score = DEFAULT_CREDIT_SCORE
+        else:
+            if scored_position_id != position_id:
+                stat = _locked_credit_stat(student_id, scored_position_id)
+            score = score_from_aggregates(
+                stat.normal_checkins,
+                stat.report_count,
+                stat.average_score(),
+                stat.abnormal_checkins
+            )
+        student = db.session.get(User, student_id)
+        if student:
+            student.credit_score = score
+    invalidate_user_cache_on_commit(student_id)
+    return score
@@ -22,6 +22,8 @@ def token_required(f):
         user = get_current_user(token)
         if not user:
             raise APIError('Token无效或已过期', 401, 'INVALID_TOKEN')
+        if user.status == 0:
+            raise APIError('账号已被禁用', 403, 'USER_DISABLED')
         
         request.current_user = user
         return f(*args, **kwargs)
@@ -39,3 +41,19 @@ def role_required(*roles):
         return decorated
     return decorator
 
+
+def permission_required(*permissions):
+    """
+    需要模块权限的装饰器
+    管理员直接通过；教师需具备全部指定的模块权限（users.permissions）；其他角色无权访问
+    """
+    def decorator(f):
+        @wraps(f)
+        @token_required
+        def decorated(*args, **kwargs):
+            user = request.current_user
+            if user.role not in ('admin', 'teacher') or not user.has_permissions(*permissions):
+                raise APIError('权限不足', 403, 'INSUFFICIENT_PERMISSIONS')
+            return f(*args, **kwargs)
+        return decorated
+    return decorator
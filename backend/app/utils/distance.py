@@ -1,4 +1,5 @@
 import math
+import numpy as np
 
 def haversine_distance(lat1, lon1, lat2, lon2):
     """
@@ -32,6 +33,32 @@ def haversine_distance(lat1, lon1, lat2, lon2):
     
     return distance
 
+def haversine_distance_batch(lats, lons, lat, lon):
+    """
+    向量化的Haversine距离计算：一组点到同一目标点的距离（米）
+    
+    Args:
+        lats: 纬度数组（或序列）
+        lons: 经度数组（或序列）
+        lat: 目标点纬度
+        lon: 目标点经度
+    
+    Returns:
+        与输入等长的距离数组（numpy.ndarray）
+    """
+    R = 6371000
+    
+    phi1 = np.radians(np.asarray(lats, dtype=float))
+    lambda1 = np.radians(np.asarray(lons, dtype=float))
+    phi2 = math.radians(lat)
+    lambda2 = math.radians(lon)
+    
+    a = np.sin((phi2 - phi1) / 2) ** 2 + \
+        np.cos(phi1) * math.cos(phi2) * np.sin((lambda2 - lambda1) / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    
+    return R * c
+
 def check_checkin_status(distance, normal_distance=200, abnormal_distance=500):
     """
     根据距离判断签到状态
@@ -0,0 +1,45 @@
+from flask import Response, stream_with_context
+from app.utils.errors import APIError
+import csv
+import io
+import json
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+
+def _csv_line(values):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+
+def _generate(rows, fields, fmt):
+    if fmt == 'csv':
+        yield _csv_line(fields)
+        for row in rows:
+            yield _csv_line([row.get(field) for field in fields])
+    else:
+        for row in rows:
+            yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def export_response(rows, fields, fmt, filename):
+    """
+    以 CSV / NDJSON 流式输出导出结果，逐行生成，不在内存中保留完整列表
+
+    Args:
+        rows: 字典迭代器（通常包装 yield_per 的查询结果）
+        fields: 导出字段（CSV 表头顺序）
+        fmt: csv 或 ndjson
+        filename: 下载文件名（不含扩展名）
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise APIError('导出格式无效，仅支持csv/ndjson', 400, 'INVALID_FORMAT')
+    return Response(
+        stream_with_context(_generate(rows, fields, fmt)),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{filename}.{fmt}"'}
+    )
@@ -0,0 +1,117 @@
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from app import db
+from uuid import uuid4
+import atexit
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """
+    进程内后台任务队列（线程池）
+    用于在主事务提交后执行消息通知等副作用；JOB_QUEUE_SYNC=True 时在当前线程同步执行（测试用）
+    """
+
+    def __init__(self, app=None):
+        self.sync = False
+        self.max_workers = 4
+        self._executor = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.sync = app.config.get('JOB_QUEUE_SYNC', False)
+        self.max_workers = app.config.get('JOB_QUEUE_WORKERS', 4)
+        app.extensions['job_queue'] = self
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix='job'
+                    )
+                    atexit.register(self.shutdown)
+        return self._executor
+
+    def enqueue(self, func, *args, **kwargs):
+        """提交任务，任务在独立的应用上下文（及独立数据库会话）中执行"""
+        app = current_app._get_current_object()
+        if self.sync:
+            self._run(app, func, args, kwargs)
+            return None
+        return self._get_executor().submit(self._run, app, func, args, kwargs)
+
+    def submit_tracked(self, job_type, func, *args, created_by=None):
+        """
+        提交需要查询进度的任务，任务状态记录在 background_jobs 表中
+
+        Args:
+            job_type: 任务类型
+            func: 任务函数 func(progress, *args)，progress(processed, total) 用于上报进度，
+                  返回值需可JSON序列化，作为任务结果保存
+
+        Returns:
+            任务ID
+        """
+        from app.models.background_job import BackgroundJob
+        job = BackgroundJob(id=uuid4().hex, type=job_type, status='pending', created_by=created_by)
+        db.session.add(job)
+        db.session.commit()
+        self.enqueue(_run_tracked, job.id, func, args)
+        return job.id
+
+    def shutdown(self, wait=True):
+        """停止线程池，默认等待已提交的任务执行完毕"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    @staticmethod
+    def _run(app, func, args, kwargs):
+        with app.app_context():
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Job {func.__name__} error: {str(e)}", exc_info=True)
+            finally:
+                db.session.remove()
+
+
+def _run_tracked(job_id, func, args):
+    from app.models.background_job import BackgroundJob
+    job = db.session.get(BackgroundJob, job_id)
+    job.status = 'running'
+    db.session.commit()
+
+    def progress(processed, total):
+        job.processed = processed
+        job.total = total
+        db.session.commit()
+
+    try:
+        result = func(progress, *args)
+    except Exception as e:
+        db.session.rollback()
+        job.status = 'failed'
+        job.error = getattr(e, 'message', None) or str(e)
+        # 分批提交的任务中途失败时，异常的 data 记录已提交的部分，供查询进度时核对
+        partial = getattr(e, 'data', None)
+        if partial is not None:
+            job.result = json.dumps(partial, ensure_ascii=False)
+        db.session.commit()
+        raise
+    job.status = 'succeeded'
+    job.result = json.dumps(result, ensure_ascii=False)
+    db.session.commit()
+    return result
+
+
+job_queue = JobQueue()
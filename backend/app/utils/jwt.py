@@ -1,7 +1,57 @@
 import jwt
-from datetime import datetime, timedelta
+import re
+import time
+from datetime import datetime
 from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
+from app import db
 from app.models.user import User
+from app.utils.cache import TTLCache
+
+# 已认证用户缓存：user_id -> 用户字段快照（进程内）
+user_cache = TTLCache(maxsize=4096, ttl=60)
+# 已验证token缓存：token -> payload（进程内，过期时间不超过token本身的exp）
+token_cache = TTLCache(maxsize=10000, ttl=300)
+
+# JWT 结构：三段 base64url，用于在验签前快速拒绝格式错误的token
+TOKEN_PATTERN = re.compile(r'^[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+$')
+MAX_TOKEN_LENGTH = 2048
+
+
+def init_auth_cache(app):
+    """按应用配置设置认证缓存容量与过期时间"""
+    user_cache.maxsize = app.config.get('AUTH_USER_CACHE_MAXSIZE', 4096)
+    user_cache.ttl = app.config.get('AUTH_USER_CACHE_SECONDS', 60)
+    token_cache.maxsize = app.config.get('AUTH_TOKEN_CACHE_MAXSIZE', 10000)
+    token_cache.ttl = app.config.get('AUTH_TOKEN_CACHE_SECONDS', 300)
+
+
+def invalidate_user_cache(user_id=None):
+    """用户信息/状态变更后失效缓存，user_id 为空时清空全部"""
+    if user_id is None:
+        user_cache.clear()
+    else:
+        user_cache.pop(user_id)
+
+
+def invalidate_user_cache_on_commit(user_id):
+    """
+    在当前事务提交后失效用户缓存（用于尚未提交的写入）
+    提交前失效的话，并发请求可能在提交前重新缓存旧数据
+    """
+    db.session.info.setdefault('invalidate_users', set()).add(user_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_users_after_commit(session):
+    for user_id in session.info.pop('invalidate_users', ()):
+        user_cache.pop(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_user_invalidations(session):
+    session.info.pop('invalidate_users', None)
 
 def generate_token(user_id, role):
     """生成JWT token"""
@@ -19,24 +69,54 @@ def generate_token(user_id, role):
     return token
 
 def verify_token(token):
-    """验证JWT token"""
+    """验证JWT token（已验证过的token直接读取缓存，格式错误的token不做验签）"""
+    if not token or len(token) > MAX_TOKEN_LENGTH or not TOKEN_PATTERN.match(token):
+        return None
+    
+    payload = token_cache.get(token)
+    if payload is not None:
+        if payload.get('exp', 0) > time.time():
+            return payload
+        token_cache.pop(token)
+        return None
+    
     try:
         payload = jwt.decode(
             token,
             current_app.config['JWT_SECRET_KEY'],
             algorithms=[current_app.config['JWT_ALGORITHM']]
         )
-        return payload
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
+    
+    remaining = payload.get('exp', 0) - time.time()
+    if remaining > 0:
+        token_cache.set(token, payload, ttl=min(token_cache.ttl, remaining))
+    return payload
+
+def _load_cached_user(state):
+    """由字段快照还原用户对象并并入当前会话，不访问数据库"""
+    user = User(**state)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
 
 def get_current_user(token):
-    """根据token获取当前用户"""
+    """根据token获取当前用户（优先读取进程内缓存）"""
     payload = verify_token(token)
     if not payload:
         return None
-    user = User.query.get(payload.get('user_id'))
+    user_id = payload.get('user_id')
+    state = user_cache.get(user_id)
+    if state is not None:
+        return _load_cached_user(state)
+    user = db.session.get(User, user_id)
+    if user:
+        user_cache.set(user_id, {
+            column.key: getattr(user, column.key)
+            for column in User.__table__.columns
+        })
     return user
 
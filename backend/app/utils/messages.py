@@ -0,0 +1,26 @@
+from app import db
+from app.models.message import Message
+from app.utils.jobs import job_queue
+from sqlalchemy import insert
+from datetime import datetime
+
+
+def _insert_messages(rows):
+    db.session.execute(insert(Message), rows)
+    db.session.commit()
+
+
+def send_messages(*messages):
+    """
+    异步发送站内消息，应在主事务提交后调用
+
+    Args:
+        messages: 消息字典，字段同 Message（user_id/title/content/type/related_id）
+    """
+    rows = [
+        {'is_read': False, 'created_at': datetime.utcnow(), **message}
+        for message in messages
+        if message
+    ]
+    if rows:
+        job_queue.enqueue(_insert_messages, rows)
@@ -0,0 +1,149 @@
+from app import db
+from app.models.application import Application
+from app.models.background_job import BackgroundJob
+from app.models.checkin import CheckIn
+from app.models.checkin_daily_stat import CheckInDailyStat
+from app.models.message import Message
+from app.models.schema_migration import SchemaMigration
+from app.models.student_credit_stat import StudentCreditStat
+from app.models.weekly_report import WeeklyReport
+from app.utils.checkin_rollup import rebuild_checkin_stats
+from app.utils.credit import rebuild_credit_stats
+from datetime import datetime
+from sqlalchemy import inspect, text, func, select
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _add_user_permissions(connection):
+    """users 表增加 permissions 字段（早期版本数据库中缺失）"""
+    columns = [col['name'] for col in inspect(connection).get_columns('users')]
+    if 'permissions' in columns:
+        return
+    if connection.dialect.name == 'mysql':
+        connection.execute(text(
+            "ALTER TABLE users ADD COLUMN permissions TEXT COMMENT '权限配置(JSON)'"
+        ))
+    else:
+        connection.execute(text("ALTER TABLE users ADD COLUMN permissions TEXT"))
+    connection.execute(text("UPDATE users SET permissions='[]' WHERE permissions IS NULL"))
+
+
+def _create_aggregate_tables(connection):
+    """创建签到日汇总、信用聚合与后台任务表"""
+    for model in (CheckInDailyStat, StudentCreditStat, BackgroundJob):
+        model.__table__.create(connection, checkfirst=True)
+
+
+def _backfill_aggregate_tables(connection):
+    """从明细回填签到日汇总与信用聚合（版本 2 只建表，已有数据的库中两张表为空）"""
+    rebuild_checkin_stats(connection=connection)
+    rebuild_credit_stats(connection=connection)
+
+
+def _has_checkin_unique_key(connection):
+    inspector = inspect(connection)
+    names = {constraint['name'] for constraint in inspector.get_unique_constraints('checkins')}
+    names |= {index['name'] for index in inspector.get_indexes('checkins')}
+    return 'uq_checkin_student_position_date' in names
+
+
+def _create_checkin_unique_key(connection):
+    """签到表 (student_id, position_id, checkin_date) 唯一索引，替代签到前的重复查询"""
+    if _has_checkin_unique_key(connection):
+        return
+    duplicates = connection.execute(
+        select(func.count()).select_from(
+            select(CheckIn.student_id).group_by(
+                CheckIn.student_id, CheckIn.position_id, CheckIn.checkin_date
+            ).having(func.count() > 1).subquery()
+        )
+    ).scalar()
+    if duplicates:
+        raise RuntimeError(
+            f'checkins 表存在 {duplicates} 组同一学生同一岗位同日的重复签到，请清理后再执行迁移'
+        )
+    if connection.dialect.name == 'mysql':
+        connection.execute(text(
+            'ALTER TABLE checkins ADD CONSTRAINT uq_checkin_student_position_date '
+            'UNIQUE (student_id, position_id, checkin_date)'
+        ))
+    else:
+        connection.execute(text(
+            'CREATE UNIQUE INDEX uq_checkin_student_position_date '
+            'ON checkins (student_id, position_id, checkin_date)'
+        ))
+
+
+def _index_migration(model, index_name):
+    """创建模型中声明的索引（已存在时跳过）"""
+    def migrate(connection):
+        index = next(index for index in model.__table__.indexes if index.name == index_name)
+        index.create(connection, checkfirst=True)
+    return migrate
+
+
+# 迁移列表：(版本号, 说明, 执行函数)，版本号只增不改；已部署的迁移不可修改，新的结构变更追加新版本
+MIGRATIONS = [
+    (1, 'users.permissions 字段', _add_user_permissions),
+    (2, '签到日汇总/信用聚合/后台任务表', _create_aggregate_tables),
+    (3, 'checkins (student_id, position_id, checkin_date) 唯一索引', _create_checkin_unique_key),
+    (4, 'applications (student_id, status) 索引',
+     _index_migration(Application, 'ix_applications_student_status')),
+    (5, 'weekly_reports (student_id, position_id, week_number) 索引',
+     _index_migration(WeeklyReport, 'ix_weekly_reports_student_position_week')),
+    (6, 'messages (user_id, is_read, created_at) 索引',
+     _index_migration(Message, 'ix_messages_user_read_created')),
+    (7, 'messages (type, related_id) 索引',
+     _index_migration(Message, 'ix_messages_type_related')),
+    (8, '回填签到日汇总/信用聚合', _backfill_aggregate_tables),
+    (9, 'checkins (checkin_time, id) 索引',
+     _index_migration(CheckIn, 'ix_checkins_time_id')),
+    (10, 'weekly_reports (week_number, id) 索引',
+     _index_migration(WeeklyReport, 'ix_weekly_reports_week_id')),
+    (11, 'applications (created_at, id) 索引',
+     _index_migration(Application, 'ix_applications_created_id')),
+    (12, 'messages (user_id, created_at, id) 索引',
+     _index_migration(Message, 'ix_messages_user_created_id')),
+]
+
+
+def applied_versions():
+    """已执行的迁移版本集合"""
+    with db.engine.begin() as connection:
+        SchemaMigration.__table__.create(connection, checkfirst=True)
+        return set(connection.execute(select(SchemaMigration.version)).scalars())
+
+
+def pending_migrations():
+    """待执行的迁移 [(版本号, 说明, 执行函数), ...]"""
+    applied = applied_versions()
+    return [migration for migration in MIGRATIONS if migration[0] not in applied]
+
+
+def upgrade(target=None):
+    """
+    按版本顺序执行待执行的迁移，每个迁移及其版本记录在同一事务中提交
+    （MySQL 的 DDL 会隐式提交，迁移函数需保证重复执行是安全的）
+
+    Args:
+        target: 执行到该版本为止，默认全部
+
+    Returns:
+        本次执行的版本号列表
+    """
+    executed = []
+    for version, description, migrate in pending_migrations():
+        if target is not None and version > target:
+            break
+        with db.engine.begin() as connection:
+            migrate(connection)
+            connection.execute(SchemaMigration.__table__.insert().values(
+                version=version,
+                description=description,
+                applied_at=datetime.utcnow()
+            ))
+        logger.info(f"migration_applied|version={version}|{description}")
+        executed.append(version)
+    return executed
@@ -0,0 +1,67 @@
+from app.utils.errors import APIError
+from collections import namedtuple
+from datetime import datetime
+from flask import request
+from sqlalchemy import and_, or_
+
+# 单页最大条数
+MAX_PER_PAGE = 100
+
+KeysetPage = namedtuple('KeysetPage', ['items', 'per_page', 'next_cursor'])
+
+
+def keyset_requested():
+    """请求是否使用游标分页（携带 after 参数，首页传空值 after=）"""
+    return 'after' in request.args
+
+
+def encode_cursor(value, row_id):
+    """游标格式：<排序字段值>,<id>，时间字段使用 ISO 格式"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return f'{value},{row_id}'
+
+
+def decode_cursor(raw, python_type):
+    """解析游标，返回 (排序字段值, id)"""
+    try:
+        value, row_id = raw.rsplit(',', 1)
+        if python_type is datetime:
+            value = datetime.fromisoformat(value)
+        else:
+            value = python_type(value)
+        return value, int(row_id)
+    except (ValueError, TypeError):
+        raise APIError('after 参数格式不正确，应为上一页返回的 next_cursor', 400, 'INVALID_CURSOR')
+
+
+def keyset_paginate(query, sort_column, id_column):
+    """
+    游标（keyset）分页：按 (sort_column, id) 倒序，以
+    WHERE sort < 游标值 OR (sort = 游标值 AND id < 游标id) 定位下一页，
+    不做 COUNT 与 OFFSET，翻页开销与页码无关（需 (sort_column, id) 复合索引）
+
+    Args:
+        query: 已加好过滤条件的查询
+        sort_column: 排序字段（如 CheckIn.checkin_time），值不能为空
+        id_column: 主键字段，作为同值时的次序
+
+    Returns:
+        KeysetPage(items, per_page, next_cursor)；没有下一页时 next_cursor 为 None
+    """
+    per_page = min(max(request.args.get('per_page', 10, type=int) or 10, 1), MAX_PER_PAGE)
+    raw = request.args.get('after', '')
+    if raw:
+        value, last_id = decode_cursor(raw, sort_column.type.python_type)
+        query = query.filter(or_(
+            sort_column < value,
+            and_(sort_column == value, id_column < last_id)
+        ))
+
+    rows = query.order_by(sort_column.desc(), id_column.desc()).limit(per_page + 1).all()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+    return KeysetPage(rows, per_page, next_cursor)
@@ -0,0 +1,77 @@
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from flask import current_app, has_app_context
+from werkzeug.security import generate_password_hash
+import multiprocessing
+import os
+
+# Werkzeug 默认的密码哈希算法与参数
+DEFAULT_PASSWORD_METHOD = 'scrypt:32768:8:1'
+
+
+def password_method(role=None):
+    """按角色获取密码哈希算法（PASSWORD_HASH_METHODS 未配置的角色使用默认算法）"""
+    if not has_app_context():
+        return DEFAULT_PASSWORD_METHOD
+    methods = current_app.config.get('PASSWORD_HASH_METHODS') or {}
+    return methods.get(role) or current_app.config.get('PASSWORD_HASH_DEFAULT_METHOD', DEFAULT_PASSWORD_METHOD)
+
+
+def hash_password(password, role=None):
+    """按角色配置的算法计算密码哈希"""
+    return generate_password_hash(password, method=password_method(role))
+
+
+def _hash_one(item):
+    password, method = item
+    return generate_password_hash(password, method=method)
+
+
+def _worker_count(workers, task_count):
+    if workers is None:
+        workers = current_app.config.get('PASSWORD_HASH_WORKERS') if has_app_context() else None
+        workers = workers or os.cpu_count() or 1
+    return min(workers, task_count)
+
+
+@contextmanager
+def password_hash_pool(task_count, workers=None):
+    """
+    创建供多批 hash_passwords 复用的进程池（任务数不足以并行时为 None）
+    spawn 子进程启动时会重新导入主模块并创建应用，一次导入任务只应创建一个进程池
+
+    Args:
+        task_count: 预计需要计算的哈希总数
+        workers: 并行进程数，默认读取 PASSWORD_HASH_WORKERS
+    """
+    workers = _worker_count(workers, task_count)
+    if workers <= 1:
+        yield None
+        return
+    # 使用 spawn 启动子进程，避免在多线程的 Web/任务进程中 fork
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        yield pool
+
+
+def hash_passwords(items, workers=None, pool=None):
+    """
+    批量计算密码哈希，数量较多时在进程池中并行计算
+
+    Args:
+        items: [(password, role), ...]
+        workers: 并行进程数，默认读取 PASSWORD_HASH_WORKERS
+        pool: password_hash_pool 创建的进程池；为空时按需临时创建
+
+    Returns:
+        与 items 顺序一致的哈希列表
+    """
+    tasks = [(password, password_method(role)) for password, role in items]
+    if not tasks:
+        return []
+    if pool is None:
+        with password_hash_pool(len(tasks), workers) as temporary_pool:
+            if temporary_pool is None:
+                return [_hash_one(task) for task in tasks]
+            return hash_passwords(items, workers, temporary_pool)
+    workers = _worker_count(workers, len(tasks))
+    return list(pool.map(_hash_one, tasks, chunksize=max(1, len(tasks) // (max(workers, 1) * 4))))
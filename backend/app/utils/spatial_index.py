@@ -0,0 +1,153 @@
+from app import db
+from app.models.position import Position
+from app.utils.distance import haversine_distance_batch
+import math
+import threading
+import time
+
+# 纬度每度约 111.32 公里
+METERS_PER_DEGREE = 111320.0
+
+
+class PositionGridIndex:
+    """
+    在招岗位坐标的进程内网格索引
+    按固定经纬度步长把岗位分入网格，查询时只计算覆盖查询范围的网格内岗位的精确距离；
+    岗位新增/修改/删除时增量维护，并按 refresh_seconds 定期从数据库全量重建，
+    以同步其他进程中的写入
+    """
+
+    def __init__(self, cell_degrees=0.05, refresh_seconds=300):
+        self.cell_degrees = cell_degrees
+        self.refresh_seconds = refresh_seconds
+        self._points = {}
+        self._cells = {}
+        self._built_at = None
+        self._lock = threading.RLock()
+
+    def init_app(self, app):
+        self.cell_degrees = app.config.get('NEARBY_INDEX_CELL_DEGREES', 0.05)
+        self.refresh_seconds = app.config.get('NEARBY_INDEX_REFRESH_SECONDS', 300)
+        self.invalidate()
+        app.extensions['position_index'] = self
+
+    def _cell(self, latitude, longitude):
+        return (
+            math.floor(latitude / self.cell_degrees),
+            math.floor(longitude / self.cell_degrees)
+        )
+
+    def _add(self, position_id, latitude, longitude):
+        self._points[position_id] = (latitude, longitude)
+        self._cells.setdefault(self._cell(latitude, longitude), set()).add(position_id)
+
+    def _discard(self, position_id):
+        point = self._points.pop(position_id, None)
+        if point is None:
+            return
+        cell = self._cell(*point)
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(position_id)
+            if not members:
+                del self._cells[cell]
+
+    def rebuild(self):
+        """从数据库全量重建（仅在招岗位）"""
+        rows = db.session.query(Position.id, Position.latitude, Position.longitude).filter(
+            Position.status == 1
+        ).all()
+        with self._lock:
+            self._points = {}
+            self._cells = {}
+            for position_id, latitude, longitude in rows:
+                self._add(position_id, latitude, longitude)
+            self._built_at = time.monotonic()
+
+    def invalidate(self):
+        """丢弃索引，下次查询时重建"""
+        with self._lock:
+            self._points = {}
+            self._cells = {}
+            self._built_at = None
+
+    def _ensure_built(self):
+        built_at = self._built_at
+        if built_at is None or (
+            self.refresh_seconds > 0 and time.monotonic() - built_at > self.refresh_seconds
+        ):
+            self.rebuild()
+
+    def update(self, position):
+        """岗位创建/修改后同步索引：在招岗位写入新坐标，其他状态移出索引"""
+        with self._lock:
+            if self._built_at is None:
+                return
+            self._discard(position.id)
+            if position.status == 1:
+                self._add(position.id, position.latitude, position.longitude)
+
+    def remove(self, *position_ids):
+        """岗位删除后移出索引"""
+        with self._lock:
+            for position_id in position_ids:
+                self._discard(position_id)
+
+    def query(self, latitude, longitude, radius, limit=None):
+        """
+        查询半径范围内的在招岗位
+
+        Args:
+            latitude: 查询点纬度
+            longitude: 查询点经度
+            radius: 半径（米）
+            limit: 最多返回条数
+
+        Returns:
+            按距离升序的 [(position_id, 距离米), ...]
+        """
+        self._ensure_built()
+        lat_span = radius / METERS_PER_DEGREE
+        cos_lat = max(math.cos(math.radians(latitude)), 1e-6)
+        lng_span = min(radius / (METERS_PER_DEGREE * cos_lat), 180.0)
+        min_cell = self._cell(latitude - lat_span, longitude - lng_span)
+        max_cell = self._cell(latitude + lat_span, longitude + lng_span)
+
+        with self._lock:
+            candidates = []
+            cell_count = (max_cell[0] - min_cell[0] + 1) * (max_cell[1] - min_cell[1] + 1)
+            if cell_count > len(self._cells):
+                # 查询范围覆盖的网格多于非空网格时，直接遍历非空网格
+                for (cell_lat, cell_lng), members in self._cells.items():
+                    if min_cell[0] <= cell_lat <= max_cell[0] and min_cell[1] <= cell_lng <= max_cell[1]:
+                        candidates.extend(members)
+            else:
+                for cell_lat in range(min_cell[0], max_cell[0] + 1):
+                    for cell_lng in range(min_cell[1], max_cell[1] + 1):
+                        candidates.extend(self._cells.get((cell_lat, cell_lng), ()))
+            points = [self._points[position_id] for position_id in candidates]
+
+        if not candidates:
+            return []
+        distances = haversine_distance_batch(
+            [point[0] for point in points],
+            [point[1] for point in points],
+            latitude,
+            longitude
+        ).tolist()
+        results = sorted(
+            (
+                (position_id, distance)
+                for position_id, distance in zip(candidates, distances)
+                if distance <= radius
+            ),
+            key=lambda item: (item[1], item[0])
+        )
+        return results[:limit] if limit else results
+
+    def __len__(self):
+        with self._lock:
+            return len(self._points)
+
+
+position_index = PositionGridIndex()
@@ -0,0 +1,446 @@
+from app import db
+from app.models.user import User
+from app.models.position import Position
+from app.models.application import Application
+from app.models.checkin import CheckIn
+from app.models.weekly_report import WeeklyReport
+from app.utils.cache import TTLCache
+from datetime import date, timedelta
+from flask import request, current_app
+from functools import wraps
+import threading
+from sqlalchemy import func, case, and_, select
+
+# 出勤率按实习期60个工作日计算
+TOTAL_WORK_DAYS = 60
+# 周报提交率按实习期12周计算
+TOTAL_WEEKS = 12
+# 导出时服务端游标每批读取的行数
+EXPORT_BATCH_SIZE = 500
+
+# 统计接口结果缓存（进程内），容量与过期时间在 init_statistics_cache 中按配置设置
+statistics_cache = TTLCache(maxsize=256, ttl=60)
+
+# 学生本人签到统计快照（进程内），键为 (学生ID, 岗位ID或None)，签到时增量更新
+checkin_snapshot_cache = TTLCache(maxsize=10000, ttl=60)
+_checkin_snapshot_lock = threading.Lock()
+
+# 签到状态
+CHECKIN_STATUSES = ('normal', 'late', 'abnormal', 'not_signed')
+# 缺勤补记的状态，不计入签到总数与签到趋势
+ABSENT_STATUS = 'not_signed'
+# 签到统计的日期范围分段：(名称, 天数，含当天)
+CHECKIN_RANGES = (('today', 1), ('last_7_days', 7), ('last_30_days', 30))
+
+# 不参与缓存键的查询参数
+_CACHE_IGNORED_ARGS = {'fresh'}
+
+
+def init_statistics_cache(app):
+    """按应用配置设置统计缓存容量与默认过期时间"""
+    statistics_cache.maxsize = app.config.get('STATISTICS_CACHE_MAXSIZE', 256)
+    statistics_cache.ttl = app.config.get('STATISTICS_CACHE_SECONDS', 60)
+    checkin_snapshot_cache.maxsize = app.config.get('CHECKIN_STATS_SNAPSHOT_MAXSIZE', 10000)
+    checkin_snapshot_cache.ttl = app.config.get('CHECKIN_STATS_SNAPSHOT_SECONDS', 60)
+
+
+def invalidate_statistics():
+    """签到/申请/周报/岗位写入后清空统计缓存"""
+    statistics_cache.clear()
+
+
+def _statistics_cache_key():
+    """缓存键：接口 + 规范化后的查询参数 + 角色"""
+    args = tuple(sorted(
+        (key, value)
+        for key, value in request.args.items(multi=True)
+        if key not in _CACHE_IGNORED_ARGS and value != ''
+    ))
+    return (request.endpoint, args, request.current_user.role)
+
+
+def cached_statistics(ttl_config='STATISTICS_CACHE_SECONDS'):
+    """
+    统计接口结果缓存装饰器，需放在 role_required 之后
+    仅缓存 200 响应；请求带 fresh=1 时跳过缓存并刷新结果
+
+    Args:
+        ttl_config: 读取过期时间（秒）的配置项名称，值为 0 时不缓存
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            ttl = current_app.config.get(ttl_config, statistics_cache.ttl)
+            if ttl <= 0:
+                return f(*args, **kwargs)
+            
+            key = _statistics_cache_key()
+            if request.args.get('fresh', type=int) != 1:
+                cached = statistics_cache.get(key)
+                if cached is not None:
+                    body, status, mimetype = cached
+                    return current_app.response_class(body, status=status, mimetype=mimetype)
+            
+            response = current_app.make_response(f(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                statistics_cache.set(
+                    key,
+                    (response.get_data(), response.status_code, response.mimetype),
+                    ttl=ttl
+                )
+            return response
+        return decorated
+    return decorator
+
+
+def count_if(condition):
+    """条件计数：SUM(CASE WHEN condition THEN 1 ELSE 0 END)"""
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def attended(status_column):
+    """签到记录为实际签到（非缺勤补记）的条件，状态为空按 normal 处理"""
+    return func.coalesce(status_column, 'normal') != ABSENT_STATUS
+
+
+def compute_checkin_counts(student_id=None, position_id=None, start_date=None, end_date=None, today=None):
+    """
+    签到计数：一次条件聚合得到各状态计数及近1/7/30天分段计数
+
+    Args:
+        student_id: 仅统计该学生
+        position_id: 仅统计该岗位
+        start_date: 签到日期下限（含）
+        end_date: 签到日期上限（含）
+        today: 日期分段的基准日，默认当天
+
+    Returns:
+        {'as_of', 'total', <各状态>, 'ranges': {<分段名>: {'start_date', 'total', <各状态>}}}，
+        total 不含缺勤（not_signed）
+    """
+    today = today or date.today()
+    range_starts = [(name, today - timedelta(days=days - 1)) for name, days in CHECKIN_RANGES]
+    columns = [count_if(attended(CheckIn.status))]
+    columns += [count_if(CheckIn.status == status) for status in CHECKIN_STATUSES]
+    for _, range_start in range_starts:
+        in_range = CheckIn.checkin_date >= range_start
+        columns.append(count_if(and_(in_range, attended(CheckIn.status))))
+        columns += [count_if(and_(in_range, CheckIn.status == status)) for status in CHECKIN_STATUSES]
+
+    query = db.session.query(*columns)
+    if student_id:
+        query = query.filter(CheckIn.student_id == student_id)
+    if position_id:
+        query = query.filter(CheckIn.position_id == position_id)
+    if start_date:
+        query = query.filter(CheckIn.checkin_date >= start_date)
+    if end_date:
+        query = query.filter(CheckIn.checkin_date <= end_date)
+    values = iter(int(value) for value in query.one())
+
+    keys = ('total',) + CHECKIN_STATUSES
+    counts = dict(zip(keys, values))
+    counts['as_of'] = today
+    counts['ranges'] = {
+        name: {'start_date': range_start, **dict(zip(keys, values))}
+        for name, range_start in range_starts
+    }
+    return counts
+
+
+def checkin_statistics_data(counts):
+    """将签到计数转换为 /api/checkins/statistics 返回的 data 结构"""
+    attendance_rate = counts['normal'] / TOTAL_WORK_DAYS * 100 if TOTAL_WORK_DAYS > 0 else 0
+    return {
+        'total': counts['total'],
+        'normal_count': counts['normal'],
+        'late_count': counts['late'],
+        'abnormal_count': counts['abnormal'],
+        'not_signed_count': counts['not_signed'],
+        'attendance_rate': round(attendance_rate, 2),
+        'as_of': counts['as_of'].isoformat(),
+        'ranges': {
+            name: {
+                **{key: value for key, value in bucket.items() if key != 'start_date'},
+                'start_date': bucket['start_date'].isoformat()
+            }
+            for name, bucket in counts['ranges'].items()
+        }
+    }
+
+
+def get_student_checkin_statistics(student_id, position_id=None):
+    """学生本人签到统计：优先读取当天的进程内快照，未命中时查询并写入快照"""
+    today = date.today()
+    with _checkin_snapshot_lock:
+        snapshots = checkin_snapshot_cache.get(student_id)
+        counts = snapshots.get(position_id) if snapshots else None
+        if counts is not None and counts['as_of'] == today:
+            return checkin_statistics_data(counts)
+    counts = compute_checkin_counts(student_id, position_id, today=today)
+    with _checkin_snapshot_lock:
+        snapshots = checkin_snapshot_cache.get(student_id)
+        if snapshots is None:
+            snapshots = {}
+            checkin_snapshot_cache.set(student_id, snapshots)
+        snapshots[position_id] = counts
+        return checkin_statistics_data(counts)
+
+
+def record_student_checkin(student_id, position_id, status, checkin_date):
+    """新签到写入后增量更新该学生已缓存的统计快照（全部岗位及该岗位两份）"""
+    with _checkin_snapshot_lock:
+        snapshots = checkin_snapshot_cache.get(student_id)
+        if not snapshots:
+            return
+        for key in (None, position_id):
+            counts = snapshots.get(key)
+            if counts is None:
+                continue
+            if checkin_date > counts['as_of']:
+                del snapshots[key]
+                continue
+            counted = int(status != ABSENT_STATUS)
+            counts['total'] += counted
+            counts[status] += 1
+            for bucket in counts['ranges'].values():
+                if checkin_date >= bucket['start_date']:
+                    bucket['total'] += counted
+                    bucket[status] += 1
+
+
+def invalidate_student_checkin_statistics(student_ids=None):
+    """签到被删除或改判后丢弃学生统计快照，student_ids 为空时全部丢弃"""
+    if student_ids is None:
+        checkin_snapshot_cache.clear()
+        return
+    for student_id in student_ids:
+        checkin_snapshot_cache.pop(student_id)
+
+
+def compute_overview():
+    """
+    计算概览统计
+    每张表只扫描一次，通过条件聚合一次性得到该表的全部计数
+
+    Returns:
+        与 /api/statistics/overview 返回的 data 结构一致的字典
+    """
+    total_students = db.session.query(
+        func.count(User.id)
+    ).filter(User.role == 'student').scalar()
+
+    total_positions, active_positions = db.session.query(
+        func.count(Position.id),
+        count_if(Position.status == 1)
+    ).one()
+
+    total_applications, pending_applications, approved_applications = db.session.query(
+        func.count(Application.id),
+        count_if(Application.status == 'pending'),
+        count_if(Application.status == 'approved')
+    ).one()
+
+    # 缺勤补记的 not_signed 记录单独计数，不计入签到总数
+    total_checkins, normal_checkins, abnormal_checkins, absent_checkins = db.session.query(
+        count_if(attended(CheckIn.status)),
+        count_if(CheckIn.status == 'normal'),
+        count_if(CheckIn.status == 'abnormal'),
+        count_if(CheckIn.status == ABSENT_STATUS)
+    ).one()
+
+    total_reports, submitted_reports, reviewed_reports = db.session.query(
+        func.count(WeeklyReport.id),
+        count_if(WeeklyReport.status == 'submitted'),
+        count_if(WeeklyReport.status == 'reviewed')
+    ).one()
+
+    # MySQL 的 SUM 返回 Decimal，统一转为 int 便于 JSON 序列化
+    return {
+        'students': {
+            'total': int(total_students or 0)
+        },
+        'positions': {
+            'total': int(total_positions),
+            'active': int(active_positions)
+        },
+        'applications': {
+            'total': int(total_applications),
+            'pending': int(pending_applications),
+            'approved': int(approved_applications)
+        },
+        'checkins': {
+            'total': int(total_checkins),
+            'normal': int(normal_checkins),
+            'abnormal': int(abnormal_checkins),
+            'not_signed': int(absent_checkins)
+        },
+        'reports': {
+            'total': int(total_reports),
+            'submitted': int(submitted_reports),
+            'reviewed': int(reviewed_reports)
+        }
+    }
+
+
+def first_approved_applications(position_id=None, publisher_id=None):
+    """
+    每个学生最早的已批准申请（子查询：student_id, application_id）
+    同一学生有多个已批准岗位时以最早的申请为准（与信用分计算一致），统计结果每个学生只有一行
+
+    Args:
+        position_id: 仅考虑该岗位的申请
+        publisher_id: 仅考虑该发布者（教师）名下岗位的申请
+    """
+    query = select(
+        Application.student_id,
+        func.min(Application.id).label('application_id')
+    ).where(Application.status == 'approved')
+    if position_id:
+        query = query.where(Application.position_id == position_id)
+    if publisher_id:
+        query = query.join(Position, Position.id == Application.position_id).where(
+            Position.publisher_id == publisher_id
+        )
+    return query.group_by(Application.student_id).subquery()
+
+
+def attendance_query(position_id=None, publisher_id=None):
+    """
+    出勤统计查询：学生 ⋈ 最早的已批准申请 ⋈ 正常签到，按学生分组计数
+
+    Args:
+        position_id: 仅统计该岗位
+        publisher_id: 仅统计该发布者（教师）名下的岗位
+    """
+    first_application = first_approved_applications(position_id, publisher_id)
+    query = db.session.query(
+        User.id.label('student_id'),
+        User.real_name.label('student_name'),
+        User.student_id.label('student_id_number'),
+        func.count(CheckIn.id).label('checkin_count')
+    ).join(
+        first_application, first_application.c.student_id == User.id
+    ).join(
+        Application, Application.id == first_application.c.application_id
+    ).outerjoin(
+        CheckIn,
+        and_(
+            CheckIn.student_id == User.id,
+            CheckIn.position_id == Application.position_id,
+            CheckIn.status == 'normal'
+        )
+    ).filter(User.role == 'student')
+
+    return query.group_by(
+        User.id, User.real_name, User.student_id, Application.position_id
+    ).order_by(User.id)
+
+
+def attendance_rows(rows):
+    """将出勤统计查询结果转换为接口输出格式"""
+    for row in rows:
+        attendance_rate = row.checkin_count / TOTAL_WORK_DAYS * 100 if TOTAL_WORK_DAYS > 0 else 0
+        yield {
+            'student_id': row.student_id,
+            'student_name': row.student_name,
+            'student_id_number': row.student_id_number,
+            'attendance_rate': round(attendance_rate, 2),
+            'checkin_count': row.checkin_count
+        }
+
+
+def report_submission_query(position_id=None, publisher_id=None, sort=None):
+    """
+    周报提交统计查询：学生 ⋈ 最早的已批准申请 ⋈ 该岗位周报，按学生分组计数
+
+    Args:
+        position_id: 仅统计该岗位
+        publisher_id: 仅统计该发布者（教师）名下的岗位
+        sort: rate_asc / rate_desc 按提交数（即提交率）排序，默认按学生ID
+    """
+    report_count = func.count(WeeklyReport.id)
+    first_application = first_approved_applications(position_id, publisher_id)
+    query = db.session.query(
+        User.id.label('student_id'),
+        User.real_name.label('student_name'),
+        User.username.label('username'),
+        User.student_id.label('student_id_number'),
+        report_count.label('report_count')
+    ).join(
+        first_application, first_application.c.student_id == User.id
+    ).join(
+        Application, Application.id == first_application.c.application_id
+    ).outerjoin(
+        WeeklyReport,
+        and_(
+            WeeklyReport.student_id == User.id,
+            WeeklyReport.position_id == Application.position_id
+        )
+    ).filter(User.role == 'student').group_by(
+        User.id, User.real_name, User.username, User.student_id, Application.position_id
+    )
+
+    # 每个学生只有一行，排序与分页按学生计算
+    if sort == 'rate_asc':
+        return query.order_by(report_count.asc(), User.id)
+    if sort == 'rate_desc':
+        return query.order_by(report_count.desc(), User.id)
+    return query.order_by(User.id)
+
+
+def report_submission_rows(rows, total_weeks=TOTAL_WEEKS):
+    """将周报提交统计查询结果转换为接口输出格式"""
+    for row in rows:
+        submission_rate = row.report_count / total_weeks * 100 if total_weeks > 0 else 0
+        yield {
+            'student_id': row.student_id,
+            'student_name': row.student_name,
+            'student_id_number': row.student_id_number,
+            'submission_rate': round(submission_rate, 2),
+            'report_count': row.report_count
+        }
+
+
+def position_distribution_query(status=None, publisher_id=None):
+    """
+    岗位分布查询：岗位 LEFT JOIN 申请，按岗位分组统计已批准/待审核人数
+
+    Args:
+        status: 仅统计该状态的岗位
+        publisher_id: 仅统计该发布者（教师）发布的岗位
+    """
+    query = db.session.query(
+        Position.id.label('position_id'),
+        Position.title.label('position_title'),
+        Position.company_name.label('company_name'),
+        Position.max_students.label('max_students'),
+        count_if(Application.status == 'approved').label('student_count'),
+        count_if(Application.status == 'pending').label('pending_count')
+    ).outerjoin(Application, Application.position_id == Position.id)
+
+    if status is not None:
+        query = query.filter(Position.status == status)
+    if publisher_id:
+        query = query.filter(Position.publisher_id == publisher_id)
+
+    return query.group_by(
+        Position.id, Position.title, Position.company_name, Position.max_students
+    ).order_by(Position.id)
+
+
+def position_distribution_rows(rows):
+    """将岗位分布查询结果转换为接口输出格式"""
+    for row in rows:
+        student_count = int(row.student_count)
+        max_students = row.max_students or 0
+        utilization_rate = student_count / max_students * 100 if max_students > 0 else 0
+        yield {
+            'position_id': row.position_id,
+            'position_title': row.position_title,
+            'company_name': row.company_name,
+            'student_count': student_count,
+            'max_students': row.max_students,
+            'utilization_rate': round(utilization_rate, 2),
+            'pending_count': int(row.pending_count)
+        }
@@ -0,0 +1,168 @@
+from app.utils.cache import TTLCache
+from app.utils.errors import APIError
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import logging
+import random
+import requests
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+JSCODE2SESSION_PATH = '/sns/jscode2session'
+
+
+class WeChatClient:
+    """
+    微信小程序服务端接口客户端
+    复用带连接池的 Session（keep-alive），设置连接/读取超时与有限次重试，
+    并短期缓存 code→openid，避免小程序重复提交同一 code 时再次请求微信
+    """
+
+    def __init__(self, app=None):
+        self.appid = ''
+        self.secret = ''
+        self.api_base = 'https://api.weixin.qq.com'
+        self.timeout = (3, 5)
+        self.max_retries = 2
+        self.pool_size = 10
+        self.session_cache = TTLCache(maxsize=4096, ttl=300)
+        self._session = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.appid = app.config.get('WX_APPID', '')
+        self.secret = app.config.get('WX_SECRET', '')
+        self.api_base = app.config.get('WX_API_BASE', self.api_base).rstrip('/')
+        self.timeout = (
+            app.config.get('WX_CONNECT_TIMEOUT', 3),
+            app.config.get('WX_READ_TIMEOUT', 5)
+        )
+        self.max_retries = app.config.get('WX_MAX_RETRIES', 2)
+        self.pool_size = app.config.get('WX_POOL_SIZE', 10)
+        self.session_cache.maxsize = app.config.get('WX_CODE_CACHE_MAXSIZE', 4096)
+        self.session_cache.ttl = app.config.get('WX_CODE_CACHE_SECONDS', 300)
+        self.close()
+        app.extensions['wechat'] = self
+
+    @property
+    def enabled(self):
+        """是否配置了小程序 appid/secret（未配置时为开发环境，使用模拟 openid）"""
+        return bool(self.appid and self.secret)
+
+    def _get_session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    retry = Retry(
+                        total=self.max_retries,
+                        connect=self.max_retries,
+                        read=self.max_retries,
+                        status=self.max_retries,
+                        backoff_factor=0.2,
+                        status_forcelist=(500, 502, 503, 504),
+                        allowed_methods=frozenset(['GET'])
+                    )
+                    adapter = HTTPAdapter(
+                        pool_connections=1,
+                        pool_maxsize=self.pool_size,
+                        max_retries=retry
+                    )
+                    session = requests.Session()
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+        return self._session
+
+    def close(self):
+        """关闭连接池（配置变更或进程退出时）"""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def code_to_session(self, code):
+        """
+        用小程序登录 code 换取 openid
+
+        Returns:
+            openid
+
+        Raises:
+            APIError: 微信返回错误（WX_LOGIN_FAILED）或接口不可用（WX_UNAVAILABLE）
+        """
+        if not self.enabled:
+            # 开发环境，使用模拟openid
+            return f"mock_openid_{code}"
+
+        openid = self.session_cache.get(code)
+        if openid:
+            return openid
+
+        params = {
+            'appid': self.appid,
+            'secret': self.secret,
+            'js_code': code,
+            'grant_type': 'authorization_code'
+        }
+        start = time.perf_counter()
+        try:
+            response = self._get_session().get(
+                self.api_base + JSCODE2SESSION_PATH,
+                params=params,
+                timeout=self.timeout
+            )
+            result = response.json()
+        except (requests.RequestException, ValueError) as e:
+            # 异常信息中包含带 secret 的请求URL，只记录异常类型，也不链接原异常
+            logger.warning(f"jscode2session request failed: {type(e).__name__}")
+            raise APIError('微信服务暂不可用，请稍后重试', 502, 'WX_UNAVAILABLE') from None
+        finally:
+            logger.debug(f"jscode2session took {(time.perf_counter() - start) * 1000:.1f}ms")
+
+        if result.get('errcode') or not result.get('openid'):
+            logger.info(f"jscode2session error: {result.get('errcode')} {result.get('errmsg')}")
+            raise APIError('微信登录失败', 401, 'WX_LOGIN_FAILED')
+
+        openid = result['openid']
+        self.session_cache.set(code, openid)
+        return openid
+
+
+wechat_client = WeChatClient()
+
+
+def create_stub_app(latency_ms=0, jitter_ms=0, error_rate=0.0):
+    """
+    本地 jscode2session 模拟服务，用于离线压测
+    将 WX_API_BASE 指向该服务即可，无需访问微信
+
+    Args:
+        latency_ms: 每次请求注入的固定延迟（毫秒）
+        jitter_ms: 在固定延迟上叠加的随机抖动上限（毫秒）
+        error_rate: 返回 HTTP 503 的概率（0-1），用于验证重试
+    """
+    from flask import Flask, request, jsonify
+
+    stub = Flask('wechat_stub')
+
+    @stub.route(JSCODE2SESSION_PATH, methods=['GET'])
+    def jscode2session():
+        delay = latency_ms + (random.uniform(0, jitter_ms) if jitter_ms else 0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+        if error_rate and random.random() < error_rate:
+            return jsonify({'errcode': -1, 'errmsg': 'system busy'}), 503
+
+        code = request.args.get('js_code')
+        if not code:
+            return jsonify({'errcode': 40029, 'errmsg': 'invalid code'}), 200
+        return jsonify({
+            'openid': f"stub_openid_{code}",
+            'session_key': f"stub_session_key_{code}"
+        }), 200
+
+    return stub
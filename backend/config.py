@@ -16,6 +16,16 @@ class Config:
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or SECRET_KEY
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
     JWT_ALGORITHM = 'HS256'
+    AUTH_USER_CACHE_SECONDS = 60  # 已认证用户缓存有效期（秒），仅失效当前进程；其他进程中账号禁用等状态变更最多延迟该时长生效
+    AUTH_USER_CACHE_MAXSIZE = 4096  # 已认证用户缓存最大条目数
+    AUTH_TOKEN_CACHE_SECONDS = 300  # 已验证token缓存有效期（秒），不超过token自身过期时间
+    AUTH_TOKEN_CACHE_MAXSIZE = 10000  # 已验证token缓存最大条目数
+    
+    # 密码哈希配置（Werkzeug 算法格式，如 'scrypt:32768:8:1'、'pbkdf2:sha256:600000'）
+    PASSWORD_HASH_DEFAULT_METHOD = 'scrypt:32768:8:1'
+    PASSWORD_HASH_METHODS = {}  # 按角色覆盖，如 {'student': 'pbkdf2:sha256:260000'}
+    PASSWORD_HASH_WORKERS = os.cpu_count() or 2  # 批量导入时并行计算哈希的进程数
+    USER_IMPORT_ASYNC_THRESHOLD = 200  # 导入用户数超过该值时转为后台任务
     
     # 文件上传配置
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
@@ -27,7 +37,32 @@ class Config:
     CHECKIN_ABNORMAL_DISTANCE = 500  # 兼容旧逻辑
     CHECKIN_WORKDAY_START = '09:00'  # 签到开始时间
     CHECKIN_WORKDAY_END = '18:00'    # 签到结束时间
-    CHECKIN_ALLOW_MULTIPLE = False   # 每日是否允许多次签到
+    CHECKIN_ELIGIBILITY_CACHE_SECONDS = 300  # (学生, 岗位) 签到资格缓存有效期（秒），0 表示不缓存
+    CHECKIN_ELIGIBILITY_CACHE_MAXSIZE = 10000
+    CHECKIN_INGEST_MODE = os.environ.get('CHECKIN_INGEST_MODE') or 'direct'  # direct=逐条提交 / buffered=写缓冲批量提交
+    CHECKIN_BUFFER_FLUSH_MS = 200  # 写缓冲提交间隔（毫秒）
+    CHECKIN_BUFFER_MAX_ROWS = 500  # 缓冲累计达到该条数时立即提交
+    CHECKIN_BUFFER_MAX_PENDING = 20000  # 缓冲积压上限，超过后签到接口返回 503
+    CHECKIN_BUFFER_MAX_RETRIES = 10  # 数据库不可用时每条签到的最多提交次数，超过后转入死信
+    CHECKIN_SPOOL_DIR = os.environ.get('CHECKIN_SPOOL_DIR') or None  # 写缓冲的本地 spool 目录，为空时进程崩溃会丢失未提交的签到
+    CHECKIN_SPOOL_FSYNC = True  # 每条签到写入 spool 后是否 fsync
+    CHECKIN_ABSENCE_SCHEDULE = os.environ.get('CHECKIN_ABSENCE_SCHEDULE') or None  # 每日补记缺勤的时刻（HH:MM），为空时不在进程内定时执行
+    CHECKIN_ABSENCE_LOOKBACK_DAYS = 3  # 定时补记覆盖今天之前的天数
+    CHECKIN_ABSENCE_WEEKDAYS = (0, 1, 2, 3, 4)  # 需要补记缺勤的星期（0=周一）
+    CHECKIN_ABSENCE_CHUNK_SIZE = 1000  # 补记时每个事务覆盖的申请ID数
+
+    # 附近岗位查询配置
+    NEARBY_DEFAULT_RADIUS = 5000  # 默认查询半径（米）
+    NEARBY_MAX_RADIUS = 50000  # 最大查询半径（米）
+    NEARBY_INDEX_CELL_DEGREES = 0.05  # 网格索引步长（度），约 5.5 公里
+    NEARBY_INDEX_REFRESH_SECONDS = 300  # 索引全量重建间隔（秒），用于同步其他进程的写入
+
+    # 统计配置
+    STATISTICS_CACHE_SECONDS = 60  # 统计结果缓存有效期（秒），0 表示不缓存；写入操作会主动失效
+    STATISTICS_CACHE_MAXSIZE = 256  # 统计结果缓存最大条目数（LRU淘汰）
+    STATISTICS_OVERVIEW_SNAPSHOT_SECONDS = 10  # 概览统计快照有效期（秒），0 表示实时计算
+    CHECKIN_STATS_SNAPSHOT_SECONDS = 60  # 学生本人签到统计快照有效期（秒），本进程签到时增量更新，0 表示实时计算
+    CHECKIN_STATS_SNAPSHOT_MAXSIZE = 10000
 
     # 论坛配置
     FORUM_PAGE_SIZE = 20
@@ -39,6 +74,17 @@ class Config:
     # 微信小程序配置
     WX_APPID = os.environ.get('WX_APPID') or ''
     WX_SECRET = os.environ.get('WX_SECRET') or ''
+    WX_API_BASE = os.environ.get('WX_API_BASE') or 'https://api.weixin.qq.com'  # 压测时可指向本地 flask wx-stub
+    WX_CONNECT_TIMEOUT = 3  # 连接超时（秒）
+    WX_READ_TIMEOUT = 5  # 读取超时（秒）
+    WX_MAX_RETRIES = 2  # 连接失败/5xx 时的最大重试次数
+    WX_POOL_SIZE = 10  # keep-alive 连接池大小
+    WX_CODE_CACHE_SECONDS = 300  # code→openid 缓存有效期（秒），与微信 code 有效期一致
+    WX_CODE_CACHE_MAXSIZE = 4096
+    
+    # 后台任务配置
+    JOB_QUEUE_WORKERS = 4  # 后台任务线程数
+    JOB_QUEUE_SYNC = False  # 为True时任务在请求线程内同步执行（测试用）
     
     # 日志配置
     LOG_FILE = 'app.log'
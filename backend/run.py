@@ -1,6 +1,8 @@
 from app import create_app, db
 from app.models import User
 from app.utils.logger import setup_logger
+from datetime import date, timedelta
+import click
 import os
 
 app = create_app()
@@ -9,8 +11,11 @@ setup_logger(app)
 @app.cli.command('init-db')
 def init_db():
     """初始化数据库"""
+    from app.utils.migrations import upgrade
     with app.app_context():
         db.create_all()
+        # 新建的表结构已是最新版本，登记全部迁移版本
+        upgrade()
         
         # 创建默认管理员账户
         admin = User.query.filter_by(username='admin').first()
@@ -27,6 +32,125 @@ def init_db():
         else:
             print('数据库已初始化')
 
+@app.cli.command('migrate-db')
+@click.option('--status', 'show_status', is_flag=True, help='只列出迁移执行情况，不执行')
+@click.option('--target', type=int, default=None, help='执行到指定版本为止，默认全部')
+def migrate_db_command(show_status, target):
+    """执行数据库结构迁移（部署新版本后运行，应用启动时不再检查表结构）"""
+    from app.utils.migrations import MIGRATIONS, applied_versions, upgrade
+    with app.app_context():
+        if show_status:
+            applied = applied_versions()
+            for version, description, _ in MIGRATIONS:
+                print(f"{'[x]' if version in applied else '[ ]'} {version:03d} {description}")
+            return
+        executed = upgrade(target)
+        if executed:
+            print(f"已执行迁移: {', '.join(str(version) for version in executed)}")
+        else:
+            print('数据库结构已是最新版本')
+
+@app.cli.command('rebuild-checkin-stats')
+@click.option('--start', 'start_date', default=None, help='起始日期 YYYY-MM-DD，默认全部')
+@click.option('--end', 'end_date', default=None, help='结束日期 YYYY-MM-DD，默认全部')
+def rebuild_checkin_stats_command(start_date, end_date):
+    """从签到明细重建每日签到汇总表"""
+    from app.utils.checkin_rollup import rebuild_checkin_stats
+    with app.app_context():
+        start = date.fromisoformat(start_date) if start_date else None
+        end = date.fromisoformat(end_date) if end_date else None
+        rows = rebuild_checkin_stats(start, end)
+        db.session.commit()
+        print(f'每日签到汇总已重建，共写入 {rows} 行')
+
+@app.cli.command('recompute-credit')
+@click.option('--batch-size', default=1000, show_default=True, help='每批更新的学生数')
+def recompute_credit_command(batch_size):
+    """批量重算全部学生信用分（评分公式调整后使用）"""
+    from app.utils.credit import recompute_all_credit_scores
+    with app.app_context():
+        def report_progress(processed, total):
+            print(f'已更新 {processed}/{total}')
+        
+        students, changed = recompute_all_credit_scores(batch_size, progress=report_progress)
+        print(f'信用分重算完成：学生 {students} 人，变更 {changed} 人')
+
+@app.cli.command('recover-checkin-spool')
+def recover_checkin_spool_command():
+    """重放已退出进程遗留在 CHECKIN_SPOOL_DIR 中的签到（已存在的签到会跳过）"""
+    from app.utils.checkin_ingest import checkin_buffer
+    with app.app_context():
+        written = checkin_buffer.recover()
+        print(f'签到 spool 重放完成，写入 {written} 条')
+
+@app.cli.command('mark-absences')
+@click.option('--date', 'target_date', default=None, help='补记日期 YYYY-MM-DD，默认昨天')
+@click.option('--start', 'start_date', default=None, help='回填起始日期 YYYY-MM-DD（与 --end 一起使用）')
+@click.option('--end', 'end_date', default=None, help='回填结束日期 YYYY-MM-DD，默认昨天')
+@click.option('--chunk-size', default=1000, show_default=True, help='每个事务覆盖的申请ID数')
+def mark_absences_command(target_date, start_date, end_date, chunk_size):
+    """为已批准但当天没有签到的学生补记 not_signed 记录（可重复执行）"""
+    from app.utils.absence import mark_absence_range
+    with app.app_context():
+        yesterday = date.today() - timedelta(days=1)
+        if start_date:
+            start = date.fromisoformat(start_date)
+            end = date.fromisoformat(end_date) if end_date else yesterday
+        else:
+            start = end = date.fromisoformat(target_date) if target_date else yesterday
+        if end > yesterday:
+            raise click.BadParameter('只能为今天之前的日期补记缺勤')
+        
+        def report_progress(processed, total):
+            print(f'已处理 {processed}/{total} 天')
+        
+        result = mark_absence_range(report_progress, start, end, chunk_size)
+        for day, inserted in result['dates'].items():
+            print(f'{day}: 补记 {inserted} 条')
+        print(f"缺勤补记完成，共写入 {result['inserted']} 条")
+
+@app.cli.command('bench-auth')
+@click.option('--iterations', default=2000, show_default=True, help='每组测试的请求次数')
+def bench_auth_command(iterations):
+    """认证开销微基准：对比无缓存与有缓存时每次请求的token验证+用户加载耗时"""
+    import time
+    from app.utils.jwt import generate_token, get_current_user, token_cache, user_cache
+    with app.test_request_context():
+        user = User.query.first()
+        if not user:
+            print('数据库中没有用户，请先执行 flask init-db')
+            return
+        token = generate_token(user.id, user.role)
+        
+        def run(clear_cache):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                if clear_cache:
+                    token_cache.clear()
+                    user_cache.clear()
+                get_current_user(token)
+                db.session.remove()
+            return (time.perf_counter() - start) / iterations * 1e6
+        
+        before = run(clear_cache=True)
+        after = run(clear_cache=False)
+        print(f'无缓存: {before:.1f} us/请求')
+        print(f'有缓存: {after:.1f} us/请求')
+        print(f'加速比: {before / after:.1f}x')
+
+@app.cli.command('wx-stub')
+@click.option('--host', default='127.0.0.1', show_default=True)
+@click.option('--port', default=8900, show_default=True)
+@click.option('--latency-ms', default=0, show_default=True, help='每次请求注入的延迟（毫秒）')
+@click.option('--jitter-ms', default=0, show_default=True, help='随机抖动上限（毫秒）')
+@click.option('--error-rate', default=0.0, show_default=True, help='返回 503 的概率（0-1）')
+def wx_stub_command(host, port, latency_ms, jitter_ms, error_rate):
+    """启动本地 jscode2session 模拟服务（离线压测用，需将 WX_API_BASE 指向该地址）"""
+    from app.utils.wechat import create_stub_app
+    stub = create_stub_app(latency_ms, jitter_ms, error_rate)
+    print(f'微信模拟服务: http://{host}:{port}，延迟 {latency_ms}ms ± {jitter_ms}ms，错误率 {error_rate}')
+    stub.run(host=host, port=port, threaded=True)
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
 
@@ -0,0 +1,78 @@
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 配置在导入时读取环境变量，须在创建应用前指向临时 SQLite 数据库
+_DB_DIR = tempfile.mkdtemp(prefix='internship-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+
+from app import create_app, db
+from app.models import Application, Position, User
+from app.utils.checkin_rules import invalidate_checkin_eligibility
+from app.utils.jwt import invalidate_user_cache
+from app.utils.stats import invalidate_statistics, invalidate_student_checkin_statistics
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app()
+    app.config.update(TESTING=True)
+    return app
+
+
+@pytest.fixture
+def session(app):
+    """每个用例使用全新的表结构与空的进程内缓存"""
+    with app.app_context():
+        db.create_all()
+        yield db.session
+        db.session.remove()
+        db.drop_all()
+    invalidate_statistics()
+    invalidate_student_checkin_statistics()
+    invalidate_checkin_eligibility()
+    invalidate_user_cache()
+
+
+@pytest.fixture
+def seed(session):
+    """
+    基础数据：1 名管理员、1 名教师、1 个岗位、3 名已批准该岗位的学生（30 天前审核通过）
+
+    Returns:
+        {'admin': 管理员ID, 'teacher': 教师ID, 'position': 岗位ID, 'students': [学生ID, ...]}
+    """
+    admin = User(username='admin', real_name='管理员', role='admin')
+    teacher = User(username='teacher', real_name='教师', role='teacher')
+    students = [
+        User(username=f'student{i}', real_name=f'学生{i}', role='student', student_id=f'2024000{i}')
+        for i in range(3)
+    ]
+    session.add_all([admin, teacher, *students])
+    session.flush()
+    position = Position(
+        title='后端实习', company_name='示例公司', location='杭州',
+        latitude=30.0, longitude=120.0, max_students=5, publisher_id=teacher.id
+    )
+    session.add(position)
+    session.flush()
+    reviewed_at = datetime.utcnow() - timedelta(days=30)
+    session.add_all([
+        Application(
+            student_id=student.id, position_id=position.id, status='approved',
+            created_at=reviewed_at, reviewed_at=reviewed_at
+        )
+        for student in students
+    ])
+    session.commit()
+    return {
+        'admin': admin.id,
+        'teacher': teacher.id,
+        'position': position.id,
+        'students': [student.id for student in students]
+    }
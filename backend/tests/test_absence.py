@@ -0,0 +1,102 @@
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import func
+
+from app import db
+from app.models import Application, CheckIn, CheckInDailyStat
+from app.utils.absence import mark_absences
+from app.utils.checkin_rollup import record_checkins
+from app.utils.jwt import generate_token
+from app.utils.stats import compute_overview
+
+YESTERDAY = date.today() - timedelta(days=1)
+
+
+def _rollup():
+    return Counter({
+        (stat.stat_date, stat.position_id, stat.status): stat.count
+        for stat in CheckInDailyStat.query
+    })
+
+
+def _details():
+    return Counter({
+        (checkin_date, position_id, status): count
+        for checkin_date, position_id, status, count in db.session.query(
+            CheckIn.checkin_date, CheckIn.position_id, CheckIn.status, func.count(CheckIn.id)
+        ).group_by(CheckIn.checkin_date, CheckIn.position_id, CheckIn.status)
+    })
+
+
+@pytest.fixture
+def checked_in(seed, session):
+    """第一名学生昨天已签到"""
+    checkin = CheckIn(
+        student_id=seed['students'][0], position_id=seed['position'], checkin_date=YESTERDAY,
+        checkin_time=datetime.combine(YESTERDAY, datetime.min.time()),
+        latitude=30.0, longitude=120.0, distance=5.0, status='normal'
+    )
+    session.add(checkin)
+    session.flush()
+    record_checkins([checkin])
+    session.commit()
+    return checkin
+
+
+def test_mark_absences_is_idempotent(app, seed, checked_in):
+    assert mark_absences(YESTERDAY, chunk_size=1) == 2
+    assert mark_absences(YESTERDAY, chunk_size=1) == 0
+    assert mark_absences(YESTERDAY) == 0
+
+    absent = {
+        student_id for (student_id,) in db.session.query(CheckIn.student_id).filter_by(status='not_signed')
+    }
+    assert absent == set(seed['students'][1:])
+    assert _rollup() == _details()
+    assert _rollup()[(YESTERDAY, seed['position'], 'not_signed')] == 2
+
+
+def test_duplicate_approved_applications_mark_once(app, seed, session):
+    student_id = seed['students'][0]
+    reviewed_at = datetime.utcnow() - timedelta(days=10)
+    session.add(Application(
+        student_id=student_id, position_id=seed['position'], status='approved',
+        created_at=reviewed_at, reviewed_at=reviewed_at
+    ))
+    session.commit()
+
+    assert mark_absences(YESTERDAY) == 3
+    assert CheckIn.query.filter_by(student_id=student_id).count() == 1
+    assert _rollup() == _details()
+
+
+def test_applications_approved_after_the_date_are_skipped(app, seed, session):
+    late = Application.query.filter_by(student_id=seed['students'][2]).one()
+    late.reviewed_at = datetime.combine(date.today(), datetime.min.time())
+    session.commit()
+
+    assert mark_absences(YESTERDAY) == 2
+    assert not CheckIn.query.filter_by(student_id=late.student_id).count()
+
+
+def test_today_is_rejected(app, seed):
+    with pytest.raises(ValueError):
+        mark_absences(date.today())
+
+
+def test_absences_are_not_counted_as_checkins(app, seed, checked_in):
+    mark_absences(YESTERDAY)
+
+    overview = compute_overview()['checkins']
+    assert overview['total'] == 1
+    assert overview['not_signed'] == 2
+
+    token = generate_token(seed['teacher'], 'teacher')
+    response = app.test_client().get(
+        '/api/statistics/checkin-trend?days=7&fresh=1',
+        headers={'Authorization': f'Bearer {token}'}
+    )
+    assert response.status_code == 200
+    assert response.get_json()['data'] == [{'label': YESTERDAY.isoformat(), 'count': 1}]
@@ -0,0 +1,159 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models import Application, CheckIn, CheckInDailyStat, Message, Position, StudentCreditStat
+from app.utils import bulk_delete as bulk
+from app.utils.checkin_rollup import rebuild_checkin_stats
+from app.utils.credit import recompute_all_credit_scores
+from app.utils.errors import APIError
+from app.utils.jwt import generate_token
+from app.utils.stats import checkin_snapshot_cache
+
+
+def _aggregates():
+    daily = sorted(
+        (stat.stat_date, stat.position_id, stat.status, stat.count) for stat in CheckInDailyStat.query
+    )
+    credit = sorted(
+        (stat.student_id, stat.position_id, stat.normal_checkins, stat.abnormal_checkins)
+        for stat in StudentCreditStat.query
+        if stat.normal_checkins or stat.abnormal_checkins or stat.report_count
+    )
+    return daily, credit
+
+
+def _rebuilt_aggregates():
+    rebuild_checkin_stats()
+    db.session.commit()
+    recompute_all_credit_scores()
+    return _aggregates()
+
+
+@pytest.fixture
+def checkins(seed, session):
+    """每名学生最近 4 天各一条签到（正常/异常交替），每条附签到通知"""
+    rows = []
+    for student_id in seed['students']:
+        for offset in range(4):
+            day = date.today() - timedelta(days=offset)
+            rows.append(CheckIn(
+                student_id=student_id, position_id=seed['position'], checkin_date=day,
+                checkin_time=datetime.combine(day, datetime.min.time()),
+                latitude=30.0, longitude=120.0, distance=5.0,
+                status='normal' if offset % 2 == 0 else 'abnormal'
+            ))
+    session.add_all(rows)
+    session.flush()
+    session.add_all([
+        Message(user_id=row.student_id, title='签到通知', content='已签到', type='checkin', related_id=row.id)
+        for row in rows
+    ])
+    session.commit()
+    rebuild_checkin_stats()
+    session.commit()
+    recompute_all_credit_scores()
+    return rows
+
+
+def test_delete_checkins_keeps_aggregates_consistent(app, seed, checkins):
+    first, second = seed['students'][:2]
+    checkin_snapshot_cache.set(first, {None: {}})
+    checkin_snapshot_cache.set(second, {None: {}})
+    ids = [row.id for row in checkins if row.student_id == first][:3] + [999999]
+
+    deleted = bulk.delete_checkins(ids)
+
+    assert deleted == ids[:3]
+    assert CheckIn.query.count() == len(checkins) - 3
+    assert not Message.query.filter(Message.related_id.in_(deleted)).count()
+    assert _aggregates() == _rebuilt_aggregates()
+    # 只丢弃被删签到所属学生的快照
+    assert checkin_snapshot_cache.get(first) is None
+    assert checkin_snapshot_cache.get(second) is not None
+
+
+def test_partial_failure_reports_and_invalidates_committed_chunks(app, seed, checkins):
+    first, second = seed['students'][:2]
+    checkin_snapshot_cache.set(first, {None: {}})
+    checkin_snapshot_cache.set(second, {None: {}})
+    ids = [row.id for row in checkins if row.student_id == first][:1] + \
+        [row.id for row in checkins if row.student_id == second][:1]
+    calls = []
+
+    def failing_before_delete(rows):
+        calls.append(rows)
+        if len(calls) == 2:
+            raise RuntimeError('lock wait timeout')
+        bulk._before_delete_checkins(rows)
+
+    with pytest.raises(APIError) as excinfo:
+        bulk.bulk_delete(
+            CheckIn, ids,
+            columns=(CheckIn.student_id, CheckIn.position_id, CheckIn.checkin_date, CheckIn.status),
+            before_delete=failing_before_delete,
+            after_commit=bulk._after_delete_checkins,
+            chunk_size=1
+        )
+
+    assert excinfo.value.status_code == 500
+    assert excinfo.value.error_code == 'PARTIAL_DELETE'
+    assert excinfo.value.data == {'deleted': ids[:1]}
+    assert db.session.get(CheckIn, ids[1]) is not None
+    assert checkin_snapshot_cache.get(first) is None
+    assert checkin_snapshot_cache.get(second) is not None
+    assert _aggregates() == _rebuilt_aggregates()
+
+
+def test_partial_failure_keeps_api_error_status(app, seed, session):
+    positions = [
+        Position(title=f'岗位{i}', company_name='示例公司', location='杭州',
+                 latitude=30.0, longitude=120.0, publisher_id=seed['teacher'])
+        for i in range(2)
+    ]
+    session.add_all(positions)
+    session.commit()
+    ids = [position.id for position in positions]
+    # 校验之后第二个岗位的申请被批准
+    session.add(Application(student_id=seed['students'][0], position_id=ids[1], status='approved'))
+    session.commit()
+
+    with pytest.raises(APIError) as excinfo:
+        bulk.bulk_delete(Position, ids, before_delete=bulk._before_delete_positions, chunk_size=1)
+
+    assert excinfo.value.error_code == 'POSITION_HAS_APPROVED'
+    assert excinfo.value.data == {'deleted': ids[:1]}
+
+
+def test_single_position_delete_uses_bulk_path(app, seed, session):
+    position = Position(title='待删除', company_name='示例公司', location='杭州',
+                        latitude=30.0, longitude=120.0, publisher_id=seed['teacher'])
+    session.add(position)
+    session.flush()
+    application = Application(student_id=seed['students'][0], position_id=position.id, status='pending')
+    session.add(application)
+    session.flush()
+    session.add_all([
+        Message(user_id=seed['students'][0], title='申请通知', content='已提交', type='application',
+                related_id=application.id),
+        CheckInDailyStat(stat_date=date.today(), position_id=position.id, status='normal', count=1),
+        StudentCreditStat(student_id=seed['students'][0], position_id=position.id)
+    ])
+    session.commit()
+    position_id, application_id = position.id, application.id
+    client = app.test_client()
+    headers = {'Authorization': f"Bearer {generate_token(seed['teacher'], 'teacher')}"}
+
+    response = client.delete(f'/api/positions/{position_id}', headers=headers)
+
+    assert response.status_code == 200
+    assert db.session.get(Position, position_id) is None
+    assert not Application.query.filter_by(position_id=position_id).count()
+    assert not Message.query.filter_by(type='application', related_id=application_id).count()
+    assert not CheckInDailyStat.query.filter_by(position_id=position_id).count()
+    assert not StudentCreditStat.query.filter_by(position_id=position_id).count()
+
+    response = client.delete(f"/api/positions/{seed['position']}", headers=headers)
+    assert response.status_code == 400
+    assert response.get_json()['error_code'] == 'POSITION_HAS_APPROVED'
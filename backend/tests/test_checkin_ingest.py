@@ -0,0 +1,137 @@
+import atexit
+import json
+import os
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app.models import CheckIn
+from app.utils import checkin_ingest
+from app.utils.checkin_ingest import CheckinBuffer, checkin_record_key
+
+
+def _record(student_id, position_id, **overrides):
+    record = {
+        'student_id': student_id,
+        'position_id': position_id,
+        'checkin_date': date.today(),
+        'checkin_time': datetime.utcnow(),
+        'latitude': 30.0,
+        'longitude': 120.0,
+        'distance': 10.0,
+        'status': 'normal',
+        'abnormal_reason': None,
+        'remark': None,
+        'message': '签到通知'
+    }
+    record.update(overrides)
+    return record
+
+
+@pytest.fixture
+def buffer(app, session, tmp_path, monkeypatch):
+    buffer = CheckinBuffer(app)
+    buffer.spool_dir = str(tmp_path)
+    buffer.max_retries = 3
+    # 用例中手动调用 flush，不启动后台线程
+    monkeypatch.setattr(buffer, '_ensure_flusher', lambda: None)
+    yield buffer
+    atexit.unregister(buffer.flush)
+
+
+def _dead_letters(spool_dir):
+    records = []
+    for name in os.listdir(spool_dir):
+        if name.startswith('deadletter-'):
+            with open(os.path.join(spool_dir, name), encoding='utf-8') as f:
+                records.extend(json.loads(line) for line in f)
+    return records
+
+
+def test_flush_isolates_bad_record(buffer, seed, session):
+    position_id = seed['position']
+    good = [_record(student_id, position_id) for student_id in seed['students'][:2]]
+    # latitude 非空约束失败，与唯一键无关
+    bad = _record(seed['students'][2], position_id, latitude=None)
+    for record in (good[0], bad, good[1]):
+        assert buffer.submit(record)
+
+    assert buffer.flush() == 2
+
+    assert CheckIn.query.count() == 2
+    assert not buffer._buffer
+    dead = _dead_letters(buffer.spool_dir)
+    assert [record['student_id'] for record in dead] == [bad['student_id']]
+    assert 'error' in dead[0]
+    # 死信记录撤销接收标记，学生可重新签到
+    assert not buffer.is_accepted(checkin_record_key(bad))
+    assert buffer.is_accepted(checkin_record_key(good[0]))
+    assert not [name for name in os.listdir(buffer.spool_dir) if name.startswith('checkins-')]
+
+
+def test_flush_retries_transient_errors_then_dead_letters(buffer, seed, monkeypatch):
+    def unavailable(records):
+        raise OperationalError('INSERT', {}, Exception('server has gone away'))
+
+    monkeypatch.setattr(checkin_ingest, 'write_checkins', unavailable)
+    record = _record(seed['students'][0], seed['position'])
+    buffer.submit(record)
+
+    for attempt in range(1, buffer.max_retries):
+        assert buffer.flush() == 0
+        assert len(buffer._buffer) == 1
+        assert buffer._buffer[0]['attempts'] == attempt
+    assert buffer.flush() == 0
+
+    assert not buffer._buffer
+    assert len(_dead_letters(buffer.spool_dir)) == 1
+    assert not [name for name in os.listdir(buffer.spool_dir) if name.startswith('checkins-')]
+
+
+def test_flush_recovers_after_transient_error(buffer, seed, monkeypatch):
+    write_checkins = checkin_ingest.write_checkins
+    calls = []
+
+    def flaky(records):
+        calls.append(len(records))
+        if len(calls) == 1:
+            raise OperationalError('INSERT', {}, Exception('lock wait timeout'))
+        return write_checkins(records)
+
+    monkeypatch.setattr(checkin_ingest, 'write_checkins', flaky)
+    buffer.submit(_record(seed['students'][0], seed['position']))
+
+    assert buffer.flush() == 0
+    assert buffer._retry_at > 0
+    assert buffer.flush() == 1
+    assert buffer._failures == 0
+    assert CheckIn.query.count() == 1
+    assert not os.listdir(buffer.spool_dir)
+
+
+def test_submit_rejects_duplicates_and_caps_backlog(buffer, seed):
+    from app.utils.errors import APIError
+
+    record = _record(seed['students'][0], seed['position'])
+    assert buffer.submit(record)
+    assert not buffer.submit(dict(record))
+
+    buffer.max_pending = 1
+    with pytest.raises(APIError) as excinfo:
+        buffer.submit(_record(seed['students'][1], seed['position']))
+    assert excinfo.value.status_code == 503
+
+
+def test_flusher_restart_does_not_register_atexit_again(app, monkeypatch):
+    registered = []
+    monkeypatch.setattr(checkin_ingest.atexit, 'register', registered.append)
+    buffer = CheckinBuffer(app)
+    monkeypatch.setattr(buffer, '_run', lambda: None)
+
+    buffer._ensure_flusher()
+    buffer._thread.join()
+    buffer._ensure_flusher()
+    buffer._thread.join()
+
+    assert registered == [buffer.flush]
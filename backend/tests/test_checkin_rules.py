@@ -0,0 +1,37 @@
+import pytest
+
+from app import db
+from app.models import Application, Position
+from app.utils.checkin_rules import eligibility_cache, get_checkin_position
+from app.utils.errors import APIError
+
+
+def test_cached_eligibility_reads_current_position_location(seed, session):
+    student_id, position_id = seed['students'][0], seed['position']
+    get_checkin_position(student_id, position_id)
+    assert eligibility_cache.get((student_id, position_id)) is True
+
+    # 模拟其他进程修改岗位地点：直接更新表，不清空本进程缓存
+    db.session.execute(
+        db.update(Position).where(Position.id == position_id)
+        .values(latitude=31.5, longitude=121.5, checkin_radius=50)
+    )
+    session.commit()
+    db.session.expire_all()
+
+    position = get_checkin_position(student_id, position_id)
+    assert (position.latitude, position.longitude, position.checkin_radius) == (31.5, 121.5, 50)
+
+
+def test_cached_eligibility_for_deleted_position_is_evicted(seed, session):
+    student_id, position_id = seed['students'][0], seed['position']
+    get_checkin_position(student_id, position_id)
+
+    db.session.execute(db.delete(Application).where(Application.position_id == position_id))
+    db.session.execute(db.delete(Position).where(Position.id == position_id))
+    session.commit()
+
+    with pytest.raises(APIError) as excinfo:
+        get_checkin_position(student_id, position_id)
+    assert excinfo.value.status_code == 404
+    assert eligibility_cache.get((student_id, position_id)) is None
@@ -0,0 +1,138 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models import CheckIn, StudentCreditStat, User, WeeklyReport
+from app.utils.credit import apply_credit_delta, calculate_credit_score, score_from_aggregates
+from app.utils.jwt import user_cache
+
+
+def _checkin(student_id, position_id, days_ago, status='normal'):
+    day = date.today() - timedelta(days=days_ago)
+    return CheckIn(
+        student_id=student_id, position_id=position_id, checkin_date=day,
+        checkin_time=datetime.combine(day, datetime.min.time()),
+        latitude=30.0, longitude=120.0, distance=5.0, status=status
+    )
+
+
+@pytest.fixture
+def history(seed, session):
+    """第一名学生已有 2 条正常签到、1 条异常签到和 1 篇 80 分周报，尚无聚合行"""
+    student_id, position_id = seed['students'][0], seed['position']
+    session.add_all([
+        _checkin(student_id, position_id, 3),
+        _checkin(student_id, position_id, 2),
+        _checkin(student_id, position_id, 1, status='abnormal'),
+        WeeklyReport(student_id=student_id, position_id=position_id, week_number=1,
+                     content='周报', score=80, status='reviewed')
+    ])
+    session.commit()
+    return student_id, position_id
+
+
+def test_first_delta_seeds_from_detail_rows(history, session):
+    student_id, position_id = history
+    assert StudentCreditStat.query.count() == 0
+
+    # 与签到接口相同的顺序：先调整聚合，再写入明细
+    score = apply_credit_delta(student_id, position_id, normal_checkins=1)
+    session.add(_checkin(student_id, position_id, 0))
+    session.commit()
+
+    stat = StudentCreditStat.query.filter_by(student_id=student_id, position_id=position_id).one()
+    assert (stat.normal_checkins, stat.abnormal_checkins) == (3, 1)
+    assert (stat.report_count, stat.scored_report_count, stat.score_sum) == (1, 1, 80)
+    assert score == score_from_aggregates(3, 1, 80, 1)
+    assert score == calculate_credit_score(student_id)
+    assert db.session.get(User, student_id).credit_score == score
+
+
+def test_existing_row_is_not_seeded_again(history, session):
+    student_id, position_id = history
+    apply_credit_delta(student_id, position_id)
+    session.commit()
+    session.add(_checkin(student_id, position_id, 0))
+    session.commit()
+
+    # 聚合行已存在时只累加增量，不再从明细重新初始化
+    score = apply_credit_delta(student_id, position_id, normal_checkins=1)
+    session.commit()
+
+    stat = StudentCreditStat.query.filter_by(student_id=student_id, position_id=position_id).one()
+    assert stat.normal_checkins == 3
+    assert score == score_from_aggregates(3, 1, 80, 1)
+
+
+def test_negative_delta_before_detail_delete(history, session):
+    student_id, position_id = history
+    abnormal = CheckIn.query.filter_by(student_id=student_id, status='abnormal').one()
+
+    score = apply_credit_delta(student_id, position_id, abnormal_checkins=-1)
+    session.delete(abnormal)
+    session.commit()
+
+    stat = StudentCreditStat.query.filter_by(student_id=student_id, position_id=position_id).one()
+    assert stat.abnormal_checkins == 0
+    assert score == calculate_credit_score(student_id)
+
+
+def test_cached_user_is_evicted_only_after_commit(history, session):
+    student_id, position_id = history
+    user_cache.set(student_id, 'cached')
+
+    apply_credit_delta(student_id, position_id, normal_checkins=1)
+    session.rollback()
+    assert user_cache.get(student_id) == 'cached'
+
+    apply_credit_delta(student_id, position_id, normal_checkins=1)
+    assert user_cache.get(student_id) == 'cached'
+    session.commit()
+    assert user_cache.get(student_id) is None
+
+
+def test_score_follows_earliest_approved_position(history, seed, session):
+    from app.models import Application, Position
+    from app.utils.credit import recompute_all_credit_scores
+
+    student_id, first_position = history
+    position = Position(
+        title='前端实习', company_name='示例公司', location='杭州',
+        latitude=30.0, longitude=120.0, publisher_id=seed['teacher']
+    )
+    session.add(position)
+    session.flush()
+    session.add(Application(student_id=student_id, position_id=position.id, status='approved'))
+    session.commit()
+    expected = score_from_aggregates(2, 1, 80, 1)
+
+    # 后批准的岗位变化只更新该岗位聚合，信用分仍按最早批准的岗位计算
+    score = apply_credit_delta(student_id, position.id, normal_checkins=1)
+    session.add(_checkin(student_id, position.id, 0))
+    session.commit()
+    assert score == expected
+    assert db.session.get(User, student_id).credit_score == expected
+    stat = StudentCreditStat.query.filter_by(student_id=student_id, position_id=position.id).one()
+    assert stat.normal_checkins == 1
+
+    score = apply_credit_delta(student_id, first_position, abnormal_checkins=-1)
+    abnormal = CheckIn.query.filter_by(student_id=student_id, status='abnormal').one()
+    session.delete(abnormal)
+    session.commit()
+    assert score == score_from_aggregates(2, 1, 80, 0)
+    assert score == calculate_credit_score(student_id)
+
+    recompute_all_credit_scores()
+    assert db.session.get(User, student_id).credit_score == score
+
+
+def test_student_without_approved_application_keeps_default_score(seed, session):
+    from app.models import Application
+    from app.utils.credit import DEFAULT_CREDIT_SCORE
+
+    student_id = seed['students'][1]
+    Application.query.filter_by(student_id=student_id).update({'status': 'rejected'})
+    session.commit()
+
+    assert apply_credit_delta(student_id, seed['position'], report_count=1) == DEFAULT_CREDIT_SCORE
@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import Message, WeeklyReport
+from app.utils.errors import APIError
+from app.utils.pagination import keyset_paginate
+
+
+@pytest.fixture
+def messages(seed, session):
+    """7 条消息，created_at 两两相同（含微秒），检验同值按 id 排序的边界"""
+    base = datetime(2025, 3, 1, 8, 30, 15, 123456)
+    user_id = seed['students'][0]
+    rows = [
+        Message(user_id=user_id, title=f'消息{i}', content='内容', created_at=base + timedelta(seconds=i // 2))
+        for i in range(7)
+    ]
+    session.add_all(rows)
+    session.commit()
+    # 期望顺序：created_at 倒序，同值 id 倒序
+    return [
+        message.id for message in sorted(rows, key=lambda m: (m.created_at, m.id), reverse=True)
+    ]
+
+
+def _page(app, after, per_page):
+    with app.test_request_context(query_string={'after': after, 'per_page': per_page}):
+        return keyset_paginate(Message.query, Message.created_at, Message.id)
+
+
+def _walk(app, per_page):
+    ids, after, pages = [], '', 0
+    while True:
+        page = _page(app, after, per_page)
+        ids.extend(message.id for message in page.items)
+        pages += 1
+        if page.next_cursor is None:
+            return ids, pages
+        after = page.next_cursor
+
+
+@pytest.mark.parametrize('per_page', [1, 2, 3, 6, 7, 8])
+def test_walk_visits_every_row_once_across_ties(app, messages, per_page):
+    ids, pages = _walk(app, per_page)
+    assert ids == messages
+    # 恰好整页结束时不多出一个空页
+    assert pages == max(-(-len(messages) // per_page), 1)
+
+
+def test_cursor_inside_tie_continues_with_lower_id(app, messages):
+    first = _page(app, '', 1)
+    assert first.next_cursor.endswith(f',{messages[0]}')
+    second = _page(app, first.next_cursor, 1)
+    assert [message.id for message in second.items] == [messages[1]]
+
+
+def test_per_page_is_clamped(app, messages):
+    assert _page(app, '', 0).per_page == 10
+    assert _page(app, '', -5).per_page == 1
+    assert _page(app, '', 1000).per_page == 100
+
+
+@pytest.mark.parametrize('after', ['garbage', '2025-03-01T08:30:15', 'not-a-date,1', '2025-03-01T08:30:15,x'])
+def test_malformed_cursor_is_rejected(app, messages, after):
+    with pytest.raises(APIError) as excinfo:
+        _page(app, after, 2)
+    assert excinfo.value.error_code == 'INVALID_CURSOR'
+
+
+def test_integer_sort_column(app, seed, session):
+    student_id, position_id = seed['students'][0], seed['position']
+    session.add_all([
+        WeeklyReport(student_id=student_id, position_id=position_id, week_number=week, content='周报')
+        for week in (1, 2, 2, 3)
+    ])
+    session.commit()
+    seen, after = [], ''
+    while after is not None:
+        with app.test_request_context(query_string={'after': after, 'per_page': 2}):
+            page = keyset_paginate(WeeklyReport.query, WeeklyReport.week_number, WeeklyReport.id)
+        seen.extend((report.week_number, report.id) for report in page.items)
+        after = page.next_cursor
+    assert seen == sorted(seen, reverse=True)
+    assert len(seen) == 4
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import Application, Position, WeeklyReport
+from app.utils.jwt import generate_token
+
+
+@pytest.fixture
+def second_position(seed, session):
+    """第一名学生后来又被批准了第二个岗位，并在第二个岗位提交了 3 篇周报"""
+    student_id = seed['students'][0]
+    position = Position(
+        title='前端实习', company_name='示例公司', location='杭州',
+        latitude=30.0, longitude=120.0, max_students=5, publisher_id=seed['teacher']
+    )
+    session.add(position)
+    session.flush()
+    reviewed_at = datetime.utcnow() - timedelta(days=10)
+    session.add(Application(
+        student_id=student_id, position_id=position.id, status='approved',
+        created_at=reviewed_at, reviewed_at=reviewed_at
+    ))
+    session.add(WeeklyReport(student_id=student_id, position_id=seed['position'], week_number=1, content='周报'))
+    session.add_all([
+        WeeklyReport(student_id=student_id, position_id=position.id, week_number=week, content='周报')
+        for week in range(1, 4)
+    ])
+    session.commit()
+    return position.id
+
+
+def _get(app, seed, query):
+    token = generate_token(seed['admin'], 'admin')
+    response = app.test_client().get(
+        f'/api/statistics/weekly-report-rate?group_by=student&fresh=1&{query}',
+        headers={'Authorization': f'Bearer {token}'}
+    )
+    assert response.status_code == 200
+    return response.get_json()['data']
+
+
+@pytest.mark.parametrize('sort', ['', 'rate_asc', 'rate_desc'])
+def test_student_with_two_approved_positions_counted_once(app, seed, second_position, sort):
+    data = _get(app, seed, f'page=1&per_page=2&sort={sort}' if sort else 'page=1&per_page=2')
+
+    assert data['total'] == 3
+    assert data['pages'] == 2
+    rows = data['items'] + _get(app, seed, f'page=2&per_page=2&sort={sort}' if sort else 'page=2&per_page=2')['items']
+    assert sorted(row['student_id'] for row in rows) == sorted(seed['students'])
+    # 以最早的已批准申请（第一个岗位）计数
+    first = next(row for row in rows if row['student_id'] == seed['students'][0])
+    assert first['report_count'] == 1
+
+
+def test_position_filter_uses_that_positions_application(app, seed, second_position):
+    from app.utils.stats import report_submission_query
+
+    rows = report_submission_query(position_id=second_position).all()
+    assert [(row.student_id, row.report_count) for row in rows] == [(seed['students'][0], 3)]